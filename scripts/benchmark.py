@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Benchmark the serialization hot paths on realistic portal payloads.
+
+  python scripts/benchmark.py json --pods 2000
+  python scripts/benchmark.py yaml --pods 2000 --contexts 300
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import timeit
+import yaml
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(os.path.dirname(HERE), "src"))
+from duplocloud import codec
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger("benchmark")
+
+def pods(count):
+  """Build a GetPods response shaped like the portal returns it."""
+  return [{
+    "InstanceId": f"web-{i:05d}-7d9c8b6f5-x{i % 97:02d}qz",
+    "Name": f"web-{i % 40}",
+    "Host": f"10.{i % 250}.{i % 7}.{i % 200}",
+    "HostName": f"ip-10-0-{i % 250}-{i % 200}.ec2.internal",
+    "CurrentStatus": 1,
+    "DesiredStatus": 1,
+    "TenantId": "5f2a1c7e-8c1b-4a3e-9b6d-3f0e2d1c4b5a",
+    "StartTime": "2026-10-01T12:00:00Z",
+    "UserAccount": "dev",
+    "Containers": [{
+      "Name": name,
+      "DockerId": f"containerd://{i:064x}",
+      "Image": f"registry.example.com/acme/{name}:1.{i % 30}.0",
+      "StartedAt": "2026-10-01T12:00:05Z",
+      "RestartCount": i % 3,
+      "Ready": True,
+    } for name in ("app", "sidecar")],
+    "Template": {
+      "Labels": {"app": f"web-{i % 40}", "tier": "frontend", "owner": "platform"},
+      "Annotations": {"duplocloud.net/owner": "tenant", "checksum/config": f"{i:032x}"},
+      "OtherDockerConfig": json.dumps({"Env": [{"Name": f"VAR_{n}", "Value": "x" * 32} for n in range(20)]}),
+      "AllocationTags": "",
+    },
+  } for i in range(count)]
+
+def kubeconfig(count):
+  """Build a kubeconfig holding many duploctl managed contexts."""
+  return {
+    "apiVersion": "v1",
+    "kind": "Config",
+    "current-context": "ctx-0",
+    "clusters": [{"name": f"plan-{i}", "cluster": {
+      "server": f"https://{i:032x}.gr7.us-west-2.eks.amazonaws.com",
+      "certificate-authority-data": "LS0tLS1CRUdJTiBDRVJUSUZJQ0FURS0tLS0t" * 30,
+    }} for i in range(count)],
+    "users": [{"name": f"ctx-{i}", "user": {"exec": {
+      "apiVersion": "client.authentication.k8s.io/v1beta1",
+      "command": "duploctl",
+      "args": ["jit", "k8s", "--plan", f"plan-{i}", "--host", "https://example.duplocloud.net"],
+      "env": [{"name": "DUPLO_HOST", "value": "https://example.duplocloud.net"}],
+    }}} for i in range(count)],
+    "contexts": [{"name": f"ctx-{i}", "context": {
+      "cluster": f"plan-{i}", "user": f"ctx-{i}", "namespace": f"duploservices-t{i}",
+    }} for i in range(count)],
+  }
+
+def compare(name, stdlib, fast, repeat):
+  base = min(timeit.repeat(stdlib, number=1, repeat=repeat))
+  ours = min(timeit.repeat(fast, number=1, repeat=repeat))
+  logger.info(f"{name:>18}: pure {base * 1000:8.1f} ms  libyaml {ours * 1000:8.1f} ms  {base / ours:5.1f}x")
+
+def bench_yaml(args):
+  """Time each place the CLI reads or writes YAML."""
+  payload = pods(args.pods)
+  manifest = yaml.dump(payload, Dumper=codec.Dumper)
+  kube = kubeconfig(args.contexts)
+  kube_text = yaml.dump(kube, Dumper=codec.SafeDumper)
+  logger.info(f"{args.pods} pod manifest {len(manifest) / 1e6:.1f} MB, kubeconfig with {args.contexts} contexts {len(kube_text) / 1e6:.1f} MB")
+  if codec.SafeLoader is yaml.SafeLoader:
+    logger.warning("PyYAML was built without libyaml, both columns use the pure python classes")
+  compare("-f body (argtype)",
+    lambda: yaml.load(manifest, Loader=yaml.FullLoader),
+    lambda: yaml.load(manifest, Loader=codec.FullLoader), args.repeat)
+  compare("-o yaml (toyaml)",
+    lambda: yaml.dump(payload, Dumper=yaml.Dumper),
+    lambda: yaml.dump(payload, Dumper=codec.Dumper), args.repeat)
+  compare("config/kube read",
+    lambda: yaml.load(kube_text, Loader=yaml.SafeLoader),
+    lambda: yaml.load(kube_text, Loader=codec.SafeLoader), args.repeat)
+  compare("kubeconfig write",
+    lambda: yaml.dump(kube, Dumper=yaml.SafeDumper),
+    lambda: yaml.dump(kube, Dumper=codec.SafeDumper), args.repeat)
+
+def bench_json(args):
+  payload = pods(args.pods)
+  raw = json.dumps(payload).encode()
+  logger.info(f"GetPods with {args.pods} pods, {len(raw) / 1e6:.1f} MB, backend {codec.BACKEND}")
+  cases = {
+    "decode": (lambda: json.loads(raw), lambda: codec.loads(raw)),
+    "encode": (lambda: json.dumps(payload), lambda: codec.dumps(payload)),
+  }
+  for name, (stdlib, fast) in cases.items():
+    base = min(timeit.repeat(stdlib, number=1, repeat=args.repeat))
+    ours = min(timeit.repeat(fast, number=1, repeat=args.repeat))
+    logger.info(f"{name:>8}: json {base * 1000:8.1f} ms  {codec.BACKEND} {ours * 1000:8.1f} ms  {base / ours:5.1f}x")
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Benchmark duploctl serialization")
+  parser.add_argument("--repeat", type=int, default=5, help="Best of this many runs")
+  sub = parser.add_subparsers(dest="bench", required=True)
+  p = sub.add_parser("json", help="JSON decode and encode of GetPods")
+  p.add_argument("--pods", type=int, default=2000)
+  p.set_defaults(fn=bench_json)
+  p = sub.add_parser("yaml", help="YAML load and dump at each CLI call site")
+  p.add_argument("--pods", type=int, default=500)
+  p.add_argument("--contexts", type=int, default=300)
+  p.set_defaults(fn=bench_yaml)
+  args = parser.parse_args()
+  args.fn(args)
@@ -0,0 +1,188 @@
+import os
+import sys
+from multiprocessing.pool import ThreadPool
+
+import yaml
+
+from duplocloud import args, codec
+from duplocloud.commander import Command, Resource
+from duplocloud.controller import DuploCtl
+from duplocloud.errors import DuploError
+from duplocloud.resource import DuploResource
+
+# documents are applied tier by tier so whatever a resource refers to exists first
+TIERS = [
+  ["infrastructure", "tenant"],
+  ["configmap", "secret", "aws_secret", "ssm_param", "storageclass", "s3", "ecr", "batch_compute", "batch_scheduling_policy"],
+  ["pvc", "rds", "hosts", "asg", "batch_queue", "argo_wf_template"],
+  ["service", "ecs", "lambda", "batch_definition", "cronjob", "job"],
+  ["ingress", "cloudfront", "argo_wf", "batch_job"],
+]
+DEFAULT_TIER = 3
+
+@Resource("apply", client=None)
+class DuploApply(DuploResource):
+  """Apply Manifests
+
+  Create or update many resources of any kind from multi-document YAML
+  files. Each document names the resource kind and holds the body that kind
+  would take with `-f` on its own `apply` command.
+  """
+  def __init__(self, duplo: DuploCtl):
+    super().__init__(duplo)
+
+  def __call__(self, *args, **kwargs):
+    return self.command("run")(*args, **kwargs)
+
+  @Command()
+  def run(self,
+          manifests: args.MANIFESTS=None,
+          parallel: args.PARALLEL=10) -> dict:
+    """Apply every document in the given files.
+
+    Directories and their subdirectories are read for `*.yaml`, `*.yml`
+    and `*.json` files in name order, leaving out hidden files and
+    directories, and `-` reads stdin. Documents are grouped into tiers by kind so
+    that configuration and storage exist before the services using them,
+    and services before their ingresses and cronjobs. The documents of a
+    tier are applied concurrently, and every document is attempted even
+    when others fail. Documents of a kind that doesn't exist or has no
+    `apply` command are reported as failures without being attempted.
+
+    Usage: CLI Usage
+      ```sh
+      duploctl apply -f manifests/ --parallel 10
+      ```
+
+    Example: A manifest file
+      ```yaml
+      kind: configmap
+      spec:
+        metadata:
+          name: web
+        data:
+          LOG_LEVEL: info
+      ---
+      kind: service
+      spec:
+        Name: web
+        DockerImage: nginx:latest
+        Replicas: 2
+      ```
+
+    Args:
+      manifests: Files or directories of manifests, or a list of documents when called from python.
+      parallel: The maximum number of documents applied at once.
+
+    Returns:
+      applied: The kind, name and result of each applied document in tier order.
+
+    Raises:
+      DuploError: If any document failed, listing every failure and the documents that were applied.
+    """
+    docs = self.documents(manifests)
+    resources, commands, unsupported = {}, {}, {}
+    for kind in sorted({d["kind"] for d in docs}):
+      try:
+        r = self.duplo.load(kind)
+      except DuploError:
+        unsupported[kind] = f"unknown kind {kind}"
+        continue
+      try:
+        commands[kind] = r.command("apply")
+        resources[kind] = r
+      except DuploError:
+        unsupported[kind] = f"kind {kind} has no apply command"
+    for r in resources.values():
+      self.duplo.prefetch(r)
+    applied = []
+    failed = [
+      {"kind": d["kind"], "name": None, "source": d["source"], "error": unsupported[d["kind"]]}
+      for d in docs if d["kind"] in unsupported
+    ]
+    def apply_doc(doc):
+      name = self.__name(resources[doc["kind"]], doc["spec"])
+      try:
+        result = commands[doc["kind"]](body=doc["spec"])
+        self.duplo.logger.info(f"applied {doc['kind']} {name}")
+        return True, {"kind": doc["kind"], "name": name, "result": result}
+      except Exception as e:  # noqa: BLE001 - every document is attempted and its error reported
+        return False, {"kind": doc["kind"], "name": name, "source": doc["source"], "error": str(e)}
+    for tier in self.tiers([d for d in docs if d["kind"] in commands]):
+      with ThreadPool(max(1, min(len(tier), parallel))) as pool:
+        for ok, outcome in pool.map(apply_doc, tier):
+          (applied if ok else failed).append(outcome)
+    if failed:
+      lines = "\n".join(f"  {' '.join(filter(None, [f['kind'], f['name']]))} ({f['source']}): {f['error']}" for f in failed)
+      message = f"{len(failed)} of {len(docs)} documents failed to apply\n{lines}"
+      if applied:
+        done = "\n".join(f"  {' '.join(filter(None, [a['kind'], a['name']]))}" for a in applied)
+        message += f"\n{len(applied)} documents were applied\n{done}"
+      raise DuploError(message, 500)
+    return {"applied": applied}
+
+  def documents(self, manifests) -> list:
+    """Read the manifests into a list of documents.
+
+    Args:
+      manifests: Paths to files or directories, or a list of documents.
+
+    Returns:
+      A list of `{"kind", "spec", "source"}` documents.
+
+    Raises:
+      DuploError: If a document has no kind or spec.
+    """
+    if manifests and isinstance(manifests[0], dict):
+      found = [(doc, f"document {i}") for i, doc in enumerate(manifests)]
+    else:
+      found = [
+        (doc, f"{path}#{i}")
+        for path in self.__files(manifests or [])
+        for i, doc in enumerate(self.__load(path))
+        if doc is not None
+      ]
+    docs = []
+    for doc, source in found:
+      if not isinstance(doc, dict) or not doc.get("kind") or "spec" not in doc:
+        raise DuploError(f"{source} must have a kind and a spec", 400)
+      docs.append({"kind": doc["kind"], "spec": doc["spec"], "source": source})
+    return docs
+
+  def tiers(self, docs: list) -> list:
+    """Group documents into the tiers they are applied in.
+
+    Args:
+      docs: The documents to group.
+
+    Returns:
+      A list of non empty lists of documents, in apply order.
+    """
+    rank = {kind: i for i, kinds in enumerate(TIERS) for kind in kinds}
+    tiers = [[] for _ in TIERS]
+    for doc in docs:
+      tiers[rank.get(doc["kind"], DEFAULT_TIER)].append(doc)
+    return [t for t in tiers if t]
+
+  def __files(self, paths):
+    for path in paths:
+      if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+          dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+          for f in sorted(files):
+            if f.endswith((".yaml", ".yml", ".json")) and not f.startswith("."):
+              yield os.path.join(root, f)
+      else:
+        yield path
+
+  def __load(self, path):
+    if path == "-":
+      return list(yaml.load_all(sys.stdin, Loader=codec.SafeLoader))
+    with open(path, "r") as f:
+      return list(yaml.load_all(f, Loader=codec.SafeLoader))
+
+  def __name(self, r, spec):
+    try:
+      return r.name_from_body(spec)
+    except (AttributeError, KeyError, TypeError):
+      return None
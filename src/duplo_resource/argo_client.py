@@ -1,9 +1,15 @@
+import sys
+import time
+import threading
 import requests
 from cachetools import cachedmethod, TTLCache
+from cachetools.keys import hashkey
 from urllib.parse import unquote, quote
 from duplocloud.commander import Client
 from duplocloud.controller import DuploCtl
 from duplocloud.errors import DuploError, DuploConnectionError
+from duplocloud import codec
+from duplocloud.telemetry import path_template, body_sizes
 
 
 class _NullCache(dict):
@@ -27,6 +33,8 @@ class DuploArgoClient():
     self.duplo = duplo
     self.jit = duplo.load("jit")
     self._argo_verified = False
+    self._lock = threading.RLock()
+    self._cond = threading.Condition(self._lock)
     self._ttl_cache = TTLCache(maxsize=128, ttl=10)
 
   def _ensure_argo_enabled(self):
@@ -81,23 +89,40 @@ class DuploArgoClient():
   def _request(self, method: str, api_path: str, tenant_id: str, **kwargs):
     auth = self._get_auth()
     url = f"{self.duplo.host}/{self._full_path(api_path, tenant_id, auth)}"
-    try:
-      response = requests.request(
-        method,
-        url=url,
-        headers=self._headers(auth),
-        timeout=self.duplo.timeout,
-        **kwargs,
-      )
-    except requests.exceptions.Timeout as e:
-      raise DuploConnectionError("Argo request timed out") from e
-    except requests.exceptions.ConnectionError as e:
-      raise DuploConnectionError("Failed to connect to Argo") from e
-    except requests.exceptions.RequestException as e:
-      raise DuploConnectionError("Argo request failed") from e
-    return self._validate_response(response)
-
-  @cachedmethod(lambda self: self._ttl_cache)
+    template = path_template(f"argo-wf/api/v1/{api_path}")
+    headers = self._headers(auth)
+    response, status, received, sent = None, "error", 0, 0
+    started, start = time.time(), time.perf_counter()
+    with self.duplo.span(f"{method} {template}", "http", method=method, path=template) as span:
+      try:
+        response = requests.request(
+          method,
+          url=url,
+          headers=headers,
+          timeout=self.duplo.timeout,
+          **kwargs,
+        )
+        status = span["status"] = response.status_code
+        received, sent = body_sizes(response, kwargs.get("stream", False))
+      except requests.exceptions.Timeout as e:
+        raise DuploConnectionError("Argo request timed out") from e
+      except requests.exceptions.ConnectionError as e:
+        raise DuploConnectionError("Failed to connect to Argo") from e
+      except requests.exceptions.RequestException as e:
+        raise DuploConnectionError("Argo request failed") from e
+      finally:
+        elapsed = time.perf_counter() - start
+        self.duplo.meter.request("argo_wf", method, template, status, elapsed, received, sent)
+        if self.duplo.archive:
+          self.duplo.archive.record("argo_wf", method, url, headers, started, elapsed, response,
+                                    stream=kwargs.get("stream", False),
+                                    cache="miss" if method == "GET" and not kwargs else None,
+                                    error=sys.exc_info()[1])
+      return self._validate_response(codec.bind_json(response))
+
+  @cachedmethod(lambda self: self._ttl_cache,
+                lock=lambda self: self._lock,
+                condition=lambda self: self._cond)
   def _get_cached(self, api_path: str, tenant_id: str):
     return self._request("GET", api_path, tenant_id)
 
@@ -119,11 +144,21 @@ class DuploArgoClient():
     """
     if kwargs:
       return self._request("GET", api_path, tenant_id, **kwargs)
-    return self._get_cached(api_path, tenant_id)
+    with self._lock:
+      hit = hashkey(api_path, tenant_id) in self._ttl_cache
+    self.duplo.meter.cache("argo_wf", hit)
+    if not hit or not self.duplo.archive:
+      return self._get_cached(api_path, tenant_id)
+    started, start = time.time(), time.perf_counter()
+    response = self._get_cached(api_path, tenant_id)
+    self.duplo.archive.record("argo_wf", "GET", response.url, {}, started,
+                              time.perf_counter() - start, response, cache="hit")
+    return response
 
   def disable_get_cache(self) -> None:
     """Disable the GET cache for this client."""
-    self._ttl_cache = _NullCache()
+    with self._lock:
+      self._ttl_cache = _NullCache()
 
   def post(self, api_path: str, tenant_id: str, data: dict = {}):
     """POST request to the Argo proxy.
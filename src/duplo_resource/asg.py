@@ -1,6 +1,6 @@
 from duplocloud.controller import DuploCtl
 from duplocloud.resource import DuploResourceV2
-from duplocloud.errors import DuploError, DuploNotFound
+from duplocloud.errors import DuploError
 from duplocloud.commander import Command, Resource
 import duplocloud.args as args
 
@@ -55,10 +55,7 @@ class DuploAsg(DuploResourceV2):
     Raises:
       DuploError: If the ASG with the specified name could not be found.
     """
-    try:
-      return [s for s in self.list() if s["FriendlyName"] == name][0]
-    except IndexError:
-      raise DuploNotFound(name, "ASG Profile")
+    return self.indexed(name, "FriendlyName", "ASG Profile")
     
   @Command(model="AsgProfile")
   def create(self,
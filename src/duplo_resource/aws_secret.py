@@ -18,6 +18,7 @@ class DuploAwsSecret(DuploResourceV3):
 
   Manages [AWS Secrets Manager](https://aws.amazon.com/secrets-manager/) in the background. 
   """
+  uses_prefix = True
   
   def __init__(self, duplo: DuploCtl):
     super().__init__(duplo, "aws/secret")
@@ -196,7 +197,7 @@ class DuploAwsSecret(DuploResourceV3):
     if dryrun:
       return body
     else:
-      return super().update(name=name, body=body)
+      return super().update(name=name, body=body, live=current)
 
   @Command(model="AwsSecret")
   def apply(self,
@@ -49,12 +49,8 @@ class DuploBatchJob(DuploResourceV3):
       return get_job_list(self.prefixed_name(queue))
     else:
       queue_svc = self.duplo.load("batch_queue")
-      queues = queue_svc.list()
-      jobs = []
-      for q in queues:
-        j = get_job_list(queue_svc.name_from_body(q))
-        jobs.extend(j)
-      return jobs
+      names = [queue_svc.name_from_body(q) for q in queue_svc.list()]
+      return self.fanout(get_job_list, names, flatten=True)
 
   @Command()
   def find(self, 
@@ -3,6 +3,7 @@ from duplocloud.resource import DuploResourceV3
 from duplocloud.errors import DuploError
 from duplocloud.commander import Resource, Command
 import duplocloud.args as args
+from copy import deepcopy
 
 @Resource("batch_scheduling_policy", scope="tenant")
 class DuploBatchSchedulingPolicy(DuploResourceV3):
@@ -26,7 +27,8 @@ class DuploBatchSchedulingPolicy(DuploResourceV3):
   def update(self,
              name: args.NAME = None,
              body: args.BODY = None,
-             patches: args.PATCHES = None) -> dict:
+             patches: args.PATCHES = None,
+             live: dict = None) -> dict:
     """Update a Batch Scheduling Policy.
 
     The DuploCloud backend expects PUT to the collection endpoint
@@ -41,6 +43,7 @@ class DuploBatchSchedulingPolicy(DuploResourceV3):
       name: The name of the scheduling policy to update.
       body: The scheduling policy body.
       patches: The patches to apply to the resource.
+      live: The current policy when the caller already has it.
 
     Returns:
       resource: The updated scheduling policy.
@@ -51,7 +54,7 @@ class DuploBatchSchedulingPolicy(DuploResourceV3):
     if not name and not body:
       raise DuploError("Name is required when body is not provided")
     name = name or self.name_from_body(body)
-    current = self.find(name)
+    current = deepcopy(live or self.find(name))
     if body:
       current.update(body)
     if patches:
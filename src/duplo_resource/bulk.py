@@ -0,0 +1,152 @@
+import csv
+import shlex
+from collections.abc import Iterator
+from multiprocessing.pool import ThreadPool
+
+from duplocloud import args, codec
+from duplocloud.commander import Command, Resource, extract_args, get_command_schema
+from duplocloud.controller import DuploCtl
+from duplocloud.errors import DuploError
+from duplocloud.resource import DuploResource
+
+_TRUE = ("1", "true", "yes", "y", "on")
+
+@Resource("bulk", client=None)
+class DuploBulk(DuploResource):
+  """Bulk Commands
+
+  Run one command of any resource over many rows of arguments with a single
+  client. Authentication, the tenant lookup and the command's argument
+  parser are set up once and the rows run concurrently.
+  """
+  def __init__(self, duplo: DuploCtl):
+    super().__init__(duplo)
+
+  def __call__(self, *args, **kwargs):
+    return self.command("run")(*args, **kwargs)
+
+  @Command()
+  def run(self,
+          service: args.SERVICE,
+          command: args.COMMAND,
+          rows: args.ROWS=None,
+          parallel: args.PARALLEL=10) -> Iterator:
+    """Run a command for every row.
+
+    Each row of an NDJSON file is either an object of keyword arguments,
+    keyed by the argument names of the command, or a list of CLI arguments.
+    A CSV file has a header row of argument names, and each row goes through
+    the command's argument parser like a command line would, so the values
+    get the types the command declares. A flag column is on for `true`,
+    `yes` or `1`, a list column is split on spaces and an empty cell leaves
+    the argument out. One result is produced
+    per row, in the order of the file, as soon as that row and every row
+    before it are done. A failed row is reported and the rest keep going.
+
+    Usage: CLI Usage
+      ```sh
+      duploctl bulk <resource> <command> -f rows.ndjson --parallel 10 -o ndjson
+      ```
+
+    Example: Update many service images
+      Contents of the `images.ndjson` file
+      ```json
+      {"name": "api", "image": "nginx:1.27"}
+      ["worker", "nginx:1.27"]
+      ```
+
+      Run the updates five at a time
+      ```sh
+      duploctl bulk service update_image -f images.ndjson --parallel 5 -o ndjson
+      ```
+
+    Example: Add users from a CSV
+      ```sh
+      duploctl bulk tenant add_user -f users.csv
+      ```
+
+    Args:
+      service: The resource to run the command on.
+      command: The command to run for each row.
+      rows: The file of rows, or a list of rows when called from python.
+      parallel: The maximum number of rows to run at once.
+
+    Returns:
+      results: A generator with one `{"row", "ok", "result"}` or `{"row", "ok", "error", "code"}` object per row.
+    """
+    items = rows if isinstance(rows, list) else list(self.read(rows))
+    r = self.duplo.load(service)
+    self.duplo.prefetch(r)
+    cmd = r.command(command)
+    params = None
+    if any(isinstance(row, CsvRow) for row in items):
+      params = extract_args(getattr(r, get_command_schema(type(r), command)["method"]))
+    def exec_row(indexed):
+      i, row = indexed
+      try:
+        if isinstance(row, CsvRow):
+          result = cmd(*self.__argv(params, row))
+        elif isinstance(row, list):
+          result = cmd(*row)
+        else:
+          result = cmd(**row)
+        return {"row": i, "ok": True, "result": result}
+      except SystemExit:
+        # argparse exits on arguments it can't parse
+        return {"row": i, "ok": False, "error": f"invalid arguments {row}", "code": 400}
+      except Exception as e:
+        return {"row": i, "ok": False, "error": str(e), "code": getattr(e, "code", 500)}
+    if not items:
+      return iter(())
+    return self.__results(exec_row, list(enumerate(items)), parallel)
+
+  def read(self, rows) -> Iterator:
+    """Read rows from a NDJSON or CSV file.
+
+    Files named `*.csv` are read as CSV with a header row, anything else
+    as NDJSON. Blank lines are skipped.
+
+    Args:
+      rows: An open file.
+
+    Returns:
+      A generator of rows.
+    """
+    if rows is None:
+      return
+    if getattr(rows, "name", "").endswith(".csv"):
+      for row in csv.DictReader(rows):
+        yield CsvRow(row)
+      return
+    for line in rows:
+      if line.strip():
+        yield codec.loads(line)
+
+  def __argv(self, params: list, row: dict) -> list:
+    known = {a.attributes.get("dest", a.__name__): a for a in params}
+    unknown = [k for k in row if k not in known]
+    if unknown:
+      raise DuploError(f"unknown arguments {unknown}", 400)
+    positional, flags = [], []
+    for name, a in known.items():
+      value = row.get(name)
+      if value is None or value == "":
+        continue
+      action = a.attributes.get("action")
+      if action in ("store_true", "store_false"):
+        if (value.strip().lower() in _TRUE) == (action == "store_true"):
+          flags.append(a.flags[0])
+        continue
+      values = shlex.split(value) if a.attributes.get("nargs") not in (None, "?") else [value]
+      if a.positional:
+        positional.extend(values)
+      else:
+        flags.extend([a.flags[0], *values])
+    return positional + flags
+
+  def __results(self, fn, items, parallel):
+    with ThreadPool(max(1, min(len(items), parallel))) as pool:
+      yield from pool.imap(fn, items)
+
+class CsvRow(dict):
+  """A row read from a CSV file, every value is still a string."""
@@ -1,8 +1,10 @@
 import json
 import os
+import tempfile
 from datetime import datetime, timezone, timedelta
 from duplocloud.commander import Resource, Command
 from duplocloud.errors import DuploExpiredCache
+from duplocloud import codec
 from duplocloud.authcooldown import clear_all_caches
 
 @Resource("cache", client=None)
@@ -11,6 +13,9 @@ class DuploCache():
 
   Filesystem cache operations for storing and retrieving JSON data.
   Also provides CLI commands for managing the cache.
+
+  Writes go to a temporary file that replaces the cached file in one step,
+  so threads or processes reading a key never see a partial document.
   """
   def __init__(self, duplo):
     self.duplo = duplo
@@ -41,12 +46,16 @@ class DuploCache():
     """
     fn = f"{self.duplo.cache_dir}/{key}.json"
     if not os.path.exists(fn):
+      self.duplo.meter.cache("disk", False)
       raise DuploExpiredCache(key)
     try:
-      with open(fn, "r") as f:
-        return json.load(f)
+      with open(fn, "rb") as f:
+        data = codec.loads(f.read())
     except json.JSONDecodeError:
+      self.duplo.meter.cache("disk", False)
       raise DuploExpiredCache(key)
+    self.duplo.meter.cache("disk", True)
+    return data
 
   def set(self, key: str, data: dict) -> None:
     """Set a cached item in the cache directory.
@@ -55,11 +64,16 @@ class DuploCache():
       key: The key of the item to set.
       data: The data to set.
     """
-    if not os.path.exists(self.duplo.cache_dir):
-      os.makedirs(self.duplo.cache_dir)
+    os.makedirs(self.duplo.cache_dir, exist_ok=True)
     fn = f"{self.duplo.cache_dir}/{key}.json"
-    with open(fn, "w") as f:
-      json.dump(data, f)
+    fd, tmp = tempfile.mkstemp(dir=self.duplo.cache_dir, prefix=f".{key}.", suffix=".tmp")
+    try:
+      with os.fdopen(fd, "wb") as f:
+        f.write(codec.dumpb(data))
+      os.replace(tmp, fn)
+    except BaseException:
+      os.remove(tmp)
+      raise
 
   def key_for(self, name: str) -> str:
     """Get the cache key for the given name.
@@ -18,6 +18,7 @@ class DuploCloudFront(DuploResourceV3):
 
   See more details at: https://docs.duplocloud.com/docs/overview/aws-services/cloudfront
   """
+  uses_prefix = True
 
   def __init__(self, duplo: DuploCtl):
     super().__init__(duplo, "aws/cloudFrontDistribution")
@@ -75,13 +76,11 @@ class DuploCloudFront(DuploResourceV3):
     if not name and not distribution_id:
       raise DuploError("find requires name or distribution_id")
     if not distribution_id:
-      prefixed = self.prefixed_name(name)
-      for dist in self.list():
-        if self.name_from_body(dist) in (name, prefixed):
-          distribution_id = dist["Id"]
-          break
-      else:
+      idx = self.index()
+      dist = idx.get(name) or idx.get(self.prefixed_name(name))
+      if not dist:
         raise DuploNotFound(name, "cloudfront")
+      distribution_id = dist["Id"]
     return self.client.get(self.endpoint(distribution_id)).json()
 
   @Command(model="AmazonCloudFrontRequest")
@@ -3,6 +3,7 @@ from duplocloud.errors import DuploError
 from duplocloud.resource import DuploResourceV3
 from duplocloud.commander import Command, Resource
 import duplocloud.args as args
+from copy import deepcopy
 
 @Resource("configmap", scope="tenant")
 class DuploConfigMap(DuploResourceV3):
@@ -95,7 +96,8 @@ class DuploConfigMap(DuploResourceV3):
              body: args.BODY=None,
              data: args.DATAMAP=None,
              patches: args.PATCHES = None,
-             dryrun: args.DRYRUN=False) -> dict:
+             dryrun: args.DRYRUN=False,
+             live: dict = None) -> dict:
     """Updates a ConfigMap resource.
 
     This function allows you to modify the contents of a ConfigMap without deleting
@@ -150,6 +152,7 @@ class DuploConfigMap(DuploResourceV3):
         The options are `--add`, `--remove`, `--replace`, `--move`, and `--copy`.
         Then followed by `<path>` and `<value>` for `--add`, `--replace`, and `--test`.
       dryrun (bool, optional): If True, return the modified ConfigMap without applying changes.
+      live: The current ConfigMap when the caller already has it.
 
     Returns:
       message: The updated ConfigMap or a success message.
@@ -160,9 +163,9 @@ class DuploConfigMap(DuploResourceV3):
     if data:
       if not name:
         raise DuploError("Name is required when body is not provided")
-      body = self.find(name)
+      body = deepcopy(live or self.find(name))
       body.setdefault('data', {}).update(data or {})
-    return body if dryrun else super().update(name=name, body=body, patches=patches)
+    return body if dryrun else super().update(name=name, body=body, patches=patches, live=live)
 
   @Command()
   def find(self,
@@ -0,0 +1,78 @@
+from duplocloud import daemon
+from duplocloud.commander import Command, Resource
+from duplocloud.controller import DuploCtl
+from duplocloud.errors import DuploError
+from duplocloud.resource import DuploResource
+
+
+@Resource("daemon", client=None)
+class DuploDaemonResource(DuploResource):
+  """Warm Daemon
+
+  An opt in background process that keeps clients warm between `duploctl`
+  calls. While it runs, every `duploctl` invocation is forwarded to it over a
+  Unix socket and reuses its credentials, GET caches and resolved tenants
+  instead of starting from scratch. Without a running daemon `duploctl`
+  runs every command itself, as usual. Set `DUPLO_DAEMON_SOCKET` to choose
+  the socket.
+
+  Usage: Basic CLI Use
+    ```sh
+    duploctl daemon start &
+    duploctl service list   # served by the daemon
+    duploctl daemon stop
+    ```
+  """
+  def __init__(self, duplo: DuploCtl):
+    super().__init__(duplo)
+
+  @Command()
+  def start(self) -> None:
+    """Start the daemon.
+
+    Serves invocations in the foreground until it is stopped.
+
+    Usage: Basic CLI Use
+      ```sh
+      duploctl daemon start
+      ```
+    """
+    if daemon.request({"op": "status"}, timeout=1) is not None:
+      raise DuploError(f"A daemon is already listening on {daemon.socket_path()}", 409)
+    server = daemon.DuploDaemon()
+    self.duplo.logger.info(f"duploctl daemon listening on {server.path}")
+    server.serve()
+
+  @Command()
+  def stop(self) -> dict:
+    """Stop the daemon.
+
+    Usage: Basic CLI Use
+      ```sh
+      duploctl daemon stop
+      ```
+
+    Returns:
+      message: A message that the daemon is stopping.
+    """
+    return self.__ask("stop")
+
+  @Command()
+  def status(self) -> dict:
+    """Daemon status.
+
+    Usage: Basic CLI Use
+      ```sh
+      duploctl daemon status
+      ```
+
+    Returns:
+      status: The daemon's pid, socket, number of warm clients and requests served.
+    """
+    return self.__ask("status")
+
+  def __ask(self, op):
+    responses = daemon.request({"op": op}, timeout=1)
+    if responses is None:
+      raise DuploError(f"No daemon is listening on {daemon.socket_path()}", 404)
+    return next(responses)
@@ -11,6 +11,7 @@ class DuploEcsService(DuploResourceV2):
   A collection of commands to manage ECS services and task definitions.
   
   """
+  uses_prefix = True
 
   def __init__(self, duplo: DuploCtl):
     super().__init__(duplo)
@@ -330,7 +331,16 @@ class DuploEcsService(DuploResourceV2):
       DuploError: If the ECS task definition family could not be updated.
     """
     name = self.prefixed_name(name)
-    tdf = self.find_def(name)
+    def service_family():
+      try:
+        return self.find_service_family(name)
+      except DuploError:
+        return None
+    # the definition and the service using it are looked up together
+    tdf, svcFam = self.fanout(lambda fn: fn(), [
+      lambda: self.find_def(name),
+      service_family
+    ])
     if container_image:
       container_updates = dict(container_image)
       known_names = [c.get("Name") for c in tdf.get("ContainerDefinitions", []) if c.get("Name")]
@@ -349,11 +359,10 @@ class DuploEcsService(DuploResourceV2):
     arn = self.update_taskdef(tdf)["arn"]
     msg = "Updating a task definition and its corresponding service."
     svc = None
-    try:
-      svcFam = self.find_service_family(name)
+    if svcFam:
       svc = svcFam["DuploEcsService"]
       svc["TaskDefinition"] = arn
-    except DuploError:
+    else:
       msg = "No Service Configured, only the definition is updated."
     # run update here so the errors bubble up correctly
     if svc:
@@ -47,9 +47,8 @@ class DuploHosts(DuploResourceV2):
     prefix = f"duploservices-{self.tenant['AccountName']}-"
     search = name if name.startswith(prefix) else f"{prefix}{name}"
     try:
-      return [h for h in self.list()
-              if h.get("FriendlyName") and self.name_from_body(h) == search][0]
-    except IndexError:
+      return self.indexed(search, kind="Host")
+    except DuploNotFound:
       raise DuploNotFound(name, "Host")
 
   @Command()
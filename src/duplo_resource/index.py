@@ -0,0 +1,225 @@
+import os
+import sqlite3
+import time
+from multiprocessing.pool import ThreadPool
+
+from duplocloud import args, codec
+from duplocloud.commander import Command, Resource
+from duplocloud.controller import DuploCtl
+from duplocloud.errors import DuploError
+from duplocloud.resource import DuploResource
+
+# the kinds crawled for every tenant by default
+INDEX_KINDS = ["service", "hosts", "rds", "lambda", "faults"]
+
+@Resource("index")
+class DuploIndex(DuploResource):
+  """Local Inventory Index
+
+  A SQLite copy of the resources in every tenant of the portal. Building it
+  lists each kind in each tenant concurrently. Afterwards questions are
+  answered offline from the local file in milliseconds.
+
+  Each kind gets a table with `tenant`, `name`, `data` and `fetched`
+  columns, where `data` is the resource as JSON. The index lives in the
+  cache directory, one file per portal.
+
+  Usage: Basic CLI Use
+    ```sh
+    duploctl index <action>
+    ```
+  """
+  def __init__(self, duplo: DuploCtl):
+    super().__init__(duplo)
+    self.__path = None
+
+  @property
+  def path(self) -> str:
+    """The SQLite file of the index for the current portal."""
+    if not self.__path:
+      key = self.duplo.load("cache").key_for("index")
+      self.__path = os.path.join(self.duplo.cache_dir, f"{key}.db")
+    return self.__path
+
+  @Command()
+  def build(self,
+            kinds: args.KINDS=None,
+            max_age: args.MAX_AGE=None,
+            parallel: args.PARALLEL=10) -> dict:
+    """Build the index.
+
+    Crawl every tenant, listing each kind concurrently, and replace what the
+    index holds for each tenant and kind. With `--max-age` only the kinds a
+    tenant last fetched longer ago than that are crawled again.
+
+    Usage: Basic CLI Use
+      ```sh
+      duploctl index build
+      duploctl index build --kind service --kind hosts --max-age 3600
+      ```
+
+    Args:
+      kinds: The kinds to crawl, defaults to services, hosts, RDS, lambdas and faults.
+      max_age: Skip tenant kinds fetched fewer than this many seconds ago.
+      parallel: The maximum number of listings at once.
+
+    Returns:
+      summary: The number of objects indexed per kind, how many tenant kinds were skipped as fresh, and every listing that failed.
+    """
+    kinds = [self.__table(k) for k in (kinds or INDEX_KINDS)]
+    tenant_svc = self.duplo.load("tenant")
+    tenants = tenant_svc.list()
+    db = self.__connect()
+    try:
+      fresh = self.__fresh(db, max_age)
+      tasks = [
+        (kind, t) for t in tenants for kind in kinds
+        if (kind, t["AccountName"]) not in fresh
+      ]
+      # resources are bound to their tenant up front, on this thread
+      resources = {
+        (kind, t["AccountName"]): self.__resource(kind, t)
+        for kind, t in tasks if kind != "faults"
+      }
+      def fetch(task):
+        kind, t = task
+        try:
+          if kind == "faults":
+            return task, tenant_svc.faults(id=t["TenantId"]), None
+          return task, resources[(kind, t["AccountName"])].list(), None
+        except DuploError as e:
+          return task, None, str(e)
+      summary = {"kinds": {k: 0 for k in kinds}, "skipped": len(tenants) * len(kinds) - len(tasks), "failed": []}
+      if tasks:
+        with ThreadPool(max(1, min(len(tasks), parallel))) as pool:
+          # sqlite connections belong to one thread so rows are written here
+          for (kind, t), items, error in pool.imap_unordered(fetch, tasks):
+            if error:
+              summary["failed"].append({"kind": kind, "tenant": t["AccountName"], "error": error})
+              continue
+            r = resources.get((kind, t["AccountName"]))
+            self.__store(db, kind, t["AccountName"], r, items or [])
+            summary["kinds"][kind] += len(items or [])
+      return summary
+    finally:
+      db.close()
+
+  @Command()
+  def refresh(self,
+              kinds: args.KINDS=None,
+              max_age: args.MAX_AGE=3600,
+              parallel: args.PARALLEL=10) -> dict:
+    """Refresh the index.
+
+    Crawl again only the tenant kinds that went stale, an hour by default.
+
+    Usage: Basic CLI Use
+      ```sh
+      duploctl index refresh --max-age 600
+      ```
+
+    Args:
+      kinds: The kinds to refresh, defaults to the same kinds as build.
+      max_age: Fetch again what was fetched longer than this many seconds ago.
+      parallel: The maximum number of listings at once.
+
+    Returns:
+      summary: The same summary as build.
+    """
+    return self.build(kinds=kinds, max_age=max_age if max_age is not None else 3600, parallel=parallel)
+
+  @Command()
+  def query(self,
+            sql: args.SQL=None,
+            kinds: args.KINDS=None) -> list:
+    """Query the index.
+
+    Run SQL against the index, or return every row of the given kinds and
+    filter them with the global `--query` JMESPath. Nothing is fetched from
+    the portal. The `data` column is returned as the decoded object and the
+    SQLite JSON functions work on it.
+
+    Usage: Basic CLI Use
+      ```sh
+      duploctl index query "SELECT tenant, name FROM service WHERE json_extract(data, '$.Replicas') > 2"
+      duploctl index query --kind hosts -q "[?data.Status!='running'].[tenant, name]"
+      ```
+
+    Args:
+      sql: The SQL to run.
+      kinds: The kinds to return every row of when no SQL is given.
+
+    Returns:
+      rows: One object per row, keyed by column name.
+    """
+    if not sql and not kinds:
+      raise DuploError("Give a SQL query or at least one --kind", 400)
+    if not os.path.exists(self.path):
+      raise DuploError("The index is empty, run 'duploctl index build' first", 404)
+    db = self.__connect()
+    try:
+      if sql:
+        cursor = db.execute(sql)
+        return self.__rows(cursor)
+      rows = []
+      for kind in kinds:
+        table = self.__table(kind)
+        try:
+          rows.extend(self.__rows(db.execute(f'SELECT tenant, name, data, fetched FROM "{table}" ORDER BY tenant, name')))
+        except sqlite3.OperationalError:
+          continue
+      return rows
+    except sqlite3.Error as e:
+      raise DuploError(f"Index query failed: {e}", 400) from e
+    finally:
+      db.close()
+
+  def __connect(self):
+    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+    db = sqlite3.connect(self.path)
+    db.execute("CREATE TABLE IF NOT EXISTS _fetched (kind TEXT, tenant TEXT, fetched REAL, PRIMARY KEY (kind, tenant))")
+    return db
+
+  def __fresh(self, db, max_age):
+    if max_age is None:
+      return set()
+    since = time.time() - max_age
+    return {(k, t) for k, t in db.execute("SELECT kind, tenant FROM _fetched WHERE fetched > ?", (since,))}
+
+  def __store(self, db, kind, tenant, r, items):
+    now = time.time()
+    rows = [(tenant, self.__name(r, item, i), codec.dumps(item), now) for i, item in enumerate(items)]
+    with db:
+      db.execute(f'CREATE TABLE IF NOT EXISTS "{kind}" (tenant TEXT, name TEXT, data TEXT, fetched REAL, PRIMARY KEY (tenant, name))')
+      db.execute(f'DELETE FROM "{kind}" WHERE tenant = ?', (tenant,))
+      db.executemany(f'INSERT OR REPLACE INTO "{kind}" VALUES (?, ?, ?, ?)', rows)
+      db.execute("INSERT OR REPLACE INTO _fetched VALUES (?, ?, ?)", (kind, tenant, now))
+
+  def __resource(self, kind, tenant):
+    r = self.duplo.load(kind)
+    if getattr(r, "scope", None) == "tenant":
+      r._tenant = tenant
+      r._tenant_id = tenant["TenantId"]
+    return r
+
+  def __rows(self, cursor):
+    cols = [c[0] for c in cursor.description or []]
+    rows = []
+    for values in cursor:
+      row = dict(zip(cols, values))
+      if isinstance(row.get("data"), str):
+        row["data"] = codec.loads(row["data"])
+      rows.append(row)
+    return rows
+
+  def __table(self, kind):
+    if not kind.isidentifier():
+      raise DuploError(f"Invalid kind '{kind}'", 400)
+    return kind
+
+  def __name(self, r, item, i):
+    try:
+      name = r.name_from_body(item) if r else None
+    except (KeyError, TypeError, AttributeError, DuploError):
+      name = None
+    return str(name if name is not None else i)
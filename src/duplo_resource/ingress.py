@@ -67,7 +67,8 @@ class DuploIngress(DuploResourceV3):
   def update(self,
              name: args.NAME,
              body: args.BODY = None,
-             patches: args.PATCHES = None) -> dict:
+             patches: args.PATCHES = None,
+             live: dict = None) -> dict:
     """Update an Ingress resource.
 
     Update an existing Ingress resource with the specified metadata and data entries.
@@ -116,6 +117,7 @@ class DuploIngress(DuploResourceV3):
       patches: A list of JSON patches to apply to the Ingress resource.
         The options are `--add`, `--remove`, `--replace`, `--move`, and `--copy`.
         Then followed by `<path>` and `<value>` for `--add`, `--replace`, and `--test`.
+      live: The current Ingress when the caller already has it.
 
     Returns:
       message: The created resource or success message.
@@ -127,8 +129,8 @@ class DuploIngress(DuploResourceV3):
       if 'name' not in body or body['name'] != name:
         raise DuploError("Provided 'name' must match 'name' in the body.")
     if body is None:
-      body = self.find(name)
-    response = super().update(name=name, body=body, patches=patches)
+      body = live or self.find(name)
+    response = super().update(name=name, body=body, patches=patches, live=live)
     return {
       "message": f"Successfully Updated an Ingress '{name}'",
       "data": response
@@ -2,6 +2,7 @@ from duplocloud.controller import DuploCtl
 from duplocloud.errors import DuploError, DuploExpiredCache
 from duplocloud.resource import DuploResource
 from duplocloud.commander import Command, Resource
+from duplocloud import codec
 import duplocloud.args as args
 import os
 import sys
@@ -18,7 +19,7 @@ https://cli.duplocloud.com/Jit/
 """
 
 
-def _mask_in_ci(values):
+def _mask_in_ci(values, environ=None):
   """Register ::add-mask:: workflow commands so CI runners scrub secrets from logs.
 
   GitHub Actions logs step inputs verbatim (e.g. the `with:` block of
@@ -33,8 +34,10 @@ def _mask_in_ci(values):
     values: Iterable of secret strings to register. Empty/None values are
       skipped — `::add-mask::` with an empty value is a no-op that just
       wastes a log line.
+    environ: The environment to check, defaults to `os.environ`.
   """
-  if os.environ.get("GITHUB_ACTIONS", "").lower() != "true":
+  environ = os.environ if environ is None else environ
+  if environ.get("GITHUB_ACTIONS", "").lower() != "true":
     return
   for v in values:
     if v:
@@ -71,7 +74,7 @@ class DuploJit(DuploResource):
     Returns:
       token: The JWT token.
     """
-    _mask_in_ci([self.client.token])
+    _mask_in_ci([self.client.token], self.duplo.environ)
     return {"token": self.client.token}
 
   @Command()
@@ -113,7 +116,7 @@ class DuploJit(DuploResource):
       if "Expiration" not in sts:
         sts["Expiration"] = self.cache.expiration()
       self.cache.set(k, sts)
-    _mask_in_ci([sts.get("Token")])
+    _mask_in_ci([sts.get("Token")], self.duplo.environ)
     return sts
 
   @Command()
@@ -143,17 +146,17 @@ class DuploJit(DuploResource):
     path = f"v3/auth/argo-wf/{tenant_id}/admin"
     try:
       if nc:
-        auth_data = self.client.post(path).json()
+        auth_data = self.client.post(path, invalidate=False).json()
       else:
         auth_data = self.cache.get(k)
         if self.cache.expired(auth_data.get("ExpiresAt", None)):
           raise DuploExpiredCache(k)
     except DuploExpiredCache:
-      auth_data = self.client.post(path).json()
+      auth_data = self.client.post(path, invalidate=False).json()
       if "ExpiresAt" not in auth_data:
         auth_data["ExpiresAt"] = self.cache.expiration()
       self.cache.set(k, auth_data)
-    _mask_in_ci([auth_data.get("Token")])
+    _mask_in_ci([auth_data.get("Token")], self.duplo.environ)
     return auth_data
 
   @Command()
@@ -228,7 +231,7 @@ class DuploJit(DuploResource):
       sts.get("SecretAccessKey"),
       sts.get("SessionToken"),
       sts.get("ConsoleUrl"),
-    ])
+    ], self.duplo.environ)
     return sts
 
   @Command()
@@ -264,7 +267,7 @@ class DuploJit(DuploResource):
     Returns:
       message: The message that the profile was added.
     """
-    config = os.environ.get("AWS_CONFIG_FILE", f"{Path.home()}/.aws/config")
+    config = self.duplo.environ.get("AWS_CONFIG_FILE", f"{Path.home()}/.aws/config")
     cp = configparser.ConfigParser()
     cp.read(config)
     name = name or "duplo"
@@ -273,7 +276,7 @@ class DuploJit(DuploResource):
     is_new_profile = not cp.has_section(prf)
     if is_new_profile:
       cp.add_section(prf)
-    cp.set(prf, 'region', os.getenv("AWS_DEFAULT_REGION", "us-west-2"))
+    cp.set(prf, 'region', self.duplo.environ.get("AWS_DEFAULT_REGION", "us-west-2"))
     cp.set(prf, 'credential_process', " ".join(cmd))
     os.makedirs(os.path.dirname(os.path.abspath(config)), exist_ok=True)
     with open(config, 'w') as configfile:
@@ -342,7 +345,7 @@ class DuploJit(DuploResource):
       ctx = self.k8s_context(planId)
       creds = self.__k8s_exec_credential(ctx)
       self.cache.set(k, creds)
-    _mask_in_ci([creds.get("status", {}).get("token")])
+    _mask_in_ci([creds.get("status", {}).get("token")], self.duplo.environ)
     return creds
 
   @Command()
@@ -398,8 +401,8 @@ class DuploJit(DuploResource):
       msg: The message that the kubeconfig was updated. Unless save is False, then the kubeconfig is returned.
     """
     # first get the kubeconfig file and parse it
-    kubeconfig_path = os.environ.get("KUBECONFIG", f"{Path.home()}/.kube/config")
-    kubeconfig = (yaml.safe_load(open(kubeconfig_path, "r"))
+    kubeconfig_path = self.duplo.environ.get("KUBECONFIG", f"{Path.home()}/.kube/config")
+    kubeconfig = (yaml.load(open(kubeconfig_path, "r"), Loader=codec.SafeLoader)
                   if os.path.exists(kubeconfig_path)
                   else self.__empty_kubeconfig())
     # load the cluster config info
@@ -422,7 +425,7 @@ class DuploJit(DuploResource):
       os.makedirs(os.path.dirname(os.path.abspath(kubeconfig_path)), exist_ok=True)
       # write the kubeconfig back to the file
       with open(kubeconfig_path, "w") as f:
-        yaml.safe_dump(kubeconfig, f)
+        yaml.dump(kubeconfig, f, Dumper=codec.SafeDumper)
       return {"message": f"kubeconfig updated successfully to {kubeconfig_path}"}
     else:
       return kubeconfig
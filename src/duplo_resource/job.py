@@ -1,3 +1,4 @@
+import time
 from duplocloud.controller import DuploCtl  # Importing necessary modules
 from duplocloud.errors import DuploFailedResource, DuploStillWaiting
 from duplocloud.resource import DuploResourceV3
@@ -95,7 +96,7 @@ class DuploJob(DuploResourceV3):
       faults = self.tenant_svc.faults(id=self.tenant_id)
       for pod in pods:
         check_pod_faults(pod, faults)
-        self.__pod_svc.logs(pod=pod)
+      self.__pod_svc.follow(pods)
       # make sure we got all of the logs
       pod_count = active + succeeded + failed
       if podct != pod_count:
@@ -138,3 +139,36 @@ class DuploJob(DuploResourceV3):
       pod for pod in pods
       if pod.get("Name", None) == name and pod["ControlledBy"]["QualifiedType"] == "kubernetes:batch/v1/Job"
     ]
+
+  @Command()
+  def logs(self,
+           name: args.NAME):
+    """Job Logs
+
+    Get the logs for a Job. This will be an aggregate of all logs from the Job's pods. The pod names will be prefixed on each line. All of the pods are tailed concurrently.
+
+    Usage: CLI Usage
+      ```sh
+      duploctl job logs <name>
+      ```
+
+    Example: Watch Logs
+      This command supports the global --wait. Waits and watches for new logs. As new logs come they are printed to the console. Use ctrl+c to stop watching.
+      ```sh
+      duploctl job logs myjob --wait --loglevel INFO
+      ```
+
+    Args:
+      name: The name of the Job to get logs for.
+    """
+    def show_logs():
+      self.__pod_svc.follow(self.pods(name))
+    if self.duplo.wait:
+      try:
+        while True:
+          show_logs()
+          time.sleep(self.wait_poll)
+      except KeyboardInterrupt:
+        pass
+    else:
+      show_logs()
@@ -48,10 +48,7 @@ class DuploLambda(DuploResourceV2):
     Raises:
       DuploError: If the lambda could not be found.
     """
-    try:
-      return [s for s in self.list() if s["FunctionName"] == name][0]
-    except IndexError:
-      raise DuploNotFound(name, "Lambda")
+    return self.indexed(name, "FunctionName", "Lambda")
     
   @Command(model="AmazonLambdaRequest")
   def create(self, 
@@ -174,7 +171,8 @@ class DuploLambda(DuploResourceV2):
                name: args.NAME,
                setvar: args.SETVAR,
                strategy: args.STRATEGY,
-               deletevar: args.DELETEVAR) -> dict:
+               deletevar: args.DELETEVAR,
+               dryrun: args.DRYRUN=False) -> dict:
     """Update the environment variables of a lambda. If lambda has no environment variables set, use -strat replace to set new values.
 
     Usage: Basic CLI Use
@@ -187,6 +185,7 @@ class DuploLambda(DuploResourceV2):
       setvar/-V (list): A list of key-value pairs to set as environment variables.
       strategy/strat (str): The merge strategy to use for env vars. Valid options are "merge" or "replace". Default is merge.
       deletevar/-D (list): A list of keys to delete from the environment variables.
+      dryrun (bool): Return the patch to the variables without updating the lambda.
     """
     tenant_id = self.tenant["TenantId"]
     current_lambda = self.find(name)
@@ -202,6 +201,11 @@ class DuploLambda(DuploResourceV2):
       for key in deletevar:
         merged_env.pop(key, None)
 
+    changes = self.diff(current_env, merged_env)
+    if dryrun:
+      return {"name": name, "patch": changes}
+    if not changes:
+      return {"message": f"Environment variables for Lambda '{name}' are unchanged"}
     payload = {
       "FunctionName": name,
       "Environment": {"Variables": merged_env}
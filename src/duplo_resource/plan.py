@@ -1,5 +1,4 @@
 from duplocloud.controller import DuploCtl
-from duplocloud.errors import DuploNotFound
 from duplocloud.resource import DuploResource
 from duplocloud.commander import Command, Resource
 import duplocloud.args as args
@@ -41,10 +40,7 @@ class DuploPlan(DuploResource):
     Returns:
       dict: Plan Details
     """
-    try:
-      return [s for s in self.list() if self.name_from_body(s) == name][0]
-    except IndexError:
-      raise DuploNotFound(name, "Plan")
+    return self.indexed(name, kind="Plan")
 
   def name_from_body(self, body):
     return body["Name"]
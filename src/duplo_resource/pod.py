@@ -1,7 +1,9 @@
+import threading
+
+from duplocloud import args
+from duplocloud.commander import Command, Resource
 from duplocloud.controller import DuploCtl
 from duplocloud.resource import DuploResourceV2
-from duplocloud.commander import Command, Resource
-import duplocloud.args as args
 
 _STATUS_CODES = {
   "1": "Running",
@@ -12,6 +14,10 @@ _STATUS_CODES = {
   "11": "Succeeded"
 }
 
+# bounds for the adaptive per pod log tail
+_TAIL_MIN = 50
+_TAIL_MAX = 2000
+
 @Resource("pod", scope="tenant")
 class DuploPod(DuploResourceV2):
   
@@ -20,7 +26,8 @@ class DuploPod(DuploResourceV2):
     self.paths = {
       "list": "GetPods"
     }
-    self.__last_lines = {}
+    self.__tails = {}
+    self.__print_lock = threading.Lock()
 
   @Command()
   def logs(self,
@@ -30,6 +37,8 @@ class DuploPod(DuploResourceV2):
     
     Retrieve logs for a pod and print to stderr. This methods does not return anything. 
 
+    When called repeatedly for the same pod, only the lines which were not already printed are shown. New lines are found by matching the content of the previous window against the new one, so nothing is lost or repeated when the log rotates. The number of lines requested grows and shrinks with how fast the pod is logging.
+
     Usage: CLI Usage
       ```sh
       duploctl pod logs <name>
@@ -46,27 +55,67 @@ class DuploPod(DuploResourceV2):
     if pod["CurrentStatus"] not in [1, 11, 7] or not pod["Host"]:
       return None
     id = pod["InstanceId"]
+    state = self.__tails.setdefault(id, {"tail": _TAIL_MIN, "lines": None})
     data = {
       "HostName": pod["Host"],
       "DockerId": pod["Containers"][0]["DockerId"],
-      "Tail": 50
+      "Tail": state["tail"]
     }
-    response = self.client.post(self.endpoint("findContainerLogs"), data)
+    response = self.client.post(self.endpoint("findContainerLogs"), data, invalidate=False)
     o = response.json()
     lines = o["Data"].split("\n")
     if lines[-1] == "":
       lines.pop()
-    last = self.__last_lines.get(id, 0)
-    count = len(lines)
-    diff = count - last
-    self.__last_lines[id] = count
-    if diff > 0:
+    new = self.__new_lines(state, lines)
+    if new:
       title = id
       spaces = len(title) * " "
-      for line in lines[-diff:]:
-        self.duplo.logger.warning(f"{title}: {line}")
-        title = spaces
+      with self.__print_lock:
+        for line in new:
+          self.duplo.logger.warning(f"{title}: {line}")
+          title = spaces
     return None
 
+  def follow(self, pods: list, workers: int = 10) -> None:
+    """Follow Pod Logs
+
+    Fetch the logs for many pods at once. Each pod is tailed on its own thread and its new lines are printed, prefixed with the pod name, as soon as they arrive. Call this repeatedly to watch a set of pods, the lines seen for pods no longer in the set are forgotten.
+
+    info:
+      This is not a cli command. It's used by the service and job logs commands but could be useful in a custom script.
+
+    Args:
+      pods: The pod objects to retrieve logs for.
+      workers: The maximum number of pods to fetch concurrently.
+    """
+    ids = {pod["InstanceId"] for pod in pods}
+    for id in [id for id in self.__tails if id not in ids]:
+      del self.__tails[id]
+    self.fanout(lambda pod: self.logs(pod=pod), pods, workers)
+
+  def __new_lines(self, state: dict, lines: list) -> list:
+    """Lines not seen in the previous window and adjust the tail for the next poll."""
+    prev = state["lines"]
+    state["lines"] = lines
+    if prev is None:
+      return lines
+    # the last place the previous window ends in the new one, the windows
+    # agree back to the start of either since the new one may start earlier
+    # or later than the previous one did
+    end = None
+    for j in range(len(lines) - 1, -1, -1) if prev else []:
+      n = min(j + 1, len(prev))
+      if lines[j - n + 1:j + 1] == prev[-n:]:
+        end = j + 1
+        break
+    new = lines if end is None else lines[end:]
+    tail = state["tail"]
+    # no overlap means lines were missed or the log was rotated
+    if (prev and end is None) or len(new) > tail // 2:
+      state["tail"] = min(tail * 2, _TAIL_MAX)
+    elif len(new) < tail // 8:
+      state["tail"] = max(tail // 2, _TAIL_MIN)
+    return new
+
   def name_from_body(self, body):
     return body["InstanceId"]
@@ -0,0 +1,57 @@
+from duplocloud import args
+from duplocloud.commander import Command, Resource
+from duplocloud.controller import DuploCtl
+from duplocloud.errors import DuploError
+from duplocloud.proxy import METRICS_PATH, CachingProxy
+from duplocloud.resource import DuploResource
+
+
+@Resource("proxy", client=None)
+class DuploProxy(DuploResource):
+  """Caching Proxy
+
+  Run a local HTTP server that forwards to the portal with each caller's own
+  bearer token. GETs are cached per token, with a TTL per endpoint, and
+  identical GETs that arrive together share one request to the portal. This
+  lets many CI jobs or tools on one host share the common reads like
+  `adminproxy/GetTenantNames` or `v3/features/system`. The hit and miss
+  counters are served at `/_proxy/metrics`.
+  """
+  def __init__(self, duplo: DuploCtl):
+    super().__init__(duplo)
+
+  def __call__(self, *args, **kwargs):
+    return self.command("run")(*args, **kwargs)
+
+  @Command()
+  def run(self, port: args.PORT=8787) -> None:
+    """Serve the proxy.
+
+    Serves in the foreground until interrupted. Only the portal host is
+    needed, the proxy never uses a token of its own.
+
+    Usage: CLI Usage
+      ```sh
+      duploctl proxy --port 8787
+      ```
+
+    Example: Point other jobs at the proxy
+      ```sh
+      duploctl proxy --port 8787 &
+      DUPLO_HOST=http://127.0.0.1:8787 duploctl tenant list
+      curl -s http://127.0.0.1:8787/_proxy/metrics
+      ```
+
+    Args:
+      port: The local port to listen on.
+    """
+    if not self.duplo.host:
+      raise DuploError("A portal host is required to run the proxy", 400)
+    server = CachingProxy(self.duplo.host, port=port, timeout=self.duplo.timeout)
+    self.duplo.logger.info(f"Proxying {server.upstream} on http://127.0.0.1:{server.server_port}, metrics at {METRICS_PATH}")
+    try:
+      server.serve_forever()
+    except KeyboardInterrupt:
+      pass
+    finally:
+      server.server_close()
@@ -7,6 +7,8 @@ import duplocloud.args as args
 
 @Resource("s3", scope="tenant")
 class DuploS3(DuploResourceV3):
+  uses_prefix = True
+
   def __init__(self, duplo: DuploCtl):
     super().__init__(duplo, "aws/s3Bucket")
     self._aws_account_id = None
@@ -72,7 +74,8 @@ class DuploS3(DuploResourceV3):
   def update(self,
              name: args.NAME = None,
              body: args.BODY = None,
-             patches: args.PATCHES = None) -> dict:
+             patches: args.PATCHES = None,
+             live: dict = None) -> dict:
     """Update an S3 bucket.
 
     Usage: CLI Usage
@@ -84,6 +87,7 @@ class DuploS3(DuploResourceV3):
       name: The name of the bucket to update.
       body: The updated bucket configuration.
       patches: The patches to apply to the bucket.
+      live: The current bucket when the caller already has it.
 
     Returns:
       dict: The updated bucket details.
@@ -94,7 +98,7 @@ class DuploS3(DuploResourceV3):
     if not name and not body:
       raise DuploError("Name is required when body is not provided")
     name = name if name else self.name_from_body(body)
-    current = self.find(name)
+    current = live or self.find(name)
     full_name = self.name_from_body(current)
     if body:
       body["Name"] = full_name
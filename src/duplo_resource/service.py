@@ -405,7 +405,8 @@ class DuploService(DuploResourceV2):
                  name: args.NAME,
                  setvar: args.SETVAR,
                  strategy: args.STRATEGY,
-                 deletevar: args.DELETEVAR) -> dict:
+                 deletevar: args.DELETEVAR,
+                 dryrun: args.DRYRUN=False) -> dict:
     """Update environment variables
 
     Updates the environment variables of a service. If service has no environment variables set, use -strat replace to set new values.
@@ -431,6 +432,10 @@ class DuploService(DuploResourceV2):
       setvar: A list of key value pairs to set as environment variables.
       strategy: The merge strategy to use for env vars. Valid options are "merge" or "replace".  Default is merge.
       deletevar: A list of keys to delete from the environment variables.
+      dryrun: Return the patch to the docker config without updating the service.
+
+    Returns:
+      message: A message about success, or the name and patch on a dry run. Nothing is updated or waited on when the variables already match.
     """
     # Returns an array of key and value mappings with provided keys
     def new_env_vars(setvar, key_name="Name", value_name="Value"):
@@ -485,6 +490,11 @@ class DuploService(DuploResourceV2):
           currentDockerconfig['Env'] = [d for d in currentDockerconfig['Env'] if d['Name'] != key]
         except KeyError:
           currentDockerconfig['Env'] = [d for d in currentDockerconfig['Env'] if d['name'] != key]
+    changes = self.diff(loads(raw_config), currentDockerconfig)
+    if dryrun:
+      return {"name": name, "patch": changes}
+    if not changes:
+      return {"message": f"Environment variables for service '{name}' are unchanged"}
     payload = {
       "Name": name,
       "OtherDockerConfig": dumps(currentDockerconfig),
@@ -501,7 +511,8 @@ class DuploService(DuploResourceV2):
                  name: args.NAME,
                  setvar: args.SETVAR,
                  strategy: args.STRATEGY,
-                 deletevar: args.DELETEVAR):
+                 deletevar: args.DELETEVAR,
+                 dryrun: args.DRYRUN=False):
 
     """Update pod labels
 
@@ -518,9 +529,10 @@ class DuploService(DuploResourceV2):
       setvar: A list of key value pairs to set as environment variables.
       strategy: The merge strategy to use for env vars. Valid options are "merge" or "replace".  Default is merge.
       deletevar: A list of keys to delete from the environment variables.
+      dryrun: Return the patch to the docker config without updating the service.
 
     Returns:
-      message: A message about success.
+      message: A message about success, or the name and patch on a dry run. Nothing is updated or waited on when the labels already match.
     """
     service = self.find(name)
     raw_config = service["Template"].get("OtherDockerConfig") or "{}"
@@ -551,6 +563,11 @@ class DuploService(DuploResourceV2):
       for key in deletevar:
         del currentDockerconfig['PodLabels'][key]
 
+    changes = self.diff(loads(raw_config), currentDockerconfig)
+    if dryrun:
+      return {"name": name, "patch": changes}
+    if not changes:
+      return {"message": f"Pod labels for service '{name}' are unchanged"}
     payload = {
       "Name": name,
       "OtherDockerConfig": dumps(currentDockerconfig),
@@ -744,9 +761,7 @@ class DuploService(DuploResourceV2):
            name: args.NAME) -> dict:
     """Service Logs
 
-    Get the logs for a service. This will be an aggregate of all logs from the pods. The pod names will be prefixed on each line.
-
-    Get the logs for a service.
+    Get the logs for a service. This will be an aggregate of all logs from the pods. The pod names will be prefixed on each line. All of the pods are tailed concurrently.
 
     Usage: Basic CLI Use
       ```sh
@@ -766,9 +781,7 @@ class DuploService(DuploResourceV2):
       logs: A big list of logs.
     """
     def show_logs():
-      pods = self.pods(name)
-      for pod in pods:
-        self._pod_svc.logs(pod=pod)
+      self._pod_svc.follow(self.pods(name))
     if self.duplo.wait:
       try:
         while True:
@@ -114,7 +114,8 @@ class DuploParam(DuploResourceV3):
              patches: args.PATCHES = None,
              strategy: args.STRATEGY = 'merge',
              value: args.CONTENT = None,
-             dryrun: args.DRYRUN = False) -> dict:
+             dryrun: args.DRYRUN = False,
+             live: dict = None) -> dict:
     """Update an SSM Parameter.
 
     Supports three invocation styles:
@@ -138,6 +139,8 @@ class DuploParam(DuploResourceV3):
       -strat/--strategy: whether to merge or overwrite StringList Parameters (default is merge, not used for SecureString or String params)
       -pval/--parametervalue: The new value for the SSM Parameter.  Overwrites existing unless merging with StringList parameters.
       dryrun: Return the computed body instead of PUTting it.
+      live: The current parameter from apply. It is not reused for a
+        body, since it was fetched without its sensitive value.
 
     Returns:
       resource: The SSM Parameter object.
@@ -1,6 +1,5 @@
 from duplocloud.controller import DuploCtl
 from duplocloud.resource import DuploResourceV2
-from duplocloud.errors import DuploNotFound
 from duplocloud.commander import Command, Resource
 import duplocloud.args as args
 
@@ -23,10 +22,7 @@ class DuploUser(DuploResourceV2):
   def find(self,
            name: args.NAME):
     """Find a User by their username."""
-    try:
-      return [u for u in self.list() if u["Username"] == name][0]
-    except IndexError:
-      raise DuploNotFound(name, "User")
+    return self.indexed(name, kind="User")
 
   @Command()
   def create(self,
@@ -41,9 +41,18 @@ CONFIG = Arg('configfile', '--config-file',
             env='DUPLO_CONFIG')
 
 CONTEXT = Arg("context", "--ctx",
-              help='Use the specified context from the config file.',
+              help='Use the specified context from the config file, a comma separated list runs the command on each of them.',
               env='DUPLO_CONTEXT')
 
+ALL_CONTEXTS = Arg("all-contexts", "--all-contexts",
+              help='Run the command on every context in the config file.',
+              type=bool,
+              action='store_true')
+"""All Contexts
+
+Runs the command against every context in the config file at once, each with its own client, token and cache. The results are keyed by context name. Give `--ctx a,b,c` to pick the contexts instead.
+"""
+
 HOST = Arg('host', '-H',
             help='The URL to specified Duplo portal.',
             env='DUPLO_HOST')
@@ -60,6 +69,18 @@ TENANT = Arg("tenant", "-T",
 Scopes the command into the specified tenant. In the background the TENANT_ID is discovered using this name. So if TENANT_ID is set, this is ignored. Often times this is set as an environment variable so you don't have to choose the tenant each and every command. This can also be set in the config file within a context.
 """
 
+TENANTS = Arg("tenants", "--tenants",
+             help='A comma separated list of tenants to run the command in, each on its own.')
+"""Tenants
+
+Runs the command once in each of the given tenants at once and keys the results by tenant name. The tenants are resolved from a single tenant listing and every run shares the same portal connection and caches.
+"""
+
+ALL_TENANTS = Arg("all-tenants", "--all-tenants",
+             help='Run the command in every tenant.',
+             type=bool,
+             action='store_true')
+
 TENANT_ID = Arg("tenantid", "--tenant-id", "--tid",
              help='The tenant id',
              env='DUPLO_TENANT_ID')
@@ -113,6 +134,16 @@ NOCACHE = Arg("no-cache","--nocache",
               type=bool,
               action='store_true')
 
+TENANT_CACHE = Arg("tenant-cache", "--tenant-cache",
+              help='Persist the resolved tenant and resource name prefix to the cache directory.',
+              type=bool,
+              action='store_true',
+              env='DUPLO_TENANT_CACHE')
+"""Tenant Cache
+
+The tenant, its id and the resource name prefix are resolved once per DuploCtl and shared by every resource. With this flag they are also saved to the cache directory for an hour so the next command in the same tenant skips those lookups entirely.
+"""
+
 AUTH_COOLDOWN = Arg("auth-cooldown", "--auth-cooldown",
               help='Enable auth cooldown to prevent duplicate browser login prompts (e.g. "true" for 60m default, or "30m", "2h" for custom).',
               env='DUPLO_AUTH_COOLDOWN',
@@ -139,6 +170,13 @@ OUTPUT = Arg("output", "-o",
 QUERY = Arg("query", "-q",
             help='The jmespath query to run on a result')
 
+FIELDS = Arg("fields", "--fields",
+            help='Comma separated fields to keep in the output of list and find, dotted paths select nested fields. The whole objects are still fetched and cached')
+"""Fields
+
+An output projection of the results of `list` and `find`. Only the named fields are passed on to `--query`, the formatter and the caller. The whole objects are still fetched and cached, so this trims what is printed rather than what is downloaded.
+"""
+
 PATCHES = Arg("patches", "--add", "--remove", "--copy", "--replace", "--test", "--move",
               help='The json patch to apply',
               action=JsonPatchAction)
@@ -160,6 +198,44 @@ SERVICE = Arg('service',
 COMMAND = Arg('command',
              help='The subcommand to run')
 
+ROWS = Arg("rows", "-f", "--rows",
+            help='A NDJSON or CSV file with one set of command arguments per row',
+            type=argparse.FileType('r'))
+
+MANIFESTS = Arg("manifests", "-f", "--filename",
+            help='A YAML file or a directory tree of YAML files, may be repeated',
+            action='append')
+
+OUT = Arg("out", "--out",
+            help='A directory, or a .tar.gz file, to write to')
+
+KINDS = Arg("kinds", "--kind",
+            help='A resource kind to include, may be repeated',
+            action='append')
+
+INCREMENTAL = Arg("incremental", "--incremental",
+            help='Only rewrite what changed since the last run',
+            type=bool,
+            action='store_true')
+
+SQL = Arg("sql",
+            nargs='?',
+            help='A SQL query to run')
+
+MAX_AGE = Arg("max_age", "--max-age",
+            help='Only fetch what is older than this many seconds',
+            type=int)
+
+PORT = Arg("port", "--port",
+            help='The local port to listen on',
+            type=int,
+            default=8787)
+
+PARALLEL = Arg("parallel", "--parallel",
+            help='The maximum number of tasks to run at once',
+            type=int,
+            default=10)
+
 # generic first positional arg for resource name
 NAME = Arg("name",
             nargs='?',
@@ -332,6 +408,35 @@ VALIDATE = Arg("validate", "--validate",
                action='store_true',
                env='DUPLO_VALIDATE')
 
+TRACE = Arg("trace", "--trace",
+               help='Write a Chrome trace of the command to this file, open it in Perfetto.')
+"""Trace
+
+Records how long authentication, tenant resolution, each API request, wait polls, the command itself, the query and the formatting took. The spans are written in the Chrome trace event format when the command finishes, and the file loads directly in [Perfetto](https://ui.perfetto.dev).
+"""
+
+PROFILE = Arg("profile", "--profile",
+               choices=["cpu", "mem"],
+               help='Profile the CPU or memory of each phase of the command.')
+"""Profile
+
+Breaks the cost of a command down by phase, the loading of the resource, the command itself, the query and the formatting. With `cpu` the phases run under cProfile and the stats are written to `duploctl.prof` along with collapsed stacks in `duploctl.folded` for flamegraphs. With `mem` tracemalloc reports the sites that allocated the most in each phase and the peak. The report is printed to stderr when the command finishes.
+"""
+
+HAR = Arg("har", "--har",
+               help='Write every HTTP request and response to this file as a HAR archive.')
+"""HAR
+
+Records each request to the portal and the Argo proxy with its timings, sizes, status and whether a GET was answered from the cache. The archive is written in the HAR 1.2 format when the command finishes and loads as a waterfall in browser dev tools or any HAR viewer. Credential headers like `Authorization` and `duplotoken` are redacted and bodies are left out, so the archive can be shared.
+"""
+
+METRICS_FILE = Arg("metrics-file", "--metrics-file",
+               help='Write the request, cache, retry and wait metrics to this file in the Prometheus text format.')
+"""Metrics File
+
+Writes the metrics of the run in the Prometheus text format when the command finishes, for batch jobs to leave next to their artifacts or for a node exporter textfile collector to pick up. The same metrics are available to Python callers from `duplo.metrics()`.
+"""
+
 WAIT_TIMEOUT = Arg("wait_timeout", "--wait-timeout", "--timeout",
                help = 'Wait timeout for the operation to complete',
                type = int)
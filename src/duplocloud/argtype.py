@@ -8,6 +8,7 @@ import yaml
 import json
 import os
 from .errors import DuploError
+from . import codec
 
 class Arg(NewType):
   """Duplo ArgType
@@ -88,8 +89,18 @@ class Arg(NewType):
   
   @property
   def default(self):
+    return self.default_in(os.environ)
+
+  def default_in(self, environ) -> any:
+    """The default value, read from the env var in the given environment when it is set.
+
+    Args:
+      environ: The environment to read the env var from.
+    Returns:
+      The default value.
+    """
     if self.env:
-      return os.getenv(self.env, self.__default)
+      return environ.get(self.env, self.__default)
     else:
       return self.__default
   
@@ -112,7 +123,7 @@ class YamlAction(argparse.Action):
   def __init__(self, option_strings, dest, nargs=None, **kwargs):
     super().__init__(option_strings, dest, **kwargs)
   def __call__(self, parser, namespace, value, option_string=None):
-    data = yaml.load(value, Loader=yaml.FullLoader)
+    data = yaml.load(value, Loader=codec.FullLoader)
     setattr(namespace, self.dest, data)
 
 class StdinTextAction(argparse.Action):
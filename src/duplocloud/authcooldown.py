@@ -37,12 +37,13 @@ def get_host_cache_key(host: str) -> str:
   return host.replace("/", "")
 
 
-def is_auth_cooldown_enabled(val=None) -> tuple[int, bool]:
+def is_auth_cooldown_enabled(val=None, environ=None) -> tuple[int, bool]:
   """Check whether auth cooldown is enabled.
 
   Args:
     val: Explicit cooldown value (from CLI arg). Falls back to
       DUPLO_AUTH_COOLDOWN env var when None.
+    environ: The environment to read the env var from, defaults to `os.environ`.
 
   Values: "true"/"1" -> 60m default, valid duration string (e.g. "30m") -> parsed,
   unset/"false"/"0" -> disabled.
@@ -51,7 +52,8 @@ def is_auth_cooldown_enabled(val=None) -> tuple[int, bool]:
     A tuple of (duration_seconds, enabled).
   """
   if val is None:
-    val = os.environ.get(AUTH_COOLDOWN_ENV_VAR, "")
+    environ = os.environ if environ is None else environ
+    val = environ.get(AUTH_COOLDOWN_ENV_VAR, "")
   if not val:
     return 0, False
 
@@ -1,19 +1,35 @@
-from duplocloud.controller import DuploCtl
-from duplocloud.errors import DuploError
-from sys import exit
+import sys
+from duplocloud import daemon
 
 def main():
+  # hand the invocation to a warm daemon when one is running
+  code = daemon.forward(sys.argv[1:])
+  if code is not None:
+    sys.exit(code)
+  run()
+
+def run():
+  from collections.abc import Iterator
+  from duplocloud.controller import DuploCtl
+  from duplocloud.errors import DuploError
+  duplo = None
   try:
     duplo, args = DuploCtl.from_env()
     o = duplo(*args)
-    if o:
+    if isinstance(o, Iterator):
+      for line in o:
+        print(line, flush=True)
+    elif o:
       print(o)
   except DuploError as e:
     print(e)
-    exit(e.code)
+    sys.exit(e.code)
   except Exception as e:
     print(f"An unexpected error occurred: {e}")
-    exit(1)
+    sys.exit(1)
+  finally:
+    if duplo:
+      duplo.flush_telemetry()
 
 if __name__ == "__main__":
   main()
@@ -1,8 +1,14 @@
+import sys
+import time
+import threading
 import requests
 from cachetools import cachedmethod, TTLCache
+from cachetools.keys import hashkey
 from duplocloud.commander import Client
 from duplocloud.errors import DuploError, DuploExpiredCache, DuploNotFound, DuploConnectionError
 from duplocloud.server import TokenServer
+from duplocloud import codec
+from duplocloud.telemetry import path_template, body_sizes
 from duplocloud.authcooldown import (
     is_auth_cooldown_enabled, is_tty, check_cooldown_before_listen,
     recover_relay_bind_failure, acquire_or_update_cooldown, clear_auth_cooldown,
@@ -21,10 +27,20 @@ class DuploAPI():
 
   HTTP client for the Duplo API. Handles authentication, request caching,
   and response validation.
+
+  A client is safe to share between threads. The caches are guarded by one
+  lock, concurrent GETs of the same path wait for the first one instead of
+  sending their own, each name index is built once, and only one thread
+  ever logs in interactively.
   """
   def __init__(self, duplo):
     self.duplo = duplo
+    self._lock = threading.RLock()
+    self._cond = threading.Condition(self._lock)
+    self._token_lock = threading.Lock()
+    self._index_locks = {}
     self._ttl_cache = TTLCache(maxsize=128, ttl=10)
+    self._index_cache = TTLCache(maxsize=128, ttl=10)
     self.cache = duplo.load("cache")
 
   @property
@@ -32,7 +48,10 @@ class DuploAPI():
     if not self.duplo.host:
       raise DuploError("Host for Duplo portal is required", 500)
     if not self.duplo.token and self.duplo.interactive:
-      self.duplo.token = self.interactive_token()
+      with self._token_lock:
+        if not self.duplo.token:
+          with self.duplo.span("login", "auth"):
+            self.duplo.token = self.interactive_token()
     if not self.duplo.token:
       raise DuploError("Token for Duplo portal is required", 500)
     return self.duplo.token
@@ -74,7 +93,7 @@ class DuploAPI():
     Returns:
       The token as a string.
     """
-    cooldown_duration, cooldown_enabled = is_auth_cooldown_enabled(self.duplo.auth_cooldown)
+    cooldown_duration, cooldown_enabled = is_auth_cooldown_enabled(self.duplo.auth_cooldown, self.duplo.environ)
     use_cooldown = cooldown_enabled and not is_tty()
 
     open_browser = True
@@ -168,43 +187,82 @@ class DuploAPI():
     headers = self._headers()
     if extra_headers:
       headers.update(extra_headers)
-    try:
-      response = requests.request(
-        method,
-        url=f"{self.duplo.host}/{path}",
-        headers=headers,
-        timeout=self.duplo.timeout,
-        **kwargs,
-      )
-    except requests.exceptions.Timeout as e:
-      raise DuploConnectionError("Request timed out while connecting to Duplo") from e
-    except requests.exceptions.ConnectionError as e:
-      raise DuploConnectionError("Failed to establish connection with Duplo") from e
-    except requests.exceptions.RequestException as e:
-      raise DuploConnectionError("Failed to send request to Duplo") from e
-    return self._validate_response(response)
-
-  @cachedmethod(lambda self: self._ttl_cache)
+    template = path_template(path)
+    span_args = {"method": method, "path": template}
+    if method == "GET":
+      span_args["cache"] = "miss"
+    url = f"{self.duplo.host}/{path}"
+    response, status, received, sent = None, "error", 0, 0
+    started, start = time.time(), time.perf_counter()
+    with self.duplo.span(f"{method} {template}", "http", **span_args) as span:
+      try:
+        response = requests.request(
+          method,
+          url=url,
+          headers=headers,
+          timeout=self.duplo.timeout,
+          **kwargs,
+        )
+        status = span["status"] = response.status_code
+        received, sent = body_sizes(response, kwargs.get("stream", False))
+        span["bytes"] = received
+      except requests.exceptions.Timeout as e:
+        raise DuploConnectionError("Request timed out while connecting to Duplo") from e
+      except requests.exceptions.ConnectionError as e:
+        raise DuploConnectionError("Failed to establish connection with Duplo") from e
+      except requests.exceptions.RequestException as e:
+        raise DuploConnectionError("Failed to send request to Duplo") from e
+      finally:
+        elapsed = time.perf_counter() - start
+        self.duplo.meter.request("duplo", method, path, status, elapsed, received, sent)
+        if self.duplo.archive:
+          self.duplo.archive.record("duplo", method, url, headers, started, elapsed, response,
+                                    stream=kwargs.get("stream", False), cache=span_args.get("cache"),
+                                    error=sys.exc_info()[1])
+      return self._validate_response(codec.bind_json(response))
+
   def get(self, path: str):
     """Get a Duplo resource.
 
-    This request is cached for 60 seconds.
+    This request is cached for 10 seconds.
 
     Args:
       path: The path to the resource.
     Returns:
       The resource as a JSON object.
     """
+    with self._lock:
+      hit = hashkey(path) in self._ttl_cache
+    self.duplo.meter.cache("get", hit)
+    if not hit or not (self.duplo.tracer or self.duplo.archive):
+      return self._cached_get(path)
+    template = path_template(path)
+    started, start = time.time(), time.perf_counter()
+    with self.duplo.span(f"GET {template}", "http", method="GET", path=template, cache="hit"):
+      response = self._cached_get(path)
+    if self.duplo.archive:
+      self.duplo.archive.record("duplo", "GET", f"{self.duplo.host}/{path}", {}, started,
+                                time.perf_counter() - start, response, cache="hit")
+    return response
+
+  @cachedmethod(lambda self: self._ttl_cache,
+                lock=lambda self: self._lock,
+                condition=lambda self: self._cond)
+  def _cached_get(self, path: str):
     return self._request("GET", path)
 
-  def post(self, path: str, data: dict={}, headers: dict=None, **kwargs):
+  def post(self, path: str, data: dict={}, headers: dict=None, invalidate: bool=True, **kwargs):
     """Post data to a Duplo resource.
 
+    A POST is taken to be a write and drops the caches, unless `invalidate`
+    is off for the endpoints that only read, like `findContainerLogs`.
+
     Args:
       path: The path to the resource.
       data: The data to post.
       headers: Optional headers merged over the default auth headers
         (e.g. ``{"Accept": "text/event-stream"}``).
+      invalidate: Drop the GET cache and name indexes after the request.
       kwargs: Extra arguments forwarded to the underlying request, such as
         ``stream=True`` for SSE / chunked responses. When streaming, the
         response is returned unbuffered so callers can iterate
@@ -214,7 +272,10 @@ class DuploAPI():
       The response as a JSON object, or a streaming response when
       ``stream=True`` is passed.
     """
-    return self._request("POST", path, json=data, extra_headers=headers, **kwargs)
+    response = self._request("POST", path, json=data, extra_headers=headers, **kwargs)
+    if invalidate:
+      self.invalidate()
+    return response
 
   def put(self, path: str, data: dict={}):
     """Put data to a Duplo resource.
@@ -225,7 +286,9 @@ class DuploAPI():
     Returns:
       The response as a JSON object.
     """
-    return self._request("PUT", path, json=data)
+    response = self._request("PUT", path, json=data)
+    self.invalidate()
+    return response
 
   def delete(self, path: str):
     """Delete a Duplo resource.
@@ -235,11 +298,54 @@ class DuploAPI():
     Returns:
       The response as a JSON object.
     """
-    return self._request("DELETE", path)
+    response = self._request("DELETE", path)
+    self.invalidate()
+    return response
+
+  def index(self, key: tuple, build: callable) -> dict:
+    """Name Index
+
+    Get a name to object index for a list of resources. The index is built
+    once with the given builder and kept for the same TTL as the GET cache,
+    so many lookups against the same list only download and scan it once.
+
+    Args:
+      key: Identifies the list, usually the resource kind, scope and key field.
+      build: Zero-arg callable returning the index when it is missing.
+    Returns:
+      The index as a dict.
+    """
+    with self._lock:
+      build_lock = self._index_locks.setdefault(key, threading.Lock())
+    with build_lock:
+      with self._lock:
+        try:
+          idx = self._index_cache[key]
+          self.duplo.meter.cache("index", True)
+          return idx
+        except KeyError:
+          pass
+      self.duplo.meter.cache("index", False)
+      idx = build()
+      with self._lock:
+        self._index_cache[key] = idx
+      return idx
+
+  def invalidate(self) -> None:
+    """Invalidate Caches
+
+    Drop the cached GET responses and name indexes. Any write through this
+    client calls this so subsequent reads see the change.
+    """
+    with self._lock:
+      self._ttl_cache.clear()
+      self._index_cache.clear()
 
   def disable_get_cache(self) -> None:
     """Disable the get cache for this client."""
-    self._ttl_cache = _NullCache()
+    with self._lock:
+      self._ttl_cache = _NullCache()
+      self._index_cache = _NullCache()
 
   def _headers(self) -> dict:
     t = self.token
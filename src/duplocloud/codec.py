@@ -0,0 +1,118 @@
+"""
+Encoding and decoding of the data the CLI sends, receives, caches and prints.
+
+JSON goes through [orjson](https://github.com/ijl/orjson) when it is installed
+(`pip install duplocloud-client[fast]`) and falls back to the standard library
+otherwise. Set `DUPLO_JSON=json` to force the standard library. The `json` and
+`ndjson` output formats always use the standard library, orjson writes compact
+separators and raw UTF-8, which would change what users see.
+
+YAML uses the libyaml backed loaders and dumpers when PyYAML was built with
+libyaml, and the pure python ones otherwise. Both produce the same documents,
+except that libyaml leaves out the `...` end marker after a plain scalar, so
+`dump_yaml` writes scalars with the pure python dumper.
+"""
+import json
+import os
+
+import yaml
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+from requests import Response
+
+BACKEND = "orjson" if orjson and os.getenv("DUPLO_JSON", "orjson") != "json" else "json"
+"""The JSON backend in use, either `orjson` or `json`."""
+
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+FullLoader = getattr(yaml, "CFullLoader", yaml.FullLoader)
+SafeDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+Dumper = getattr(yaml, "CDumper", yaml.Dumper)
+
+def dump_yaml(obj, safe: bool = False) -> str:
+  """Encode a python object to a YAML string.
+
+  Mappings and sequences go through the libyaml dumper when it is available.
+  Anything else is a lone scalar, which is small, and goes through the pure
+  python dumper so it keeps the `...` document end marker.
+
+  Args:
+    obj: The python object to encode.
+    safe: Only encode standard YAML tags.
+
+  Returns:
+    The YAML document.
+  """
+  if isinstance(obj, (dict, list, tuple)):
+    dumper = SafeDumper if safe else Dumper
+  else:
+    dumper = yaml.SafeDumper if safe else yaml.Dumper
+  return yaml.dump(obj, Dumper=dumper)
+
+def loads(data):
+  """Decode JSON from a str or bytes.
+
+  Args:
+    data: The JSON document.
+
+  Returns:
+    The decoded python object.
+
+  Raises:
+    json.JSONDecodeError: If the document is not valid JSON.
+  """
+  if BACKEND == "orjson":
+    return orjson.loads(data)
+  return json.loads(data)
+
+def dumpb(obj) -> bytes:
+  """Encode a python object to JSON bytes.
+
+  Objects the accelerated backend can't encode, like integers over 64 bits,
+  are handed to the standard library instead.
+
+  Args:
+    obj: The python object to encode.
+
+  Returns:
+    The UTF-8 encoded JSON document.
+  """
+  if BACKEND == "orjson":
+    try:
+      return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    except TypeError:
+      pass
+  return json.dumps(obj).encode()
+
+def dumps(obj) -> str:
+  """Encode a python object to a JSON string.
+
+  Args:
+    obj: The python object to encode.
+
+  Returns:
+    The JSON document as a string.
+  """
+  if BACKEND == "orjson":
+    return dumpb(obj).decode()
+  return json.dumps(obj)
+
+def bind_json(response):
+  """Decode a response's JSON with the configured backend.
+
+  Replaces `response.json()` so every resource calling it gets the faster
+  decoder without any changes. Anything that isn't a real
+  `requests.Response`, and every response under the standard library
+  backend, is returned untouched.
+
+  Args:
+    response: A `requests.Response`.
+
+  Returns:
+    The same response.
+  """
+  if BACKEND == "orjson" and type(response) is Response:
+    response.json = lambda **kwargs: loads(response.content)
+  return response
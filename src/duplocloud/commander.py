@@ -21,7 +21,11 @@ def _inject_tenant_scope(cls):
   """Inject tenant-scoped functionality into a resource class.
   
   This adds properties and methods needed for tenant-scoped resources without
-  requiring deep inheritance hierarchies.
+  requiring deep inheritance hierarchies. The resolved tenant, tenant id and
+  prefix are kept in the DuploCtl's shared tenant scope so every resource
+  loaded from it resolves them only once. They are resolved while holding
+  the tenant's scope lock, so threads sharing a DuploCtl never look them up
+  twice.
   
   Args:
     cls: The class to inject tenant functionality into.
@@ -45,7 +49,16 @@ def _inject_tenant_scope(cls):
   @property
   def tenant(self):
     if not self._tenant:
-      self._tenant = self.tenant_svc.find()
+      scope = self.duplo.tenant_scope()
+      if not scope.get("tenant"):
+        with self.duplo.scope_lock():
+          if not scope.get("tenant"):
+            with self.duplo.span("resolve tenant", "scope"):
+              t = self.tenant_svc.find()
+            scope["tenant_id"] = t["TenantId"]
+            scope["tenant"] = t
+            self.duplo.save_tenant_scope()
+      self._tenant = scope["tenant"]
       self._tenant_id = self._tenant["TenantId"]
     return self._tenant
   
@@ -69,15 +82,22 @@ def _inject_tenant_scope(cls):
   @property
   def prefix(self):
     if not self._prefix:
-      resource_prefix = "duploservices"
-      try:
-        info = self.duplo.load("system").info()
-        rp = info.get("ResourceNamePrefix")
-        if isinstance(rp, str) and rp:
-          resource_prefix = rp
-      except Exception:
-        pass
-      self._prefix = f"{resource_prefix}-{self.tenant['AccountName']}-"
+      scope = self.duplo.tenant_scope()
+      if not scope.get("prefix"):
+        with self.duplo.scope_lock():
+          if not scope.get("prefix"):
+            resource_prefix = "duploservices"
+            try:
+              with self.duplo.span("resolve prefix", "scope"):
+                info = self.duplo.load("system").info()
+              rp = info.get("ResourceNamePrefix")
+              if isinstance(rp, str) and rp:
+                resource_prefix = rp
+            except Exception:
+              pass
+            scope["prefix"] = f"{resource_prefix}-{self.tenant['AccountName']}-"
+            self.duplo.save_tenant_scope()
+      self._prefix = scope["prefix"]
     return self._prefix
 
   setattr(cls, 'prefix', prefix)
@@ -278,11 +298,12 @@ def get_command_schema(cls: Type, command: str) -> dict:
     raise DuploError(f"Command {command} not found.", 404)
   return s
 
-def get_parser(args: List[Arg]) -> argparse.ArgumentParser:
+def get_parser(args: List[Arg], environ=None) -> argparse.ArgumentParser:
   """Get Parser
   
   Args:
     args: A list of Arg objects.
+    environ: The environment the defaults of the args are read from, defaults to `os.environ`.
   Returns:
     An argparse.ArgumentParser object with args from function.
   """
@@ -291,7 +312,8 @@ def get_parser(args: List[Arg]) -> argparse.ArgumentParser:
     description='Duplo Cloud CLI',
   )
   for arg in args:
-    parser.add_argument(*arg.flags, default=arg.default, **arg.attributes)
+    default = arg.default if environ is None else arg.default_in(environ)
+    parser.add_argument(*arg.flags, default=default, **arg.attributes)
   return parser
 
 def load_client(name: str):
@@ -1,18 +1,25 @@
 
 import sys
+import copy
 import jmespath
 import os
 import yaml
 import jsonpatch
 import logging
+import threading
 import traceback
 from urllib.parse import urlparse
 from pathlib import Path
+from contextlib import nullcontext, contextmanager
+from functools import lru_cache
+from multiprocessing.pool import ThreadPool
 from .commander import load_resource, load_format, load_client
 from .errors import DuploError, DuploInvalidError
-from . import args
+from . import args, codec
+from .telemetry import Tracer, Metrics, Profiler, HttpArchive
 from .commander import Command, get_parser, extract_args, available_resources, VERSION
 from typing import TypeVar
+from collections.abc import Iterator
 try:
   import duplocloud_sdk
   from pydantic import ValidationError
@@ -22,6 +29,38 @@ except ImportError:
 
 T = TypeVar("T")
 
+def _tenant_names(tenants: str) -> list:
+  # the comma separated tenants given to --tenants
+  return [t.strip().lower() for t in tenants.split(",") if t.strip()] if tenants else None
+
+@lru_cache(maxsize=256)
+def _compile_query(query: str):
+  return jmespath.compile(query)
+
+def _field_tree(fields: list) -> dict:
+  # a leaf of None keeps the whole value, so "Template" wins over "Template.Image"
+  tree = {}
+  for field in fields:
+    *parents, leaf = field.split(".")
+    node = tree
+    for part in parents:
+      if node.get(part, {}) is None:
+        break
+      node = node.setdefault(part, {})
+    else:
+      node[leaf] = None
+  return tree
+
+def _project(obj, tree: dict):
+  if isinstance(obj, list):
+    return [_project(item, tree) for item in obj]
+  if not isinstance(obj, dict):
+    return obj
+  return {
+    key: obj[key] if sub is None else _project(obj[key], sub)
+    for key, sub in tree.items() if key in obj
+  }
+
 class DuploCtl():
   """Duplo Ctl
 
@@ -29,6 +68,13 @@ class DuploCtl():
   resources, clients, formatters, and models. HTTP and auth behavior live in
   pluggable client classes loaded via the client extension point system.
 
+  One DuploCtl can be shared by many threads, for example a `ThreadPool`
+  running commands side by side. Each client is constructed once and the
+  tenant, tenant id and resource name prefix are resolved once per tenant,
+  however many threads ask for them at the same time. Changing settings like
+  `tenant` or `query` while other threads use the instance is not supported,
+  `with_tenant()` and `with_settings()` make a view with other ones instead.
+
   Example: Using injected client to load a service.
       ```python
       from duplocloud.controller import DuploCtl
@@ -47,22 +93,31 @@ class DuploCtl():
                token: args.TOKEN=None,
                tenant: args.TENANT=None,
                tenant_id: args.TENANT_ID=None,
+               tenants: args.TENANTS=None,
+               all_tenants: args.ALL_TENANTS=False,
                home_dir: args.HOME_DIR=None,
                config_file: args.CONFIG=None,
                cache_dir: args.CACHE_DIR=None,
                version: args.VERSION=False,
                interactive: args.INTERACTIVE=False,
                ctx: args.CONTEXT=None,
+               all_contexts: args.ALL_CONTEXTS=False,
                nocache: args.NOCACHE=False,
                browser: args.BROWSER=None,
                isadmin: args.ISADMIN=False,
                query: args.QUERY=None,
+               fields: args.FIELDS=None,
                output: args.OUTPUT="json",
                loglevel: args.LOGLEVEL="WARN",
                wait: args.WAIT=False,
                wait_timeout: args.WAIT_TIMEOUT=None,
                validate: args.VALIDATE=False,
-               auth_cooldown: args.AUTH_COOLDOWN=None):
+               auth_cooldown: args.AUTH_COOLDOWN=None,
+               tenant_cache: args.TENANT_CACHE=False,
+               trace: args.TRACE=None,
+               metrics_file: args.METRICS_FILE=None,
+               profile: args.PROFILE=None,
+               har: args.HAR=None):
     """DuploCtl Constructor
 
     Creates an instance of a duplocloud client configured for a certain portal. All of the arguments are optional and can be set in the environment or in the config file. The types of each of the arguments are annotated types that are used by argparse to create the command line arguments.
@@ -72,19 +127,28 @@ class DuploCtl():
       token: The token to use for authentication.
       tenant: The tenant to use.
       tenant_id: The tenant id to use.
+      tenants: A comma separated list of tenants to run each command in.
+      all_tenants: Run each command in every tenant.
       home_dir: The home directory for the client.
       config_file: The config file for the client.
       cache_dir: The cache directory for the client.
       version: The version of the client.
       interactive: The interactive mode for the client.
-      ctx: The context to use.
+      ctx: The context to use, or a comma separated list of contexts to run each command on.
+      all_contexts: Run each command on every context in the config file.
       nocache: The nocache flag for the client.
       browser: The browser to use for interactive login.
       isadmin: The admin flag for the client.
       query: The query to use.
+      fields: The fields to keep on each item returned by list and find.
       output: The output format for the client.
       loglevel: The log level for the client.
       auth_cooldown: The auth cooldown setting.
+      tenant_cache: Persist the resolved tenant context to the cache directory.
+      trace: A file to write a Chrome trace of each command to.
+      metrics_file: A file to write the metrics to in the Prometheus text format.
+      profile: Profile the `cpu` or `mem` of each phase of a command.
+      har: A file to write the HTTP traffic to as a HAR archive.
 
     Returns:
       duplo (DuploCtl): An instance of a DuploCtl.
@@ -105,17 +169,23 @@ class DuploCtl():
     self.config_file = config_file or f"{self.home_dir}/config"
     self.cache_dir = cache_dir or f"{self.home_dir}/cache"
     self._config = None
-    self._context = ctx
+    names = [c.strip() for c in ctx.split(",") if c.strip()] if ctx else []
+    self._context = names[0] if len(names) == 1 else None
+    self._contexts = names if len(names) > 1 else None
+    self.all_contexts = all_contexts
     self._host = self._sanitize_host(host)
     self._token = token.strip() if token else token
     self._tenant = tenant.strip().lower() if tenant else tenant
     self.tenantid = tenant_id.strip() if tenant_id else tenant_id
+    self.tenants = _tenant_names(tenants)
+    self.all_tenants = all_tenants
     self.version = version
     self.interactive = interactive
     self.nocache = nocache
     self.browser = browser
     self.isadmin = isadmin
     self.query = query.strip() if query else query
+    self.fields = fields
     self.output = output.strip()
     self.timeout = 60
     self.loglevel = loglevel
@@ -124,7 +194,23 @@ class DuploCtl():
     self.wait_timeout = wait_timeout
     self.validate = validate
     self.auth_cooldown = auth_cooldown
+    self.tenant_cache = tenant_cache
+    self.trace = trace
+    self.tracer = Tracer() if trace else None
+    self.metrics_file = metrics_file
+    self.meter = Metrics()
+    self.profile = profile
+    self.profiler = Profiler(profile) if profile else None
+    self.har = har
+    self.archive = HttpArchive() if har else None
+    self._parent = None
+    self._lock = threading.RLock()
     self._clients = {}
+    self._tenant_scopes = {}
+    self._scope_locks = {}
+    self._prefetches = {}
+    # env vars read by commands, a view can read them from another environment
+    self.environ = os.environ
 
   @staticmethod
   def from_env():
@@ -184,12 +270,17 @@ class DuploCtl():
 
     Returns the configured token value from args/env/context. May be None.
     """
+    if self._parent:
+      return self._parent.token
     return self._token
 
   @token.setter
   def token(self, value: str) -> None:
     """Set Token"""
-    self._token = value
+    if self._parent:
+      self._parent.token = value
+    else:
+      self._token = value
 
   @property
   def settings(self) -> dict:
@@ -204,7 +295,7 @@ class DuploCtl():
       if not os.path.exists(self.config_file):
         raise DuploError("Duplo config not found", 500)
       with open(self.config_file, "r") as f:
-        self._config = yaml.safe_load(f)
+        self._config = yaml.load(f, Loader=codec.SafeLoader)
     return self._config
 
   @property
@@ -226,6 +317,19 @@ class DuploCtl():
     except IndexError:
       raise DuploError(f"Portal '{ctx}' not found in config", 500)
 
+  @property
+  def contexts(self) -> list:
+    """Fan-out Contexts
+
+    The contexts each command runs on when more than one was given with `--ctx a,b,c` or `--all-contexts`.
+
+    Returns:
+      The context names, or None when commands run on a single portal.
+    """
+    if self.all_contexts:
+      return [c["name"] for c in self.settings.get("contexts", [])]
+    return self._contexts
+
   @property
   def host(self) -> str:
     """Get Host
@@ -302,13 +406,209 @@ Available Resources:
       query: Optional JMESPath query override for this invocation.
       kwargs: Additional keyword arguments passed to the command.
     Returns:
-      The result of the command.
+      The result of the command, or a generator of lines when the output format streams.
+    """
+    # a bad query should fail before any request is made
+    self.compile_query(query)
+    contexts = self.contexts
+    if resource and contexts:
+      d = self.across_contexts(contexts, resource, *args, query=query, **kwargs)
+    elif resource and (self.tenants or self.all_tenants):
+      d = self.across_tenants(self.tenants, resource, *args, query=query, **kwargs)
+    else:
+      d = self.__run(resource, *args, query=query, **kwargs)
+    if d is None:
+      return None
+    return self.format(d)
+
+  def across_contexts(self, contexts: list, resource: str, *args, query: str=None, **kwargs) -> dict:
+    """Run a command on many contexts.
+
+    Each context gets its own view from `with_context()`, with its own client, token and caches, and they all run at once. With `--tenants` or `--all-tenants` the command also fans out across the tenants of each context. A context that fails doesn't stop the others.
+
+    Usage: Fan-out from the CLI
+      ```sh
+      duploctl version --ctx prod,staging
+      duploctl tenant list --all-contexts -q '[].AccountName'
+      ```
+
+    Args:
+      contexts: The names of the contexts from the config file.
+      resource: The name of the resource.
+      args: The arguments to the resource.
+      query: Optional JMESPath query applied to each context's result.
+      kwargs: Additional keyword arguments passed to the command.
+    Returns:
+      A `{"ok", "result"}` or `{"ok", "error", "code"}` object for each context, keyed by context name.
+    """
+    def run(name):
+      try:
+        view = self.with_context(name)
+        if self.tenants or self.all_tenants:
+          d = view.across_tenants(self.tenants, resource, *args, query=query, **kwargs)
+        else:
+          d = view.__run(resource, *args, query=query, **kwargs)
+        if isinstance(d, Iterator):
+          d = list(d)
+        return name, {"ok": True, "result": d}
+      except SystemExit:
+        # argparse exits on arguments it can't parse
+        return name, {"ok": False, "error": f"invalid arguments {list(args)}", "code": 400}
+      except Exception as e:
+        return name, {"ok": False, "error": str(e), "code": getattr(e, "code", 500)}
+    with ThreadPool(min(len(contexts), 16)) as pool:
+      return dict(pool.map(run, contexts))
+
+  def across_tenants(self, tenants: list, resource: str, *args, query: str=None, **kwargs) -> dict:
+    """Run a command in many tenants.
+
+    The tenants are resolved from one tenant listing. Each tenant gets a view of this DuploCtl scoped to it, which shares the portal client and its caches, and up to ten tenants run at once. A tenant that fails doesn't stop the others.
+
+    Usage: Fan-out from the CLI
+      ```sh
+      duploctl service list --all-tenants -q '[].Name'
+      duploctl hosts list --tenants dev01,dev02
+      ```
+
+    Args:
+      tenants: The tenant names, or None for every tenant.
+      resource: The name of the resource.
+      args: The arguments to the resource.
+      query: Optional JMESPath query applied to each tenant's result.
+      kwargs: Additional keyword arguments passed to the command.
+    Returns:
+      A `{"ok", "result"}` or `{"ok", "error", "code"}` object for each tenant, keyed by tenant name.
     """
+    listed = {t["AccountName"].lower(): t for t in self.load("tenant").list()}
+    names = tenants or list(listed)
+    def run(name):
+      tenant = listed.get(name)
+      if not tenant:
+        return name, {"ok": False, "error": f"Tenant '{name}' not found", "code": 404}
+      try:
+        view = self.with_tenant(tenant["AccountName"], tenant["TenantId"])
+        scope = view.tenant_scope()
+        scope.setdefault("tenant", tenant)
+        scope.setdefault("tenant_id", tenant["TenantId"])
+        d = view.__run(resource, *args, query=query, **kwargs)
+        if isinstance(d, Iterator):
+          d = list(d)
+        return name, {"ok": True, "result": d}
+      except SystemExit:
+        # argparse exits on arguments it can't parse
+        return name, {"ok": False, "error": f"invalid arguments {list(args)}", "code": 400}
+      except Exception as e:
+        return name, {"ok": False, "error": str(e), "code": getattr(e, "code", 500)}
+    with ThreadPool(min(len(names), 10) or 1) as pool:
+      return dict(pool.map(run, names))
+
+  def with_tenant(self, name: str = None, tenant_id: str = None) -> "DuploCtl":
+    """View for a Tenant
+
+    A lightweight view of this DuploCtl scoped to another tenant. The view shares the portal client, which means the same token, connections, GET cache and name indexes, as well as the resolved tenant scopes and every other setting. Only the tenant differs. Clients other than the portal client, like the Argo client, can hold state for one tenant, so the view builds its own.
+
+    Usage: Work with several tenants from Python
+      ```python
+      duplo = DuploCtl.from_creds(host="...", token="...", tenant="dev01")
+      for name in ["dev01", "dev02"]:
+        services = duplo.with_tenant(name).load("service").list()
+      ```
+
+    Args:
+      name: The tenant name.
+      tenant_id: The tenant id, takes precedence over the name.
+    Returns:
+      duplo (DuploCtl): The view.
+    """
+    view = self.__view()
+    view._tenant = name.strip().lower() if name else None
+    view.tenantid = tenant_id.strip() if tenant_id else None
+    view._clients = {"duplo": self.load_client("duplo")}
+    view._parent = self._parent or self
+    return view
+
+  def with_context(self, name: str) -> "DuploCtl":
+    """View for a Context
+
+    A view of this DuploCtl using another context from the config file. A different portal needs its own token, clients and caches. A tenant id and resolved tenant belong to one portal, so only the tenant name carries over. Everything else is carried over, including the parsed config file.
+
+    Usage: Work with several portals from Python
+      ```python
+      duplo, _ = DuploCtl.from_env()
+      prod = duplo.with_context("prod")
+      prod.load("tenant").list()
+      ```
+
+    Args:
+      name: The name of the context.
+    Returns:
+      duplo (DuploCtl): The view.
+    """
+    view = self.__view()
+    view._lock = threading.RLock()
+    view._clients = {}
+    view._tenant_scopes = {}
+    view._scope_locks = {}
+    view._prefetches = {}
+    view._parent = None
+    view.tenantid = None
+    view.use_context(name)
+    return view
+
+  def with_settings(self, **settings) -> "DuploCtl":
+    """View with other Settings
+
+    A view of this DuploCtl with other per command settings, like `output`, `query`, `fields`, `wait`, `tenants`, `loglevel` or the `trace`, `har`, `profile` and `metrics_file` telemetry files. Each takes the same value as the constructor argument of the same name, and `environ` sets the environment commands read their env vars from. The view starts with the same token and resolved tenant, and shares the portal connection and its caches. It records its own telemetry, so it gets a copy of the portal client bound to it that shares the caches of the original. The logger is shared, pass a `logger` for another one.
+
+    Usage: Run commands with their own output settings
+      ```python
+      duplo, _ = DuploCtl.from_env()
+      names = duplo.with_settings(output="yaml", query="[].Name")
+      print(names("service", "list"))
+      ```
+
+    Args:
+      settings: The settings to change.
+    Returns:
+      duplo (DuploCtl): The view.
+    """
+    view = copy.copy(self)
+    for name, value in settings.items():
+      if not hasattr(self, name):
+        raise DuploError(f"Unknown setting '{name}'", 400)
+      setattr(view, name, value)
+    if "query" in settings:
+      view.query = view.query.strip() if view.query else view.query
+    if "output" in settings:
+      view.output = view.output.strip()
+    if "tenants" in settings:
+      view.tenants = _tenant_names(view.tenants)
+    view.tracer = Tracer() if view.trace else None
+    view.meter = Metrics()
+    view.profiler = Profiler(view.profile) if view.profile else None
+    view.archive = HttpArchive() if view.har else None
+    client = copy.copy(self.load_client("duplo"))
+    client.duplo = view
+    view._clients = {"duplo": client}
+    return view
+
+  def __view(self) -> "DuploCtl":
+    # a shallow copy, so the shared caches stay shared
+    view = copy.copy(self)
+    view._contexts = None
+    view.all_contexts = False
+    view.tenants = None
+    view.all_tenants = False
+    return view
+
+  def __run(self, resource: str=None, *args, query: str=None, **kwargs):
     d = None
     if not resource:
       d = self.config
     else:
-      r = self.load(resource)
+      with self.phase("load", f"load {resource}", "controller"):
+        r = self.load(resource)
+        self.prefetch(r)
       try:
         d = r(*args, **kwargs)
       except TypeError as te:
@@ -320,8 +620,84 @@ Available Resources:
           raise DuploError(f"No docstring found, error calling command {resource} : Traceback printed", 400)
     if d is None:
       return None
-    d = self.filter(d, query=query)
-    return self.format(d)
+    return self.filter(d, query=query)
+
+  def span(self, name: str, cat: str, **args):
+    """Trace Span
+
+    Time a block of work for the `--trace` output. Without tracing this does nothing.
+
+    Usage: Trace a block
+      ```python
+      with duplo.span("sync", "script", items=10) as span:
+        span["synced"] = sync()
+      ```
+
+    Args:
+      name: The name of the span.
+      cat: The category of the span, like `http` or `command`.
+      args: Arguments shown on the span.
+    Returns:
+      A context manager yielding the span's arguments.
+    """
+    if not self.tracer:
+      return nullcontext(args)
+    return self.tracer.span(name, cat, **args)
+
+  @contextmanager
+  def phase(self, phase: str, name: str, cat: str, **args):
+    """Command Phase
+
+    A span around one phase of a command, the load, the command itself, the filter or the format. With `--profile` the CPU or memory used in the block is attributed to the phase.
+
+    Args:
+      phase: The phase, one of load, command, filter or format.
+      name: The name of the span.
+      cat: The category of the span.
+      args: Arguments shown on the span.
+    Yields:
+      The span's arguments.
+    """
+    profiled = self.profiler.phase(phase) if self.profiler else nullcontext()
+    with self.span(name, cat, **args) as span, profiled:
+      yield span
+
+  def metrics(self) -> dict:
+    """Metrics
+
+    The counters and latency histograms recorded by this DuploCtl, its views and its clients. Requests are counted by client, method, endpoint template and status, along with their latency and bytes in and out. The GET, index and disk cache hits and misses, retries and wait polls are counted too. The totals keep growing for the life of the DuploCtl, unless `metrics_file` is set, then `flush_telemetry()` writes them and starts over.
+
+    Usage: Export API health
+      ```python
+      duplo.load("service").list()
+      for series in duplo.metrics()["counters"]["duploctl_requests_total"]:
+        print(series["labels"]["endpoint"], series["value"])
+      ```
+
+    Returns:
+      The counters and histograms, each a list of series with their labels.
+    """
+    return self.meter.snapshot()
+
+  def flush_telemetry(self) -> None:
+    """Flush Telemetry
+
+    Write what was recorded for `--trace`, `--metrics-file`, `--har` and `--profile` to their files. The CLI calls this once the output is printed. A file that can't be written is logged as an error, so it never changes the outcome of the command.
+    """
+    if self.tracer:
+      self.__flush("--trace", self.tracer.write, self.trace)
+    if self.metrics_file:
+      self.__flush("--metrics-file", self.meter.write, self.metrics_file)
+    if self.archive:
+      self.__flush("--har", self.archive.write, self.har, VERSION)
+    if self.profiler:
+      self.__flush("--profile", self.profiler.write)
+
+  def __flush(self, flag: str, write, *args) -> None:
+    try:
+      write(*args)
+    except OSError as e:
+      self.logger.error(f"Failed to write the {flag} output: {e}")
   
   def use_context(self, name: str = None) -> None:
     """Use Context
@@ -392,6 +768,12 @@ Available Resources:
     Uses the jmespath library to query data.
     An explicit query override can be passed per invocation,
     otherwise falls back to the global self.query property.
+    What the query runs on depends on the output format. When it prints
+    one item per line, like `ndjson` and `csv`, the query is applied lazily
+    to each item of a list or generator and items it reduces to nothing are
+    dropped, so `-q Name` selects the name of every item. Otherwise it runs
+    once on the whole result, with a generator collected into a list first,
+    so `-q '[].Name'` selects the names.
 
     Args:
       data: The data to query.
@@ -399,16 +781,211 @@ Available Resources:
     Returns:
       The queried data.
     """
+    expr = self.compile_query(query)
+    if not expr:
+      return data
+    if self.streaming and isinstance(data, (list, Iterator)):
+      return self.__filter_items(expr, data)
+    if isinstance(data, Iterator):
+      data = list(data)
+    with self.phase("filter", "filter", "controller", query=expr.expression):
+      return self.__search(expr, data)
+
+  @property
+  def streaming(self) -> bool:
+    """Streaming Output
+
+    Whether the output format prints the items of a result one at a time, like `ndjson` and `csv`. List commands then hand their items on one by one and the query applies to each item.
+
+    Returns:
+      True when the output format streams.
+    """
+    try:
+      return bool(self.output) and getattr(self.load_formatter(self.output), "streaming", False)
+    except KeyError:
+      return False
+
+  def __filter_items(self, expr, items):
+    for item in items:
+      with self.phase("filter", "filter", "controller", query=expr.expression):
+        found = self.__search(expr, item)
+      if found is not None:
+        yield found
+
+  def project(self, data, fields=None):
+    """Project fields
+
+    Keep only the given fields on each item of a command's result, so large objects like `Template.OtherDockerConfig` are never queried, formatted or printed. This is an output projection, the whole objects are still downloaded, decoded and kept in the GET cache and name index for the commands that need them. Dotted paths keep nested fields and are applied to every element of a nested list. Generators are projected lazily.
+
+    Args:
+      data: A dict, a list of dicts or a generator of dicts.
+      fields: A comma separated string or list of fields, defaults to the global self.fields.
+    Returns:
+      The projected data.
+    """
+    fields = fields or self.fields
+    if not fields:
+      return data
+    if isinstance(fields, str):
+      fields = fields.split(",")
+    tree = _field_tree([f.strip() for f in fields if f.strip()])
+    if isinstance(data, Iterator):
+      return (_project(item, tree) for item in data)
+    return _project(data, tree)
+
+  def compile_query(self, query: str=None):
+    """Compile a query
+
+    Parse a JMESPath query, or the global self.query when none is given. Parsed expressions are memoized so a query that runs over and over, like in a watch loop or for every item of a generator, is only parsed once.
+
+    Args:
+      query: Optional JMESPath query override.
+    Returns:
+      The compiled expression or None when there is no query.
+    Raises:
+      DuploError: If the query can not be parsed.
+    """
     q = query or self.query
     if not q:
-      return data
+      return None
     try:
-      return jmespath.search(q, data)
+      return _compile_query(q)
     except jmespath.exceptions.ParseError as e:
       raise DuploError("Invalid JMESPath query - parsing failed", 500) from e
+
+  def __search(self, expr, data):
+    try:
+      return expr.search(data)
     except jmespath.exceptions.JMESPathTypeError as e:
       raise DuploError("Invalid JMESPath query - data type mismatch", 500) from e
     
+  def tenant_scope(self, key: str = None) -> dict:
+    """Tenant Scope
+
+    The resolved tenant context shared by every tenant scoped resource loaded from this DuploCtl. It holds the `tenant` object, the `tenant_id` and the resource name `prefix` once any resource has resolved them, so a command touching many resources only looks them up once. With `tenant_cache` enabled the context is loaded from the cache directory the first time it is needed.
+
+    Args:
+      key: The tenant name or id, defaults to the configured tenant.
+
+    Returns:
+      The shared context as a dict.
+    """
+    key = key or self.tenantid or self.tenant
+    with self.scope_lock(key):
+      pending = self._prefetches.pop(key, None)
+      if pending:
+        self.__finish_prefetch(key, *pending)
+    return self.__scope(key)
+
+  def scope_lock(self, key: str = None) -> threading.RLock:
+    """Tenant Scope Lock
+
+    The lock held while a tenant's shared context is resolved, so threads sharing this DuploCtl look the tenant and prefix up only once. Resources hold it while they fill in their tenant scope.
+
+    Args:
+      key: The tenant name or id, defaults to the configured tenant.
+
+    Returns:
+      The reentrant lock for the tenant.
+    """
+    key = key or self.tenantid or self.tenant
+    with self._lock:
+      return self._scope_locks.setdefault(key, threading.RLock())
+
+  def __scope(self, key: str) -> dict:
+    with self._lock:
+      return self.__new_scope(key)
+
+  def __new_scope(self, key: str) -> dict:
+    if key not in self._tenant_scopes:
+      scope = {}
+      if self.tenant_cache and not self.nocache:
+        cache = self.load("cache")
+        try:
+          c = cache.get(cache.key_for(f"tenant-{key}"))
+          if not cache.expired(c.get("Expiration", None)):
+            scope = {
+              "tenant": c["Tenant"],
+              "tenant_id": c["Tenant"]["TenantId"],
+              "prefix": c.get("Prefix", None)
+            }
+        except (DuploError, KeyError):
+          pass
+      self._tenant_scopes[key] = scope
+    return self._tenant_scopes[key]
+
+  def prefetch(self, resource) -> None:
+    """Prefetch Tenant Scope
+
+    Speculatively resolve the tenant and the portal's resource name prefix for a tenant scoped resource that uses prefixed names. Both lookups are independent so they start concurrently in the background while the command itself is prepared. The results land in the shared tenant scope, and the resource's `tenant`, `tenant_id` and `prefix` wait for them instead of looking them up one after the other. A failed prefetch is ignored and the resource resolves the values itself as usual.
+
+    Args:
+      resource: The loaded resource instance about to run a command.
+    """
+    if getattr(resource, "scope", None) != "tenant":
+      return
+    if not (getattr(resource, "_prefixed", False) or getattr(resource, "uses_prefix", False)):
+      return
+    key = self.tenantid or self.tenant
+    scope = self.__scope(key)
+    with self.scope_lock(key):
+      if scope.get("prefix") or key in self._prefetches:
+        return
+      self.__start_prefetch(key, scope)
+
+  def __start_prefetch(self, key: str, scope: dict) -> None:
+    try:
+      # authenticate here first so parallel lookups never race to log in
+      self.load_client("duplo").token
+    except DuploError:
+      return
+    def tenant():
+      if not scope.get("tenant"):
+        t = self.load("tenant").find()
+        scope["tenant"] = t
+        scope["tenant_id"] = t["TenantId"]
+      return scope["tenant"]
+    def resource_prefix():
+      try:
+        rp = self.load("system").info().get("ResourceNamePrefix")
+      except Exception:
+        rp = None
+      return rp if isinstance(rp, str) and rp else "duploservices"
+    pool = ThreadPool(2)
+    self._prefetches[key] = (pool.apply_async(tenant), pool.apply_async(resource_prefix))
+    pool.close()
+
+  def __finish_prefetch(self, key: str, tenant, resource_prefix) -> None:
+    try:
+      t = tenant.get()
+      rp = resource_prefix.get()
+    except Exception as e:
+      self.logger.debug(f"Tenant prefetch failed: {e}")
+      return
+    self.__scope(key)["prefix"] = f"{rp}-{t['AccountName']}-"
+    self.save_tenant_scope(key)
+
+  def save_tenant_scope(self, key: str = None) -> None:
+    """Save Tenant Scope
+
+    Persist the shared tenant context to the cache directory when `tenant_cache` is enabled.
+
+    Args:
+      key: The tenant name or id, defaults to the configured tenant.
+    """
+    if not self.tenant_cache or self.nocache:
+      return
+    scope = self.tenant_scope(key)
+    if not scope.get("tenant"):
+      return
+    key = key or self.tenantid or self.tenant
+    cache = self.load("cache")
+    cache.set(cache.key_for(f"tenant-{key}"), {
+      "Tenant": scope["tenant"],
+      "Prefix": scope.get("prefix", None),
+      "Expiration": cache.expiration()
+    })
+
   def load_client(self, name: str = "duplo"):
     """Load Client
 
@@ -420,10 +997,11 @@ Available Resources:
     Returns:
       The client instance.
     """
-    if name not in self._clients:
-      cls = load_client(name)
-      self._clients[name] = cls(self)
-    return self._clients[name]
+    with self._lock:
+      if name not in self._clients:
+        cls = load_client(name)
+        self._clients[name] = cls(self)
+      return self._clients[name]
 
   def load(self, kind: str) -> T:
     """Load Resource
@@ -499,17 +1077,24 @@ Available Resources:
   def format(self, data, output: str=None):
     """Format data.
 
+    Streaming formatters like `ndjson` and `csv` return a generator of
+    lines instead of one string. Generators are collected into a list
+    first for any formatter which can't stream.
+
     Args:
       data: The data to format.
       output: The output format to use. Defaults to self.output.
     Returns:
-      The formatted data as a string, or the raw data when output is None.
+      The formatted data as a string or generator of lines, or the raw data when output is None.
     """
     o = output or self.output
     if o is None:
       return data
-    fmt = self.load_formatter(o)
-    return fmt(data)
+    with self.phase("format", f"format {o}", "controller"):
+      fmt = self.load_formatter(o)
+      if isinstance(data, Iterator) and not getattr(fmt, "streaming", False):
+        data = list(data)
+      return fmt(data)
 
   def build_command(self, *args) -> list[str]:
     """Context Args
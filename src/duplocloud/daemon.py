@@ -0,0 +1,446 @@
+"""
+A warm daemon serving `duploctl` invocations over a Unix domain socket.
+
+The daemon keeps one DuploCtl per portal connection alive between calls,
+that is per host, token, context, tenant, admin and interactive mode. Each
+one keeps its credentials, GET caches, name indexes and resolved tenant.
+An invocation runs on a view of it with its own settings, like the output
+format, query and telemetry files, and its own environment. The `duploctl`
+entry point forwards its argv, environment and stdin when a daemon is
+listening, and runs in process when none is.
+
+The protocol is newline delimited JSON. A client sends one request line and
+the daemon answers with `{"stdout": ...}` and `{"stderr": ...}` lines,
+`{"heartbeat": true}` lines while the command runs, and a final
+`{"exit": code}` line.
+
+This module only imports the standard library at the top so that forwarding
+stays cheap.
+"""
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+from contextlib import contextmanager, suppress
+
+HEARTBEAT = 5.0
+"""Seconds between the heartbeats sent while a command runs. A client gives up after three are missed."""
+
+CLIENTS = 8
+"""The most warm clients kept, the least recently used one is dropped first."""
+
+IDENTITY = ("host", "token", "ctx", "tenant", "tenant_id", "isadmin", "interactive",
+            "nocache", "home_dir", "config_file", "cache_dir")
+"""The global arguments naming a portal connection, a warm client is kept per set of them."""
+
+def socket_path() -> str:
+  """The socket the daemon listens on.
+
+  Set `DUPLO_DAEMON_SOCKET` to use a different socket.
+
+  Returns:
+    The path of the socket.
+  """
+  default = os.path.join(os.path.expanduser("~"), ".duplo", "daemon.sock")
+  return os.getenv("DUPLO_DAEMON_SOCKET", default)
+
+def connect(path: str | None = None, timeout: float | None = None):
+  """Connect to the daemon.
+
+  Args:
+    path: The socket, defaults to socket_path().
+    timeout: Seconds to wait while connecting.
+
+  Returns:
+    The connected socket, or None when no daemon is listening.
+  """
+  path = path or socket_path()
+  if not os.path.exists(path):
+    return None
+  conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  conn.settimeout(timeout)
+  try:
+    conn.connect(path)
+  except OSError:
+    conn.close()
+    return None
+  conn.settimeout(None)
+  return conn
+
+def request(message: dict, path: str | None = None, timeout: float | None = None):
+  """Send one request to the daemon.
+
+  Args:
+    message: The request.
+    path: The socket, defaults to socket_path().
+    timeout: Seconds to wait while connecting.
+
+  Returns:
+    A generator of the daemon's response messages, or None when no daemon is listening.
+  """
+  conn = connect(path, timeout)
+  if conn is None:
+    return None
+  return _exchange(conn, message)
+
+def _exchange(conn, message):
+  conn.sendall(json.dumps(message).encode() + b"\n")
+  with conn, conn.makefile("rb") as reader:
+    for line in reader:
+      yield json.loads(line)
+
+def forward(argv: list, path: str | None = None):
+  """Run a CLI invocation on the daemon.
+
+  Stdin is only sent along when an argument is `-`, like `-f -`, so a
+  command never blocks on a terminal or an open pipe it doesn't read. The
+  daemon sends a heartbeat while the command runs, when none arrives for
+  three heartbeats the daemon is taken to be gone.
+
+  Args:
+    argv: The arguments after the program name.
+    path: The socket, defaults to socket_path().
+
+  Returns:
+    The exit code, or None when no daemon is listening and the caller should run the command itself.
+  """
+  if argv[:1] == ["daemon"]:
+    return None
+  conn = connect(path, timeout=1)
+  if conn is None:
+    return None
+  conn.settimeout(HEARTBEAT * 3)
+  responses = _exchange(conn, {
+    "argv": argv,
+    "env": dict(os.environ),
+    "cwd": os.getcwd(),
+    "stdin": sys.stdin.read() if "-" in argv else None,
+  })
+  code = 1
+  try:
+    for msg in responses:
+      if "stdout" in msg:
+        sys.stdout.write(msg["stdout"])
+        sys.stdout.flush()
+      elif "stderr" in msg:
+        sys.stderr.write(msg["stderr"])
+        sys.stderr.flush()
+      elif "exit" in msg:
+        code = msg["exit"]
+  except TimeoutError:
+    sys.stderr.write("The duploctl daemon stopped responding\n")
+    return 1
+  finally:
+    responses.close()
+  return code
+
+class ClientGone(BaseException):
+  """The client of an invocation went away.
+
+  This is a BaseException so it gets past the `except Exception` in logging
+  handlers and commands and ends the invocation.
+  """
+
+class _Request:
+  """The state of one invocation, its environment, stdin and connection."""
+  def __init__(self, req: dict, write):
+    self.env = dict(req.get("env", {}))
+    self.cwd = req.get("cwd") or os.getcwd()
+    self.stdin = io.StringIO(req.get("stdin") or "")
+    self.owner = threading.get_ident()
+    self.gone = threading.Event()
+    self.done = threading.Event()
+    self.lock = threading.Lock()
+    self.write = write
+
+  def send(self, msg: dict) -> None:
+    """Send a message to the client.
+
+    Once the client is gone nothing more is sent, and the invocation's own
+    thread gets a ClientGone. Worker threads of the invocation drop their
+    output instead, so the pools they belong to still finish.
+
+    Args:
+      msg: The message.
+    """
+    if not self.gone.is_set():
+      try:
+        with self.lock:
+          self.write(msg)
+        return
+      except (BrokenPipeError, ConnectionResetError):
+        self.gone.set()
+    if threading.get_ident() == self.owner:
+      raise ClientGone()
+
+_local = threading.local()
+
+def _current():
+  """The invocation the calling thread works for."""
+  return getattr(_local, "request", None)
+
+class _Relay:
+  """A stream standing in for stdout or stderr.
+
+  Writes go to the client of the invocation the writing thread works for,
+  or to the original stream otherwise. Loggers created by warm clients hold
+  on to this object, so their output reaches whoever made the request.
+  """
+  def __init__(self, name: str, original):
+    self.name = name
+    self.original = original
+
+  def write(self, data):
+    req = _current()
+    if req is None:
+      self.original.write(data)
+    else:
+      req.send({self.name: data})
+    return len(data)
+
+  def flush(self):
+    if _current() is None:
+      self.original.flush()
+
+  def isatty(self):
+    return False
+
+class _Log:
+  """The stderr of one invocation, whichever thread writes to it."""
+  def __init__(self, request: _Request):
+    self.request = request
+
+  def write(self, data):
+    self.request.send({"stderr": data})
+    return len(data)
+
+  def flush(self):
+    pass
+
+class _Stdin:
+  """Stdin of the invocation the reading thread works for."""
+  def __init__(self, original):
+    self.original = original
+
+  def __stream(self):
+    req = _current()
+    return req.stdin if req else self.original
+
+  def read(self, *args):
+    return self.__stream().read(*args)
+
+  def readline(self, *args):
+    return self.__stream().readline(*args)
+
+  def __iter__(self):
+    return iter(self.__stream())
+
+  def isatty(self):
+    return self.__stream().isatty()
+
+class DuploDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+  """Duplo Daemon
+
+  Serves CLI invocations with warm DuploCtl instances. Invocations run
+  concurrently, each on a view with its own environment and logger, and
+  with its own stdin and output. Threads a command starts log to its client
+  through the view's logger. The working directory belongs to the whole
+  process, so invocations from the same directory run together and one from
+  another directory waits until they are done.
+  """
+  daemon_threads = True
+
+  def __init__(self, path: str | None = None):
+    from cachetools import LRUCache
+    self.path = path or socket_path()
+    if os.path.exists(self.path):
+      os.remove(self.path)
+    os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+    # the socket is created with the umask, so only the current user can ever connect
+    umask = os.umask(0o077)
+    try:
+      super().__init__(self.path, _Handler)
+    finally:
+      os.umask(umask)
+    self.clients = LRUCache(maxsize=CLIENTS)
+    self.requests = 0
+    self.lock = threading.Lock()
+    self.cwd = self.home = None
+    self.cwd_users = 0
+    self.cwd_changed = threading.Condition()
+    self.stdout = _Relay("stdout", sys.stdout)
+    self.stderr = _Relay("stderr", sys.stderr)
+
+  def serve(self):
+    """Serve until stopped, with the process wide state routed to each invocation."""
+    try:
+      with self.installed():
+        self.serve_forever()
+    finally:
+      self.server_close()
+      if os.path.exists(self.path):
+        os.remove(self.path)
+
+  @contextmanager
+  def installed(self):
+    """Route stdin, stdout and stderr to the invocation of the calling thread.
+
+    The environment is left alone, each invocation's view reads its own.
+    """
+    saved = sys.stdin, sys.stdout, sys.stderr
+    sys.stdin = _Stdin(saved[0])
+    sys.stdout, sys.stderr = self.stdout, self.stderr
+    try:
+      yield
+    finally:
+      sys.stdin, sys.stdout, sys.stderr = saved
+
+  def status(self) -> dict:
+    return {
+      "pid": os.getpid(),
+      "socket": self.path,
+      "clients": len(self.clients),
+      "requests": self.requests,
+    }
+
+  def run(self, req: dict, send) -> int:
+    """Run one invocation the way the CLI would.
+
+    Args:
+      req: The request with argv, env, cwd and stdin.
+      send: Sends a response message to the client.
+
+    Returns:
+      The exit code.
+    """
+    request = _Request(req, send)
+    with self.lock:
+      self.requests += 1
+    _local.request = request
+    threading.Thread(target=self.__heartbeat, args=(request,), daemon=True).start()
+    try:
+      with self.__directory(request.cwd):
+        return self.__invoke(req["argv"], request)
+    except ClientGone:
+      return 1
+    finally:
+      request.done.set()
+      _local.request = None
+
+  def __invoke(self, argv: list, request: _Request) -> int:
+    from collections.abc import Iterator
+
+    from duplocloud.errors import DuploError
+    duplo = None
+    try:
+      duplo, args = self.client_for(argv, request.env)
+      duplo.logger = self.__logger(request, duplo.loglevel)
+      o = duplo(*args)
+      if isinstance(o, Iterator):
+        for line in o:
+          print(line, flush=True)
+      elif o:
+        print(o)
+      return 0
+    except DuploError as e:
+      print(e)
+      return e.code
+    except SystemExit as e:
+      return e.code if isinstance(e.code, int) else 1
+    except Exception as e:  # noqa: BLE001 - reported the way the CLI reports it
+      print(f"An unexpected error occurred: {e}")
+      return 1
+    finally:
+      if duplo:
+        duplo.flush_telemetry()
+
+  def __logger(self, request: _Request, level: str) -> logging.Logger:
+    # the view's own logger, so the threads of the invocation log to its client too
+    logger = logging.Logger("duplo", logging.getLevelName(level))  # noqa: LOG001 - unregistered, it goes with the invocation
+    handler = logging.StreamHandler(_Log(request))
+    handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+    logger.addHandler(handler)
+    return logger
+
+  def __heartbeat(self, request: _Request):
+    # sending also finds out when the client went away while nothing was printed
+    while not request.done.wait(HEARTBEAT):
+      request.send({"heartbeat": True})
+
+  @contextmanager
+  def __directory(self, cwd: str):
+    with self.cwd_changed:
+      while self.cwd_users and self.cwd != cwd:
+        self.cwd_changed.wait()
+      if not self.cwd_users:
+        self.home = os.getcwd()
+        os.chdir(cwd)
+        self.cwd = cwd
+      self.cwd_users += 1
+    try:
+      yield
+    finally:
+      with self.cwd_changed:
+        self.cwd_users -= 1
+        if not self.cwd_users:
+          os.chdir(self.home)
+        self.cwd_changed.notify_all()
+
+  def client_for(self, argv: list, environ: dict | None = None):
+    """Get a view of a warm DuploCtl for the global arguments of an invocation.
+
+    The warm DuploCtl is picked by the arguments in IDENTITY, the rest are
+    settings of the view. Global arguments not given in argv are read from
+    the given environment.
+
+    Args:
+      argv: The invocation's arguments.
+      environ: The invocation's environment, defaults to the daemon's own.
+
+    Returns:
+      The view and the remaining arguments.
+    """
+    from duplocloud.commander import extract_args, get_parser
+    from duplocloud.controller import DuploCtl
+    from duplocloud.errors import DuploError
+    environ = os.environ if environ is None else environ
+    parser = get_parser(extract_args(DuploCtl.__init__), environ)
+    env, xtra = parser.parse_known_args(argv)
+    settings = vars(env)
+    identity = {name: settings.pop(name) for name in IDENTITY}
+    key = json.dumps(identity, sort_keys=True, default=str)
+    with self.lock:
+      duplo = self.clients.get(key)
+      if duplo is None:
+        duplo = self.clients[key] = DuploCtl(**identity)
+        if identity["ctx"] or not identity["host"]:
+          # resolve the context once, a view copies it, it fails again in the invocation otherwise
+          with suppress(DuploError):
+            duplo.use_context()
+    return duplo.with_settings(environ=environ, **settings), xtra
+
+class _Handler(socketserver.StreamRequestHandler):
+  def handle(self):
+    line = self.rfile.readline()
+    if not line:
+      return
+    req = json.loads(line)
+    def send(msg):
+      self.wfile.write(json.dumps(msg).encode() + b"\n")
+      self.wfile.flush()
+    op = req.get("op", "run")
+    try:
+      if op == "status":
+        send(self.server.status())
+      elif op == "stop":
+        send({"message": "Daemon stopping"})
+        threading.Thread(target=self.server.shutdown).start()
+      else:
+        send({"exit": self.server.run(req, send)})
+    except (BrokenPipeError, ConnectionResetError):
+      # the client went away, there is nobody left to answer
+      pass
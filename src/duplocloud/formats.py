@@ -1,3 +1,4 @@
+from collections.abc import Iterator
 
 def tostring(obj):
   """Converts a python object to a string.
@@ -33,8 +34,8 @@ def toyaml(obj):
   Returns:
     A YAML string representing the object.
   """
-  import yaml
-  return yaml.dump(obj)
+  from duplocloud import codec
+  return codec.dump_yaml(obj)
 
 def toenv(obj):
   """Converts a python object to a .env file format
@@ -51,14 +52,19 @@ def toenv(obj):
 def tocsv(obj):
   """Converts a python object to a CSV string.
 
+  When given a generator the rows are produced one at a time as the items
+  arrive, with the headers taken from the first item.
+
   Args:
     obj: The python object to convert.
 
   Returns:
-    A CSV string representing the object.
+    A CSV string representing the object, or a generator of CSV lines.
   """
   import csv
   from io import StringIO
+  if isinstance(obj, Iterator):
+    return _csv_lines(obj)
   if not isinstance(obj, list):
     obj = [obj]
   headers = obj[0].keys()
@@ -68,3 +74,41 @@ def tocsv(obj):
   for row in obj:
     writer.writerow(row.values())
   return output.getvalue()
+
+def _csv_lines(items):
+  import csv
+  from io import StringIO
+  output = StringIO()
+  writer = csv.writer(output)
+  def line(values):
+    output.seek(0)
+    output.truncate()
+    writer.writerow(values)
+    return output.getvalue().rstrip("\r\n")
+  headers = None
+  for row in items:
+    if headers is None:
+      headers = list(row.keys())
+      yield line(headers)
+    yield line(row.values())
+
+def tondjson(obj):
+  """Converts a python object to newline delimited JSON.
+
+  Each item of a list or generator is serialized to its own line as it is
+  produced, so large results start printing right away and are never held
+  as one big string.
+
+  Args:
+    obj: The python object to convert.
+
+  Returns:
+    A generator of JSON lines.
+  """
+  import json
+  items = obj if isinstance(obj, (list, tuple, Iterator)) else [obj]
+  return (json.dumps(item) for item in items)
+
+# formatters that accept generators and produce their output incrementally
+tocsv.streaming = True
+tondjson.streaming = True
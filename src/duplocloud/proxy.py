@@ -0,0 +1,239 @@
+"""
+A local read-through caching proxy for the portal API.
+
+Callers send their usual requests, with their own bearer token, to the proxy
+instead of the portal. GET responses are cached per token for as long as the
+endpoint's entry in `TTL_POLICY` allows, and concurrent identical GETs share
+one upstream request. Anything else is passed straight through and drops the
+cached responses of that token, the same way a write through the client
+drops its GET cache. The cache holds at most `maxsize` responses, expired
+ones are dropped as new ones come in and the least recently used go first
+when it is full.
+"""
+import hashlib
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from cachetools import TLRUCache
+
+from . import codec
+
+TTL_POLICY = [
+  (re.compile(r"^v3/features/system"), 300),
+  (re.compile(r"^adminproxy/GetTenantNames"), 60),
+  (re.compile(r"^adminproxy/GetPlans"), 60),
+  (re.compile(r"/GetPods"), 5),
+]
+"""Seconds to cache the GETs of matching paths, first match wins."""
+
+DEFAULT_TTL = 10
+"""Seconds to cache any other GET, the same as the client's GET cache."""
+
+METRICS_PATH = "/_proxy/metrics"
+
+def ttl_for(path: str) -> int:
+  """How long to cache a GET.
+
+  Args:
+    path: The request path.
+
+  Returns:
+    The seconds to keep the response for.
+  """
+  path = path.lstrip("/")
+  for pattern, ttl in TTL_POLICY:
+    if pattern.search(path):
+      return ttl
+  return DEFAULT_TTL
+
+class _Response:
+  def __init__(self, status: int, content_type: str, body: bytes, ttl: int=0):
+    self.status = status
+    self.content_type = content_type
+    self.body = body
+    self.expires = time.monotonic() + ttl
+
+class _Call:
+  def __init__(self):
+    self.done = threading.Event()
+    self.response = None
+    self.error = None
+
+class CachingProxy(ThreadingHTTPServer):
+  """Caching Proxy
+
+  Forwards requests to a portal and caches the GET responses per token.
+  """
+  daemon_threads = True
+
+  def __init__(self, upstream: str, port: int=8787, timeout: int=60, maxsize: int=1024):
+    """Initialize the proxy.
+
+    Args:
+      upstream: The portal url to forward to.
+      port: The local port to listen on, 0 picks a free one.
+      timeout: Seconds to wait for the portal.
+      maxsize: The most responses to keep cached.
+    """
+    self.upstream = upstream.rstrip("/")
+    self.timeout = timeout
+    self.cache = TLRUCache(maxsize=maxsize, ttu=lambda key, res, now: res.expires)
+    self.inflight = {}
+    self.lock = threading.Lock()
+    self.counts = {"hits": 0, "misses": 0, "coalesced": 0, "passthrough": 0, "errors": 0}
+    self.endpoints = {}
+    super().__init__(("127.0.0.1", port), _ProxyHandler)
+
+  def get(self, path: str, headers: dict) -> _Response:
+    """Get a response from the cache or the portal.
+
+    Only one request per token and path is sent to the portal at a time,
+    everyone else asking for it meanwhile waits for that response.
+
+    Args:
+      path: The request path.
+      headers: The request headers to forward.
+
+    Returns:
+      The response.
+    """
+    token = headers.get("Authorization")
+    if not token:
+      return self.forward("GET", path, headers)
+    key = (hashlib.sha256(token.encode()).hexdigest(), path)
+    with self.lock:
+      cached = self.cache.get(key)
+      if cached and cached.expires > time.monotonic():
+        self.__count("hits", path)
+        return cached
+      call = self.inflight.get(key)
+      leader = call is None
+      if leader:
+        call = self.inflight[key] = _Call()
+        self.__count("misses", path)
+      else:
+        self.__count("coalesced", path)
+    if not leader:
+      call.done.wait()
+      if call.error:
+        raise call.error
+      return call.response
+    try:
+      res = self.forward("GET", path, headers, count=False)
+      ttl = ttl_for(path)
+      if res.status == 200 and ttl:
+        res.expires = time.monotonic() + ttl
+        with self.lock:
+          self.cache[key] = res
+      call.response = res
+      return res
+    except Exception as e:
+      call.error = e
+      raise
+    finally:
+      with self.lock:
+        del self.inflight[key]
+      call.done.set()
+
+  def forward(self, method: str, path: str, headers: dict, body: bytes | None = None, count: bool=True) -> _Response:
+    """Send a request to the portal as is.
+
+    A successful write drops the cached responses of its token.
+
+    Args:
+      method: The HTTP method.
+      path: The request path.
+      headers: The request headers to forward.
+      body: The request body.
+      count: Count the request as passed through.
+
+    Returns:
+      The response.
+    """
+    if count:
+      with self.lock:
+        self.__count("passthrough", path)
+    try:
+      r = requests.request(method, f"{self.upstream}{path}",
+                           headers=headers, data=body, timeout=self.timeout)
+    except requests.exceptions.RequestException as e:
+      with self.lock:
+        self.counts["errors"] += 1
+      raise ConnectionError(f"Failed to reach {self.upstream}") from e
+    if method != "GET" and 200 <= r.status_code < 300:
+      self.invalidate(headers.get("Authorization"))
+    return _Response(r.status_code, r.headers.get("Content-Type", "application/json"), r.content)
+
+  def invalidate(self, token: str | None = None) -> None:
+    """Drop cached responses.
+
+    Args:
+      token: Only drop the responses of this bearer token.
+    """
+    digest = hashlib.sha256(token.encode()).hexdigest() if token else None
+    with self.lock:
+      for key in list(self.cache):
+        if digest is None or key[0] == digest:
+          del self.cache[key]
+
+  def metrics(self) -> dict:
+    """The proxy's hit and miss counters.
+
+    Returns:
+      The totals, the number of cached responses and the counters per endpoint.
+    """
+    with self.lock:
+      self.cache.expire()
+      return {
+        **self.counts,
+        "entries": len(self.cache),
+        "endpoints": {p: dict(c) for p, c in self.endpoints.items()},
+      }
+
+  def __count(self, name, path):
+    self.counts[name] += 1
+    endpoint = self.endpoints.setdefault(path.split("?", 1)[0], {"hits": 0, "misses": 0, "coalesced": 0, "passthrough": 0})
+    endpoint[name] += 1
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+  FORWARDED = ("Authorization", "Content-Type", "Accept")
+
+  def do_GET(self):
+    if self.path == METRICS_PATH:
+      return self.__reply(_Response(200, "application/json", codec.dumpb(self.server.metrics())))
+    self.__handle(lambda headers: self.server.get(self.path, headers))
+
+  def do_POST(self):
+    self.__write()
+
+  def do_PUT(self):
+    self.__write()
+
+  def do_DELETE(self):
+    self.__write()
+
+  def log_message(self, format, *args):
+    pass
+
+  def __write(self):
+    length = int(self.headers.get("Content-Length") or 0)
+    body = self.rfile.read(length) if length else None
+    self.__handle(lambda headers: self.server.forward(self.command, self.path, headers, body))
+
+  def __handle(self, send):
+    headers = {k: self.headers[k] for k in self.FORWARDED if self.headers.get(k)}
+    try:
+      res = send(headers)
+    except ConnectionError as e:
+      res = _Response(502, "text/plain", str(e).encode())
+    self.__reply(res)
+
+  def __reply(self, res):
+    self.send_response(res.status)
+    self.send_header("Content-Type", res.content_type)
+    self.send_header("Content-Length", str(len(res.body)))
+    self.end_headers()
+    self.wfile.write(res.body)
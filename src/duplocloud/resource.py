@@ -3,7 +3,27 @@ from .controller import DuploCtl
 from .errors import DuploError, DuploFailedResource, DuploNotFound, DuploStillWaiting, DuploConnectionError
 from .commander import get_parser, extract_args, get_command_schema, Command
 import math
+import jsonpatch
 import time
+from copy import deepcopy
+from multiprocessing.pool import ThreadPool
+
+# fields the portal fills in on its own, a PUT can't change them
+_MANAGED = ("status",)
+_MANAGED_METADATA = ("uid", "resourceVersion", "generation", "creationTimestamp", "managedFields", "selfLink")
+
+def _shape(live, desired):
+  # drop the fields the portal manages when the desired body leaves them out
+  if not (isinstance(live, dict) and isinstance(desired, dict)):
+    return live
+  shaped = {k: v for k, v in live.items() if k in desired or k not in _MANAGED}
+  meta = shaped.get("metadata")
+  if isinstance(meta, dict) and isinstance(desired.get("metadata"), dict):
+    shaped["metadata"] = {
+      k: v for k, v in meta.items()
+      if k in desired["metadata"] or k not in _MANAGED_METADATA
+    }
+  return shaped
 
 class DuploCommand():
   def __init__(self, duplo: DuploCtl):
@@ -13,6 +33,8 @@ class DuploCommand():
     pass
 
 class DuploResource():
+  # set by resources whose commands build names from the tenant prefix
+  uses_prefix = False
 
   def __init__(self, duplo: DuploCtl, api_version: str="v1", slug: str=None, prefixed: bool=False):
     self.duplo = duplo
@@ -38,16 +60,26 @@ class DuploResource():
     cmd = get_command_schema(self.__class__, name)
     command = getattr(self, cmd["method"])
     cliargs = extract_args(command)
-    parser = get_parser(cliargs)
+    parser = get_parser(cliargs, self.duplo.environ)
     # only get the model name if we have validation turned on
     model = self.duplo.load_model(cmd.get("model")) if self.duplo.validate else None
+    # project list and find output to the requested fields before the query and formatter see it
+    project = bool(self.duplo.fields) and cmd["method"] in ("list", "find")
+    # lists go out one item at a time to a format which prints them that way
+    stream = cmd["method"] == "list" and self.duplo.streaming
     def wrapped(*args, **kwargs):
       pargs = vars(parser.parse_args(args))
       pargs.update(kwargs)
       # if validation was enabled then the body will be validated
       if model and "body" in pargs and pargs["body"] is not None:
         pargs["body"] = self.duplo.validate_model(model, pargs["body"])
-      return command(**pargs)
+      with self.duplo.phase("command", f"{getattr(self, 'kind', type(self).__name__)} {name}", "command"):
+        result = command(**pargs)
+      if stream and isinstance(result, list):
+        result = iter(result)
+      if project:
+        result = self.duplo.project(result)
+      return result
     return wrapped
   
   def wait(self, wait_check: callable, timeout: int=3600, poll: int=10):
@@ -68,9 +100,11 @@ class DuploResource():
     exp = math.ceil(timeout / poll)
     max_connection_errors = 10
     connection_error_count = 0
-    for _ in range(exp):
+    for attempt in range(exp):
       try:
-        wait_check()
+        self.duplo.meter.inc("duploctl_wait_polls_total", kind=getattr(self, "kind", type(self).__name__))
+        with self.duplo.span("wait poll", "wait", attempt=attempt):
+          wait_check()
         break
       except DuploFailedResource as e:
         raise e
@@ -119,8 +153,109 @@ class DuploResource():
         self.duplo.logger.warning(
           f"Transient error (attempt {attempt}/{attempts}), retrying: {e}"
         )
+        self.duplo.meter.inc("duploctl_retries_total", kind=getattr(self, "kind", type(self).__name__))
         time.sleep(base_delay * attempt)
 
+  def diff(self, live, desired, partial: bool=False) -> list:
+    """Diff desired state against live state.
+
+    An empty patch means a write would change nothing and can be skipped.
+    A partial desired state, like a body from a file, never holds the
+    fields the portal fills in on its own, like `status` and the uid and
+    timestamps in `metadata`. So for those the live state first drops the
+    managed fields the desired state leaves out. Every other field is
+    compared, because the write replaces the whole resource and a field
+    left out of the body is cleared.
+
+    Args:
+      live: The current state of the resource.
+      desired: The state about to be written.
+      partial: Whether the desired state leaves out the fields the portal manages.
+
+    Returns:
+      A JSON patch, as a list of operations, turning the live state into the desired state.
+    """
+    if partial:
+      live = _shape(live, desired)
+    return jsonpatch.make_patch(live, desired).patch
+
+  def fanout(self, fn: callable, items: list, workers: int=10, flatten: bool=False) -> list:
+    """Run ``fn`` for each item concurrently.
+
+    Per-parent sub requests, like listing the jobs in every queue, are run
+    on a bounded thread pool so the total latency follows the slowest
+    request instead of the sum of all of them. The results keep the order
+    of ``items`` regardless of which request finished first. If any call
+    raises, the error propagates once all calls are done.
+
+    Args:
+      fn: Callable taking a single item.
+      items: The items to call ``fn`` with.
+      workers: The maximum number of concurrent calls.
+      flatten: Merge list results into a single list.
+
+    Returns:
+      The results of ``fn`` in the same order as ``items``.
+    """
+    items = list(items)
+    if not items:
+      return []
+    with ThreadPool(min(len(items), workers)) as pool:
+      results = pool.map(fn, items)
+    if flatten:
+      return [r for result in results for r in result]
+    return results
+
+  def index(self, key: str = None) -> dict:
+    """Name Index
+
+    A mapping of name to object for everything returned by `list()`. The
+    index is built from a single list call and shared through the client
+    until its cache expires or something is written, so finding many items
+    in a row does not list and scan once per item.
+
+    Args:
+      key: A field to index by instead of `name_from_body`.
+
+    Returns:
+      The index as a dict.
+    """
+    scope = self.tenant_id if getattr(self, "scope", None) == "tenant" else None
+    def build():
+      name_of = (lambda b: b.get(key)) if key else self.name_from_body
+      idx = {}
+      for item in self.list():
+        try:
+          name = name_of(item)
+        except KeyError:
+          continue
+        if name is not None:
+          idx.setdefault(name, item)
+      return idx
+    index = getattr(self.client, "index", None)
+    if index is None:
+      return build()
+    return index((self.kind, scope, key), build)
+
+  def indexed(self, name: str, key: str = None, kind: str = None) -> dict:
+    """Find by Name in the Index
+
+    Args:
+      name: The value to look up.
+      key: A field to index by instead of `name_from_body`.
+      kind: The kind reported when nothing matches, defaults to this resource.
+
+    Returns:
+      A copy of the matching object, safe for the caller to modify.
+
+    Raises:
+      DuploNotFound: If nothing matched.
+    """
+    try:
+      return deepcopy(self.index(key)[name])
+    except KeyError:
+      raise DuploNotFound(name, kind or self.kind)
+
 class DuploResourceV2(DuploResource):
 
   def __init__(self, duplo: DuploCtl, slug: str = None, prefixed: bool = False):
@@ -170,10 +305,7 @@ class DuploResourceV2(DuploResource):
     Raises:
       DuploError: If the {{kind}} could not be found.
     """
-    try:
-      return [s for s in self.list() if self.name_from_body(s) == name][0]
-    except IndexError:
-      raise DuploNotFound(name, self.kind)
+    return self.indexed(name)
       
   @Command()
   def apply(self,
@@ -319,26 +451,40 @@ class DuploResourceV3(DuploResource):
   def update(self, 
              name: args.NAME = None,
              body: args.BODY = None,
-             patches: args.PATCHES = None,):
+             patches: args.PATCHES = None,
+             dryrun: args.DRYRUN = False,
+             live: dict = None):
     """Update a V3 resource by name.
+
+    The result is compared to the live resource first and nothing is
+    written when it would not change anything.
     
     Args:
       name: The name of the resource to update.
       body: The resource to update.
       patches: The patches to apply to the resource.
+      dryrun: Return the patch that would be applied without writing it.
+      live: The current resource when the caller already has it.
 
     Returns: 
-      message: Success message.
+      message: Success message, or the name and patch on a dry run.
 
     Raises:
       DuploError: If the resource could not be created.
     """
     if not name and not body:
       raise DuploError("Name is required when body is not provided")
-    body = body or self.find(name)
+    name = name if name else self.name_from_body(body)
+    live = live or self.find(name)
+    partial = body is not None
+    body = body or deepcopy(live)
     if patches:
       body = self.duplo.jsonpatch(body, patches)
-    name = name if name else self.name_from_body(body)
+    changes = self.diff(live, body, partial)
+    if dryrun:
+      return {"name": name, "patch": changes}
+    if not changes:
+      return {"message": f"{self.slug}/{name} is unchanged"}
     n = self.prefixed_name(name) if self._prefixed else name
     response = self.client.put(self.endpoint(n), body)
     return response.json()
@@ -346,10 +492,12 @@ class DuploResourceV3(DuploResource):
   @Command()
   def apply(self,
              body: args.BODY,
-             patches: args.PATCHES = None,) -> dict:
+             patches: args.PATCHES = None,
+             dryrun: args.DRYRUN = False) -> dict:
     """Apply a {{kind}}
     
-    Create or Update a {{kind}} resource with Duplocloud cli. 
+    Create or Update a {{kind}} resource with Duplocloud cli. An existing
+    {{kind}} that already matches the body is left alone.
 
     Usage: CLI Usage
       ```sh
@@ -364,15 +512,18 @@ class DuploResourceV3(DuploResource):
       body: The resource to apply.
       wait: Wait for the resource to be created.
       patches: The patches to apply to the resource.
+      dryrun: Return the patch that would be applied, or the body that would be created, without writing it.
 
     Returns:
       message: Success message.
     """
     name = self.name_from_body(body)
     try:
-      self.find(name)
-      return self.update(name=name, body=body, patches=patches)
+      current = self.find(name)
     except DuploNotFound:
-      return self.create(body=body)
+      return body if dryrun else self.create(body=body)
+    # not every update override takes a dry run
+    kwargs = {"dryrun": True} if dryrun else {}
+    return self.update(name=name, body=body, patches=patches, live=current, **kwargs)
 
 
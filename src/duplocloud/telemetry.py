@@ -0,0 +1,625 @@
+"""
+Instrumentation of the work a DuploCtl does.
+
+The HTTP clients, resources and the controller report what they do to the
+DuploCtl. Counters and latency histograms are always kept by `Metrics`,
+while timed spans are only recorded by a `Tracer` when `--trace` asks for
+one, CPU or memory is only profiled by a `Profiler` with `--profile` and
+the HTTP traffic is only archived by an `HttpArchive` with `--har`.
+"""
+import cProfile
+import datetime
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections.abc import Mapping
+from contextlib import contextmanager
+from urllib.parse import parse_qsl, urlsplit
+
+from . import codec
+
+_IDS = re.compile(r"(?<=/)([0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|\d+)(?=/|$|\?)")
+
+def path_template(path: str) -> str:
+  """The endpoint a request went to, without ids or a query string.
+
+  Tenant ids, other GUIDs and numeric ids are replaced with `{id}` so the
+  requests of many tenants group under one endpoint.
+
+  Args:
+    path: The request path.
+
+  Returns:
+    The path template.
+  """
+  path = "/" + path.split("?", 1)[0].lstrip("/")
+  return _IDS.sub("{id}", path)
+
+def body_sizes(response, stream: bool = False) -> tuple:
+  """The sizes of a request's body and its response's body.
+
+  Args:
+    response: The response of the request.
+    stream: Whether the response is streamed, reading its content would consume it.
+
+  Returns:
+    The bytes received and the bytes sent.
+  """
+  if stream:
+    received = int(response.headers.get("Content-Length") or 0)
+  else:
+    received = _len(getattr(response, "content", None))
+  return received, _len(getattr(getattr(response, "request", None), "body", None))
+
+def _len(body) -> int:
+  return len(body) if isinstance(body, (bytes, str)) else 0
+
+class Tracer:
+  """Tracer
+
+  Records timed spans and writes them in the Chrome trace event format,
+  which loads directly in [Perfetto](https://ui.perfetto.dev) and
+  `chrome://tracing`. Spans can be recorded from any thread, each thread is
+  drawn as its own track.
+  """
+  def __init__(self):
+    self.start = time.perf_counter_ns()
+    self.events = []
+    self.threads = {}
+    self.lock = threading.Lock()
+
+  @contextmanager
+  def span(self, name: str, cat: str, **args):
+    """Record a span around a block.
+
+    The block can add to the span's arguments, like a response status,
+    through the yielded dict.
+
+    Args:
+      name: The name of the span.
+      cat: The category of the span, like `http` or `command`.
+      args: Arguments shown on the span.
+
+    Yields:
+      The span's arguments.
+    """
+    begin = time.perf_counter_ns()
+    try:
+      yield args
+    except BaseException as e:
+      args["error"] = type(e).__name__
+      raise
+    finally:
+      end = time.perf_counter_ns()
+      tid = threading.get_ident()
+      event = {
+        "name": name,
+        "cat": cat,
+        "ph": "X",
+        "ts": (begin - self.start) / 1000,
+        "dur": (end - begin) / 1000,
+        "pid": os.getpid(),
+        "tid": tid,
+        "args": args,
+      }
+      with self.lock:
+        self.threads.setdefault(tid, threading.current_thread().name)
+        self.events.append(event)
+
+  def write(self, path: str) -> None:
+    """Write the spans recorded so far and start over.
+
+    Args:
+      path: The file to write.
+    """
+    with self.lock:
+      events, self.events = self.events, []
+      threads = dict(self.threads)
+    meta = [{
+      "name": "thread_name",
+      "ph": "M",
+      "pid": os.getpid(),
+      "tid": tid,
+      "args": {"name": name},
+    } for tid, name in threads.items()]
+    with open(path, "wb") as f:
+      f.write(codec.dumpb({"traceEvents": meta + events, "displayTimeUnit": "ms"}))
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+"""Upper bounds in seconds of the latency histogram buckets."""
+
+METRICS = {
+  "duploctl_requests_total": ("counter", "HTTP requests sent, by client, method, endpoint and status."),
+  "duploctl_request_duration_seconds": ("histogram", "HTTP request latency, by client, method and endpoint."),
+  "duploctl_request_bytes_total": ("counter", "Bytes sent (out) and received (in), by client."),
+  "duploctl_cache_total": ("counter", "Cache lookups of the get, index and disk caches, by result."),
+  "duploctl_retries_total": ("counter", "Retried transient failures, by resource."),
+  "duploctl_wait_polls_total": ("counter", "Polls made while waiting on a resource, by resource."),
+}
+"""The metrics DuploCtl records, with their type and help text."""
+
+class Metrics:
+  """Metrics
+
+  Counters and latency histograms of the work a DuploCtl does. Recording is
+  always on and costs a dict update under a lock, which is nothing next to
+  the requests it counts. Clients from plugins record their requests with
+  `request()` too.
+  """
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.counters = {}
+    self.histograms = {}
+
+  def inc(self, name: str, value: float = 1, **labels) -> None:
+    """Add to a counter.
+
+    Args:
+      name: The metric name.
+      value: The amount to add.
+      labels: The labels of the series.
+    """
+    key = (name, tuple(sorted(labels.items())))
+    with self.lock:
+      self.counters[key] = self.counters.get(key, 0) + value
+
+  def observe(self, name: str, seconds: float, **labels) -> None:
+    """Add a latency to a histogram.
+
+    Args:
+      name: The metric name.
+      seconds: The observed latency.
+      labels: The labels of the series.
+    """
+    key = (name, tuple(sorted(labels.items())))
+    with self.lock:
+      h = self.histograms.get(key)
+      if h is None:
+        h = self.histograms[key] = {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+      for i, bound in enumerate(BUCKETS):
+        if seconds <= bound:
+          h["buckets"][i] += 1
+          break
+      h["sum"] += seconds
+      h["count"] += 1
+
+  def request(self, client: str, method: str, path: str, status, seconds: float,
+              bytes_in: int = 0, bytes_out: int = 0) -> None:
+    """Record one HTTP request.
+
+    Args:
+      client: The client that sent it, like `duplo` or `aws`.
+      method: The HTTP method.
+      path: The request path, it is reduced to its template.
+      status: The response status, or `error` when no response came back.
+      seconds: How long the request took.
+      bytes_in: The size of the response body.
+      bytes_out: The size of the request body.
+    """
+    endpoint = path_template(path)
+    self.inc("duploctl_requests_total", client=client, method=method, endpoint=endpoint, status=str(status))
+    self.observe("duploctl_request_duration_seconds", seconds, client=client, method=method, endpoint=endpoint)
+    if bytes_in:
+      self.inc("duploctl_request_bytes_total", bytes_in, client=client, direction="in")
+    if bytes_out:
+      self.inc("duploctl_request_bytes_total", bytes_out, client=client, direction="out")
+
+  def cache(self, cache: str, hit: bool) -> None:
+    """Record a cache lookup.
+
+    Args:
+      cache: Which cache, `get`, `index` or `disk`.
+      hit: Whether the lookup was answered from the cache.
+    """
+    self.inc("duploctl_cache_total", cache=cache, result="hit" if hit else "miss")
+
+  def snapshot(self) -> dict:
+    """The metrics recorded so far.
+
+    Returns:
+      The counters and histograms, each a list of series with their labels.
+    """
+    out = {"counters": {}, "histograms": {}}
+    with self.lock:
+      for (name, labels), value in sorted(self.counters.items()):
+        out["counters"].setdefault(name, []).append({"labels": dict(labels), "value": value})
+      for (name, labels), h in sorted(self.histograms.items()):
+        out["histograms"].setdefault(name, []).append({
+          "labels": dict(labels),
+          "count": h["count"],
+          "sum": h["sum"],
+          "buckets": {str(b): n for b, n in zip(BUCKETS, _cumulative(h["buckets"]))},
+        })
+    return out
+
+  def prometheus(self) -> str:
+    """The metrics in the Prometheus text exposition format.
+
+    Returns:
+      The metrics as text.
+    """
+    snap = self.snapshot()
+    lines = []
+    for name, series in {**snap["counters"], **snap["histograms"]}.items():
+      kind, help = METRICS.get(name, ("counter" if name in snap["counters"] else "histogram", name))
+      lines.append(f"# HELP {name} {help}")
+      lines.append(f"# TYPE {name} {kind}")
+      for s in series:
+        if "value" in s:
+          lines.append(f"{name}{_labels(s['labels'])} {_number(s['value'])}")
+          continue
+        for le, n in s["buckets"].items():
+          lines.append(f"{name}_bucket{_labels({**s['labels'], 'le': le})} {n}")
+        lines.append(f"{name}_bucket{_labels({**s['labels'], 'le': '+Inf'})} {s['count']}")
+        lines.append(f"{name}_sum{_labels(s['labels'])} {_number(s['sum'])}")
+        lines.append(f"{name}_count{_labels(s['labels'])} {s['count']}")
+    return "\n".join(lines) + "\n"
+
+  def write(self, path: str) -> None:
+    """Write the metrics recorded so far in the Prometheus text format and start over.
+
+    Starting over keeps a warm client, like the daemon's, from adding one
+    invocation's requests to the next one's file.
+
+    Args:
+      path: The file to write.
+    """
+    written = Metrics()
+    with self.lock:
+      written.counters, self.counters = self.counters, {}
+      written.histograms, self.histograms = self.histograms, {}
+    with open(path, "w") as f:
+      f.write(written.prometheus())
+
+def _cumulative(counts):
+  total = 0
+  for n in counts:
+    total += n
+    yield total
+
+def _labels(labels: dict) -> str:
+  if not labels:
+    return ""
+  def escape(v):
+    return str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+  return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}"
+
+def _number(v) -> str:
+  return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+PHASES = ("load", "command", "filter", "format")
+"""The phases of a command that a profile is broken down by."""
+
+class Profiler:
+  """Profiler
+
+  Profiles the CPU or memory of each phase of a command. With `cpu` the
+  phases run under cProfile, and a sampler records the stacks of the threads
+  that are in a phase for flamegraphs, each stack rooted at its phase. With
+  `mem` tracemalloc snapshots are taken around each phase and the sites that
+  allocated the most are reported with the peak. Phases that run at once in
+  a fan-out share the memory they allocate, since tracemalloc is not per
+  thread.
+
+  A phase entered while its thread is already in one is counted with the
+  outer phase, like a command calling another command.
+
+  One cProfile runs at a time, in the first thread to enter a phase, since
+  from Python 3.12 a profiler covers the whole process and a second one
+  can't be enabled. Phases in other threads, like those of a fan-out, are
+  still timed and sampled. Writing the profile starts it over, and the
+  sampler or tracemalloc start again with the next phase.
+  """
+  INTERVAL = 0.005
+  """Seconds between stack samples."""
+
+  FRAMES = 1
+  """Frames kept by tracemalloc for each allocation, sites are reported by their innermost frame."""
+
+  def __init__(self, mode: str):
+    if mode not in ("cpu", "mem"):
+      raise ValueError(f"Unknown profile mode {mode}, expected cpu or mem")
+    self.mode = mode
+    self.lock = threading.Lock()
+    self.local = threading.local()
+    self.active = {}
+    self.owner = None
+    self.running = False
+    self.stopped = threading.Event()
+    self.tracing = False
+    self.__reset()
+
+  @contextmanager
+  def phase(self, name: str):
+    """Profile a block as one phase.
+
+    Args:
+      name: The phase, one of `PHASES`.
+    """
+    if getattr(self.local, "phase", None):
+      yield
+      return
+    with self.lock:
+      self.__start()
+    self.local.phase = name
+    begin = time.perf_counter()
+    try:
+      with (self.__cpu(name) if self.mode == "cpu" else self.__mem(name)):
+        yield
+    finally:
+      self.local.phase = None
+      elapsed = time.perf_counter() - begin
+      with self.lock:
+        calls, seconds = self.timings.get(name, (0, 0.0))
+        self.timings[name] = (calls + 1, seconds + elapsed)
+
+  def __reset(self):
+    self.timings = {}
+    self.profiles = []
+    self.stacks = {}
+    self.sites = {}
+    self.peak = 0
+
+  def __start(self):
+    # called with the lock held
+    if self.running:
+      return
+    self.running = True
+    if self.mode == "cpu":
+      self.stopped = threading.Event()
+      threading.Thread(target=self.__sample, args=(self.stopped,), name="duploctl-profiler", daemon=True).start()
+    elif not tracemalloc.is_tracing():
+      tracemalloc.start(self.FRAMES)
+      self.tracing = True
+
+  @contextmanager
+  def __cpu(self, name: str):
+    tid = threading.get_ident()
+    prof = None
+    with self.lock:
+      if self.owner is None:
+        prof, self.owner = cProfile.Profile(), tid
+    if prof:
+      try:
+        prof.enable()
+      except ValueError:
+        # another profiler, like a debugger or coverage, holds the hook, the sampler still runs
+        prof = None
+        with self.lock:
+          self.owner = None
+    with self.lock:
+      self.active[tid] = name
+    try:
+      yield
+    finally:
+      if prof:
+        prof.disable()
+      with self.lock:
+        del self.active[tid]
+        if prof:
+          self.owner = None
+          self.profiles.append(prof)
+
+  @contextmanager
+  def __mem(self, name: str):
+    with self.lock:
+      if not self.active:
+        # the peak is kept per phase, take the one so far before starting over
+        self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+      self.active[threading.get_ident()] = name
+      before = tracemalloc.take_snapshot()
+    try:
+      yield
+    finally:
+      with self.lock:
+        del self.active[threading.get_ident()]
+        after = tracemalloc.take_snapshot()
+        self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+        sites = self.sites.setdefault(name, {})
+        for stat in after.compare_to(before, "lineno"):
+          frame = stat.traceback[0]
+          # leave out what profiling itself allocates
+          if stat.size_diff > 0 and frame.filename not in (tracemalloc.__file__, __file__):
+            key = (frame.filename, frame.lineno)
+            size, count = sites.get(key, (0, 0))
+            sites[key] = (size + stat.size_diff, count + max(stat.count_diff, 0))
+
+  def __sample(self, stopped: threading.Event):
+    me = threading.get_ident()
+    while not stopped.wait(self.INTERVAL):
+      with self.lock:
+        if not self.active:
+          continue
+        frames = sys._current_frames()
+        for tid, name in self.active.items():
+          frame = frames.get(tid)
+          if tid == me or frame is None:
+            continue
+          stack = []
+          while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+          key = ";".join([name, *stack[::-1]])
+          self.stacks[key] = self.stacks.get(key, 0) + 1
+
+  def write(self, prefix: str = "duploctl", stream=None) -> None:
+    """Write the profile, report it and start over.
+
+    With `cpu` the cProfile stats are written to `{prefix}.prof`, for
+    `pstats` or snakeviz, and the collapsed stacks to `{prefix}.folded`, for
+    flamegraph.pl or speedscope. The time spent in each phase and the
+    functions that took the longest are reported. With `mem` the peak and
+    the sites that allocated the most in each phase are reported.
+
+    Args:
+      prefix: The path the files are written to, without an extension.
+      stream: Where the report goes, stderr by default.
+    """
+    stream = stream or sys.stderr
+    with self.lock:
+      self.stopped.set()
+      self.running = False
+      timings, profiles, stacks, sites = self.timings, self.profiles, self.stacks, self.sites
+      peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+      self.__reset()
+      if self.tracing:
+        tracemalloc.stop()
+        self.tracing = False
+    print(f"{'phase':<10} {'calls':>6} {'seconds':>10}", file=stream)
+    for name in sorted(timings, key=_phase_order):
+      calls, seconds = timings[name]
+      print(f"{name:<10} {calls:>6} {seconds:>10.3f}", file=stream)
+    if self.mode == "cpu":
+      self.__write_cpu(prefix, stream, profiles, stacks)
+    else:
+      self.__write_mem(stream, peak, sites)
+
+  def __write_cpu(self, prefix: str, stream, profiles: list, stacks: dict) -> None:
+    with open(f"{prefix}.folded", "w") as f:
+      f.writelines(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+    if not profiles:
+      return
+    stats = pstats.Stats(profiles[0], stream=stream)
+    for prof in profiles[1:]:
+      stats.add(prof)
+    stats.dump_stats(f"{prefix}.prof")
+    print(f"\nwrote {prefix}.prof and {prefix}.folded", file=stream)
+    stats.sort_stats("cumulative").print_stats(20)
+
+  def __write_mem(self, stream, peak: int, sites: dict, top: int = 10) -> None:
+    print(f"\npeak traced memory {peak / 1024:.1f} KiB", file=stream)
+    for name in sorted(sites, key=_phase_order):
+      ranked = sorted(sites[name].items(), key=lambda i: i[1][0], reverse=True)[:top]
+      if not ranked:
+        continue
+      print(f"\ntop allocation sites in {name}", file=stream)
+      for (filename, lineno), (size, count) in ranked:
+        print(f"{size / 1024:>10.1f} KiB {count:>8} blocks  {filename}:{lineno}", file=stream)
+
+def _phase_order(name: str) -> int:
+  return PHASES.index(name) if name in PHASES else len(PHASES)
+
+REDACTED = ("authorization", "duplotoken", "cookie", "set-cookie", "proxy-authorization")
+"""Headers whose values are never written to an archive."""
+
+class HttpArchive:
+  """HTTP Archive
+
+  Records the requests of the HTTP clients as HAR 1.2 entries, which load as
+  a waterfall in browser dev tools and HAR viewers. The values of credential
+  headers like `Authorization` and `duplotoken` are redacted, and bodies are
+  left out with only their sizes and types kept, since responses like the
+  JIT credentials carry secrets. GETs answered from the cache are recorded
+  too, annotated with `_cache`, along with the `_client` that sent each
+  request and its `_endpoint` template.
+  """
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.entries = []
+
+  def record(self, client: str, method: str, url: str, headers: dict, started: float, seconds: float,
+             response=None, stream: bool = False, cache: str | None = None, error: BaseException | None = None) -> None:
+    """Record one request.
+
+    Args:
+      client: The client that sent it, like `duplo` or `argo_wf`.
+      method: The HTTP method.
+      url: The full URL.
+      headers: The headers that were sent.
+      started: When the request started, in seconds since the epoch.
+      seconds: How long the request took.
+      response: The response, when one came back.
+      stream: Whether the response is streamed.
+      cache: `hit` or `miss` for cacheable GETs.
+      error: Why no response came back.
+    """
+    received, sent = body_sizes(response, stream) if response is not None else (0, 0)
+    total = seconds * 1000
+    elapsed = getattr(response, "elapsed", None)
+    wait = min(elapsed.total_seconds() * 1000, total) if isinstance(elapsed, datetime.timedelta) else total
+    res_headers = getattr(response, "headers", None)
+    entry = {
+      "startedDateTime": datetime.datetime.fromtimestamp(started, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+      "time": total,
+      "request": {
+        "method": method,
+        "url": url,
+        "httpVersion": "HTTP/1.1",
+        "cookies": [],
+        "headers": _har_headers(headers),
+        "queryString": [{"name": k, "value": v} for k, v in parse_qsl(urlsplit(url).query)],
+        "headersSize": -1,
+        "bodySize": sent,
+      },
+      "response": {
+        "status": _int(getattr(response, "status_code", 0)),
+        "statusText": _str(getattr(response, "reason", "")),
+        "httpVersion": "HTTP/1.1",
+        "cookies": [],
+        "headers": _har_headers(res_headers),
+        "content": {
+          "size": received,
+          "mimeType": _str(res_headers.get("Content-Type", "")) if isinstance(res_headers, Mapping) else "",
+        },
+        "redirectURL": "",
+        "headersSize": -1,
+        "bodySize": received,
+      },
+      "cache": {},
+      "timings": {
+        "blocked": -1,
+        "dns": -1,
+        "connect": -1,
+        "ssl": -1,
+        "send": 0,
+        "wait": wait,
+        "receive": total - wait,
+      },
+      "_client": client,
+      "_endpoint": path_template(urlsplit(url).path),
+    }
+    if cache:
+      entry["_cache"] = cache
+    if response is None and error is not None:
+      entry["_error"] = str(error)
+    with self.lock:
+      self.entries.append(entry)
+
+  def write(self, path: str, version: str | None = None) -> None:
+    """Write the requests recorded so far and start over.
+
+    Args:
+      path: The file to write.
+      version: The duploctl version named as the creator.
+    """
+    with self.lock:
+      entries, self.entries = self.entries, []
+    entries.sort(key=lambda e: e["startedDateTime"])
+    har = {"log": {
+      "version": "1.2",
+      "creator": {"name": "duploctl", "version": version or ""},
+      "pages": [],
+      "entries": entries,
+    }}
+    with open(path, "wb") as f:
+      f.write(codec.dumpb(har))
+
+def _har_headers(headers) -> list:
+  if not isinstance(headers, Mapping):
+    return []
+  return [{
+    "name": name,
+    "value": "REDACTED" if name.lower() in REDACTED else _str(value),
+  } for name, value in headers.items()]
+
+def _int(v) -> int:
+  return v if isinstance(v, int) else 0
+
+def _str(v) -> str:
+  return v if isinstance(v, str) else ""
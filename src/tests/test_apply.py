@@ -0,0 +1,104 @@
+import time
+import pytest
+from duplocloud.controller import DuploCtl
+from duplocloud.errors import DuploError
+from duplo_resource.apply import DuploApply
+
+MANIFEST = """
+kind: ingress
+spec:
+  metadata:
+    name: web
+---
+kind: service
+spec:
+  Name: web
+---
+kind: service
+spec:
+  Name: worker
+---
+kind: configmap
+spec:
+  metadata:
+    name: web
+"""
+
+@pytest.fixture
+def portal(mocker):
+  c = DuploCtl(host="https://example.duplocloud.net", token="abc")
+  c.applied = []
+  def resource(kind):
+    if kind == "apply":
+      return DuploApply(c)
+    r = mocker.MagicMock()
+    r.name_from_body.side_effect = lambda body: body.get("Name") or body["metadata"]["name"]
+    def apply(body=None):
+      time.sleep(0.2 if kind == "service" else 0)
+      if body.get("Name") == "broken":
+        raise DuploError("bad image", 400)
+      c.applied.append((kind, r.name_from_body(body), time.monotonic()))
+      return {"message": "ok"}
+    r.command.return_value = apply
+    return r
+  mocker.patch.object(c, "load", side_effect=resource)
+  return c
+
+@pytest.mark.unit
+def test_apply_directory_in_dependency_order(portal, tmp_path):
+  (tmp_path / "app.yaml").write_text(MANIFEST)
+  (tmp_path / "notes.txt").write_text("ignored")
+  (tmp_path / ".export.json").write_text('{"exported": []}')
+  start = time.monotonic()
+  result = portal.load("apply").run(manifests=[str(tmp_path)])
+  kinds = [kind for kind, _, _ in portal.applied]
+  assert kinds == ["configmap", "service", "service", "ingress"]
+  # both services were applied at the same time
+  assert time.monotonic() - start < 0.35
+  assert [a["name"] for a in result["applied"]] == ["web", "web", "worker", "web"]
+
+@pytest.mark.unit
+def test_apply_summarizes_failures(portal):
+  docs = [
+    {"kind": "service", "spec": {"Name": "broken"}},
+    {"kind": "service", "spec": {"Name": "web"}},
+    {"kind": "ingress", "spec": {"metadata": {"name": "web"}}},
+  ]
+  with pytest.raises(DuploError) as e:
+    portal.load("apply").run(manifests=docs)
+  assert "1 of 3 documents failed" in str(e.value)
+  assert "service broken (document 0): bad image" in str(e.value)
+  # everything else was still applied
+  assert [name for _, name, _ in portal.applied] == ["web", "web"]
+  assert "2 documents were applied\n  service web\n  ingress web" in str(e.value)
+
+@pytest.mark.unit
+def test_apply_reports_unsupported_kinds(portal, mocker):
+  load = portal.load.side_effect
+  def resource(kind):
+    if kind == "nope":
+      raise DuploError("Resource named nope not found.", 404)
+    r = load(kind)
+    if kind == "plan":
+      r.command.side_effect = DuploError("Command apply not found.", 404)
+    return r
+  portal.load.side_effect = resource
+  docs = [
+    {"kind": "plan", "spec": {"Name": "default"}},
+    {"kind": "nope", "spec": {"Name": "x"}},
+    {"kind": "service", "spec": {"Name": "web"}},
+  ]
+  with pytest.raises(DuploError) as e:
+    portal.load("apply").run(manifests=docs)
+  assert "2 of 3 documents failed" in str(e.value)
+  assert "plan (document 0): kind plan has no apply command" in str(e.value)
+  assert "nope (document 1): unknown kind nope" in str(e.value)
+  assert [name for _, name, _ in portal.applied] == ["web"]
+
+@pytest.mark.unit
+def test_apply_requires_kind_and_spec(portal, tmp_path):
+  f = tmp_path / "bad.yaml"
+  f.write_text("Name: web\n")
+  with pytest.raises(DuploError, match="must have a kind and a spec"):
+    portal("apply", "-f", str(f))
+  assert portal.applied == []
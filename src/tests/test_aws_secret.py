@@ -58,6 +58,7 @@ def aws_secret(mocker):
     mock_client.load_client.return_value = mock_client
     mock_client.tenant = "mytenant"
     mock_client.wait = False
+    mock_client.tenant_scope.return_value = {}
     secret = DuploAwsSecret(mock_client)
     secret._tenant = {"AccountName": "mytenant", "TenantId": "tid-123"}
     secret._tenant_id = "tid-123"
@@ -0,0 +1,91 @@
+import io
+import json
+import time
+
+import pytest
+
+from duplo_resource.bulk import DuploBulk
+from duplocloud import args
+from duplocloud.commander import Command
+from duplocloud.controller import DuploCtl
+from duplocloud.errors import DuploError
+from duplocloud.resource import DuploResource
+
+@pytest.fixture
+def portal(mocker):
+  c = DuploCtl(host="https://example.duplocloud.net", token="abc")
+  calls = []
+  def update_image(name=None, image=None):
+    calls.append((name, image))
+    if name == "bad":
+      raise DuploError("Service 'bad' not found", 404)
+    time.sleep(0.05 if name == "api" else 0)
+    return {"message": f"{name} set to {image}"}
+  resource = mocker.MagicMock()
+  resource.command.return_value = update_image
+  mocker.patch.object(c, "load", side_effect=lambda kind: resource if kind == "service" else DuploBulk(c))
+  c.calls = calls
+  return c
+
+@pytest.mark.unit
+def test_bulk_reports_each_row_in_order(portal):
+  rows = io.StringIO('{"name": "api", "image": "nginx:2"}\n\n{"name": "bad", "image": "x"}\n{"name": "web", "image": "nginx:2"}\n')
+  results = list(portal.load("bulk").run("service", "update_image", rows=list(DuploBulk(portal).read(rows))))
+  assert [r["row"] for r in results] == [0, 1, 2]
+  assert results[0] == {"row": 0, "ok": True, "result": {"message": "api set to nginx:2"}}
+  assert results[1]["ok"] is False
+  assert results[1]["code"] == 404
+  assert results[2]["ok"] is True
+
+@pytest.mark.unit
+def test_bulk_list_rows_are_cli_args(mocker):
+  c = DuploCtl(host="https://example.duplocloud.net", token="abc")
+  seen = []
+  resource = mocker.MagicMock()
+  resource.command.return_value = lambda *a: seen.append(a) or "ok"
+  mocker.patch.object(c, "load", side_effect=lambda kind: resource if kind == "service" else DuploBulk(c))
+  results = list(c.load("bulk").run("service", "update_image", rows=[["web", "nginx:2"]]))
+  assert seen == [("web", "nginx:2")]
+  assert results == [{"row": 0, "ok": True, "result": "ok"}]
+
+class _Scaler(DuploResource):
+  @Command()
+  def scale(self,
+            name: args.NAME,
+            replica: args.REPLICAS = None,
+            wait: args.WAIT = False,
+            targets: args.TARGETS = None) -> dict:
+    return {"name": name, "replica": replica, "wait": wait, "targets": targets}
+
+@pytest.fixture
+def scaler(mocker):
+  c = DuploCtl(host="https://example.duplocloud.net", token="abc")
+  mocker.patch.object(c, "load", side_effect=lambda kind: _Scaler(c) if kind == "service" else DuploBulk(c))
+  return c
+
+@pytest.mark.unit
+def test_bulk_reads_csv(tmp_path, scaler):
+  f = tmp_path / "rows.csv"
+  f.write_text("name,replica,wait,targets\nweb,3,true,a b\nworker,,no,\n")
+  results = json.loads(scaler("bulk", "service", "scale", "-f", str(f), "--parallel", "2"))
+  assert [r["result"] for r in results] == [
+    {"name": "web", "replica": 3, "wait": True, "targets": ["a", "b"]},
+    {"name": "worker", "replica": None, "wait": None, "targets": None},
+  ]
+
+@pytest.mark.unit
+def test_bulk_csv_rejects_bad_values(tmp_path, scaler):
+  f = tmp_path / "rows.csv"
+  f.write_text("name,replica\nweb,three\n")
+  g = tmp_path / "extra.csv"
+  g.write_text("name,color\nweb,red\n")
+  assert json.loads(scaler("bulk", "service", "scale", "-f", str(f)))[0]["code"] == 400
+  assert json.loads(scaler("bulk", "service", "scale", "-f", str(g)))[0]["error"] == "unknown arguments ['color']"
+
+@pytest.mark.unit
+def test_bulk_streams_ndjson(tmp_path, portal):
+  portal.output = "ndjson"
+  f = tmp_path / "rows.ndjson"
+  f.write_text('{"name": "web", "image": "nginx:2"}\n')
+  lines = list(portal("bulk", "service", "update_image", "-f", str(f)))
+  assert [json.loads(line)["ok"] for line in lines] == [True]
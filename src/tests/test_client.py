@@ -262,3 +262,238 @@ def test_call_none_result_returns_none(duplo_with_mock_resource):
   c.load("tenant").return_value = None
   result = c("tenant", "list")
   assert result is None
+
+@pytest.mark.unit
+def test_call_invalid_query_fails_before_running(duplo_with_mock_resource):
+  """A query that does not parse raises before the resource is loaded"""
+  c = duplo_with_mock_resource
+  with pytest.raises(DuploError, match="parsing failed"):
+    c("tenant", "list", query="[?Name==")
+  c.load.assert_not_called()
+
+@pytest.mark.unit
+def test_filter_compiles_query_once(duplo_with_mock_resource):
+  """Repeated filtering with the same query reuses the parsed expression"""
+  from duplocloud.controller import _compile_query
+  c = duplo_with_mock_resource
+  _compile_query.cache_clear()
+  for n in range(100):
+    assert c.filter({"Name": f"svc-{n}"}, query="Name") == f"svc-{n}"
+  info = _compile_query.cache_info()
+  assert info.misses == 1
+  assert info.hits == 99
+
+@pytest.mark.unit
+def test_project_fields():
+  """project keeps only the requested fields, nested paths included"""
+  c = DuploCtl(host="https://example.duplocloud.net")
+  pod = {
+    "Name": "web",
+    "CurrentStatus": 1,
+    "Template": {"Image": "nginx", "OtherDockerConfig": "{...}"},
+    "Containers": [{"Name": "app", "DockerId": "abc"}],
+  }
+  assert c.project(pod, "Name, Template.Image") == {"Name": "web", "Template": {"Image": "nginx"}}
+  assert c.project([pod], ["Containers.Name", "Missing"]) == [{"Containers": [{"Name": "app"}]}]
+  assert c.project(pod, "Template,Template.Image")["Template"] == pod["Template"]
+  assert c.project(pod) is pod
+
+@pytest.mark.unit
+def test_project_generators_lazily():
+  """Generators are projected one item at a time"""
+  c = DuploCtl(host="https://example.duplocloud.net", fields="Name")
+  result = c.project(iter([{"Name": "a", "Big": "x"}, {"Name": "b", "Big": "y"}]))
+  assert next(result) == {"Name": "a"}
+  assert list(result) == [{"Name": "b"}]
+
+# ---------------------------------------------------------------------------
+# Fan-out across contexts
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def portals_config(tmp_path):
+  """A config file with three portals."""
+  config = tmp_path / "config"
+  config.write_text('''
+current-context: alpha
+contexts:
+- name: alpha
+  host: https://alpha.duplocloud.net
+  token: a
+- name: beta
+  host: https://beta.duplocloud.net
+  token: b
+- name: broken
+  host: https://broken.duplocloud.net
+  token: c
+''')
+  return str(config)
+
+@pytest.fixture
+def portals(portals_config, mocker):
+  """Each portal's resources return its own host and the broken portal fails."""
+  def load(self, kind):
+    def run(*args, **kwargs):
+      if "broken" in self.host:
+        raise DuploError("Unauthorized", 403)
+      return [{"Host": self.host, "Args": list(args)}]
+    return run
+  mocker.patch.object(DuploCtl, "load", autospec=True, side_effect=load)
+  return portals_config
+
+@pytest.mark.unit
+def test_single_context_is_not_fanned_out(portals):
+  c = DuploCtl(ctx="beta", config_file=portals)
+  c.output = None
+  assert c.contexts is None
+  assert c("tenant", "list") == [{"Host": "https://beta.duplocloud.net", "Args": ["list"]}]
+
+@pytest.mark.unit
+def test_fan_out_listed_contexts(portals):
+  c = DuploCtl(ctx="alpha, beta", config_file=portals, query="[].Host")
+  c.output = None
+  assert c.contexts == ["alpha", "beta"]
+  assert c("tenant", "list") == {
+    "alpha": {"ok": True, "result": ["https://alpha.duplocloud.net"]},
+    "beta": {"ok": True, "result": ["https://beta.duplocloud.net"]},
+  }
+
+@pytest.mark.unit
+def test_fan_out_all_contexts_reports_failures(portals):
+  c = DuploCtl(all_contexts=True, config_file=portals)
+  c.output = None
+  result = c("tenant", "list")
+  assert list(result) == ["alpha", "beta", "broken"]
+  assert result["alpha"]["ok"] and result["beta"]["ok"]
+  assert result["broken"] == {"ok": False, "error": "Unauthorized", "code": 403}
+
+@pytest.mark.unit
+def test_with_context_keeps_settings(portals):
+  c = DuploCtl(ctx="alpha,beta", config_file=portals, tenant="dev", fields="Name", cache_dir="/tmp/x")
+  view = c.with_context("beta")
+  assert view.host == "https://beta.duplocloud.net"
+  assert view.token == "b"
+  assert (view.tenant, view.fields, view.cache_dir) == ("dev", "Name", "/tmp/x")
+  assert view.contexts is None
+  assert view.load_client("duplo") is not c.load_client("duplo")
+
+@pytest.mark.unit
+def test_with_context_drops_the_tenant_id(portals_config):
+  c = DuploCtl(ctx="alpha", config_file=portals_config, tenant="dev")
+  c.tenantid = "t-alpha"
+  c.tenant_scope()["tenant_id"] = "t-alpha"
+  view = c.with_context("beta")
+  assert (view.tenant, view.tenantid) == ("dev", None)
+  assert view.tenant_scope() == {}
+
+# ---------------------------------------------------------------------------
+# Fan-out across tenants
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def tenants_portal(mocker):
+  """A DuploCtl whose tenant list has two tenants, where the service
+  resource echoes the tenant it runs in and fails in prod."""
+  c = DuploCtl(host="https://example.duplocloud.net", token="abc", tenants="dev,prod,missing")
+  c.output = None
+  tenant_svc = mocker.MagicMock()
+  tenant_svc.list.return_value = [
+    {"AccountName": "dev", "TenantId": "t-dev"},
+    {"AccountName": "Prod", "TenantId": "t-prod"},
+  ]
+  calls = []
+  def load(self, kind):
+    if kind == "tenant":
+      return tenant_svc
+    def run(*args, **kwargs):
+      calls.append(self)
+      if self.tenant == "prod":
+        raise DuploError("Forbidden", 403)
+      return [{"Tenant": self.tenant, "TenantId": self.tenantid, "Scope": self.tenant_scope()["tenant"]["TenantId"]}]
+    return run
+  mocker.patch.object(DuploCtl, "load", autospec=True, side_effect=load)
+  c.calls = calls
+  c.tenant_svc = tenant_svc
+  return c
+
+@pytest.mark.unit
+def test_fan_out_listed_tenants(tenants_portal):
+  c = tenants_portal
+  result = c("service", "list", query="[0].TenantId")
+  assert result == {
+    "dev": {"ok": True, "result": "t-dev"},
+    "prod": {"ok": False, "error": "Forbidden", "code": 403},
+    "missing": {"ok": False, "error": "Tenant 'missing' not found", "code": 404},
+  }
+  c.tenant_svc.list.assert_called_once()
+
+@pytest.mark.unit
+def test_fan_out_all_tenants_shares_client(tenants_portal):
+  c = tenants_portal
+  c.tenants = None
+  c.all_tenants = True
+  result = c("service", "list")
+  assert list(result) == ["dev", "prod"]
+  assert result["dev"]["result"] == [{"Tenant": "dev", "TenantId": "t-dev", "Scope": "t-dev"}]
+  views = c.calls
+  assert len(views) == 2 and all(v is not c for v in views)
+  assert all(v.load_client("duplo") is c.load_client("duplo") for v in views)
+  assert c.tenant is None and c.tenantid is None
+
+# ---------------------------------------------------------------------------
+# Tenant views
+# ---------------------------------------------------------------------------
+
+@pytest.mark.unit
+def test_with_tenant_shares_the_portal_client():
+  c = DuploCtl(host="https://example.duplocloud.net", token="abc", tenant="dev", query="[].Name")
+  view = c.with_tenant("Prod")
+  assert (view.tenant, view.tenantid) == ("prod", None)
+  assert (c.tenant, view.query) == ("dev", "[].Name")
+  assert view.load_client("duplo") is c.load_client("duplo")
+  assert c.with_tenant(tenant_id="t-1").with_tenant("qa")._parent is c
+
+@pytest.mark.unit
+def test_with_tenant_shares_the_token():
+  c = DuploCtl(host="https://example.duplocloud.net", tenant="dev")
+  view = c.with_tenant("prod")
+  view.token = "fresh"
+  assert c.token == "fresh"
+  c.token = "newer"
+  assert view.token == "newer"
+
+@pytest.mark.unit
+def test_with_tenant_scopes_stay_apart(mocker):
+  c = DuploCtl(host="https://example.duplocloud.net", token="abc", tenant="dev")
+  c.tenant_scope()["tenant_id"] = "t-dev"
+  view = c.with_tenant(tenant_id="t-prod")
+  view.tenant_scope()["tenant_id"] = "t-prod"
+  assert c.tenant_scope()["tenant_id"] == "t-dev"
+  assert c.tenant_scope("t-prod") is view.tenant_scope()
+
+@pytest.mark.unit
+def test_with_settings_shares_the_caches():
+  c = DuploCtl(host="https://example.duplocloud.net", token="abc", tenant="dev")
+  view = c.with_settings(output=" yaml ", query=" [].Name ", tenants="Dev,qa", har="out.har", environ={"KUBECONFIG": "k"})
+  assert (view.output, view.query, view.tenants) == ("yaml", "[].Name", ["dev", "qa"])
+  assert (c.output, c.query, c.tenants, c.archive) == ("json", None, None, None)
+  assert view.archive is not None and view.environ == {"KUBECONFIG": "k"}
+  client = view.load_client("duplo")
+  assert client is not c.load_client("duplo") and client.duplo is view
+  assert client._ttl_cache is c.load_client("duplo")._ttl_cache
+  with pytest.raises(DuploError, match="Unknown setting"):
+    c.with_settings(colour="red")
+
+@pytest.mark.unit
+def test_fan_out_contexts_and_tenants(portals_config, mocker):
+  def load(self, kind):
+    if kind == "tenant":
+      t = mocker.MagicMock()
+      t.list.return_value = [{"AccountName": "dev", "TenantId": f"{self.host}-dev"}]
+      return t
+    return lambda *args: self.tenantid
+  mocker.patch.object(DuploCtl, "load", autospec=True, side_effect=load)
+  c = DuploCtl(ctx="alpha,beta", config_file=portals_config, all_tenants=True)
+  c.output = None
+  result = c("service", "list")
+  assert result["beta"] == {"ok": True, "result": {"dev": {"ok": True, "result": "https://beta.duplocloud.net-dev"}}}
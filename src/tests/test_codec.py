@@ -0,0 +1,77 @@
+import json
+import pytest
+import requests
+from duplocloud import codec
+from duplo_resource.cache import DuploCache
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request, mocker):
+  if request.param == "orjson" and codec.orjson is None:
+    pytest.skip("orjson is not installed")
+  mocker.patch.object(codec, "BACKEND", request.param)
+  return request.param
+
+@pytest.mark.unit
+def test_roundtrip(backend):
+  data = {"Name": "web", "Containers": [{"Ready": True, "RestartCount": 2}], "Ratio": 0.5}
+  assert codec.loads(codec.dumps(data)) == data
+  assert codec.loads(codec.dumpb(data)) == data
+  assert json.loads(codec.dumps(data)) == data
+
+@pytest.mark.unit
+def test_falls_back_for_big_ints(backend):
+  assert codec.loads(codec.dumps({"n": 2**70})) == {"n": 2**70}
+
+@pytest.mark.unit
+def test_invalid_json_raises_stdlib_error(backend):
+  with pytest.raises(json.JSONDecodeError):
+    codec.loads("not json {")
+
+@pytest.mark.unit
+def test_bind_json_decodes_response(backend):
+  response = requests.Response()
+  response._content = b'[{"Name": "web"}]'
+  assert codec.bind_json(response).json() == [{"Name": "web"}]
+
+@pytest.mark.unit
+def test_cache_roundtrip(backend, mocker, tmp_path):
+  duplo = mocker.MagicMock(cache_dir=str(tmp_path))
+  cache = DuploCache(duplo)
+  cache.set("creds", {"DuploToken": "abc"})
+  assert cache.get("creds") == {"DuploToken": "abc"}
+
+@pytest.mark.unit
+def test_yaml_same_output_as_pure_python():
+  import yaml
+  from duplocloud.formats import toyaml
+  data = {
+    "Name": "web",
+    "Env": [{"Name": "GREETING", "Value": "hello: world"}, {"Name": "EMPTY", "Value": ""}],
+    "Ports": [80, 443],
+    "Ratio": 0.25,
+    "Enabled": True,
+    "Note": "line one\nline two",
+    "Missing": None,
+  }
+  assert toyaml(data) == yaml.dump(data, Dumper=yaml.Dumper)
+  text = yaml.dump(data, Dumper=codec.SafeDumper)
+  assert text == yaml.safe_dump(data)
+  assert yaml.load(text, Loader=codec.SafeLoader) == data
+  assert yaml.load(text, Loader=codec.FullLoader) == yaml.load(text, Loader=yaml.FullLoader)
+
+@pytest.mark.unit
+def test_json_output_matches_stdlib(backend):
+  from duplocloud.formats import tojson, tondjson
+  data = {"a": 1, "Name": "caf\u00e9", "Ratio": float("nan")}
+  assert tojson(data) == '{"a": 1, "Name": "caf\\u00e9", "Ratio": NaN}'
+  assert list(tondjson([data])) == [json.dumps(data)]
+
+@pytest.mark.unit
+def test_yaml_scalars_same_output_as_pure_python():
+  import yaml
+  from duplocloud.formats import toyaml
+  for scalar in ["web", 5, 0.5, True, None, "a: b"]:
+    text = toyaml(scalar)
+    assert text == yaml.dump(scalar, Dumper=yaml.Dumper)
+    assert yaml.load(text, Loader=codec.SafeLoader) == scalar
+  assert codec.dump_yaml("web", safe=True) == yaml.safe_dump("web")
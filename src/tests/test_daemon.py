@@ -0,0 +1,175 @@
+import logging
+import os
+import socket
+import sys
+import threading
+
+import pytest
+
+from duplocloud import daemon
+from duplocloud.controller import DuploCtl
+from duplocloud.errors import DuploError
+
+GLOBALS = ["--host", "https://example.duplocloud.net", "--token", "abc"]
+
+@pytest.fixture
+def server(tmp_path):
+  s = daemon.DuploDaemon(path=str(tmp_path / "d.sock"))
+  t = threading.Thread(target=s.serve_forever, daemon=True)
+  t.start()
+  yield s
+  s.shutdown()
+  s.server_close()
+
+@pytest.mark.unit
+def test_forward_without_daemon(tmp_path):
+  assert daemon.forward(["service", "list"], path=str(tmp_path / "missing.sock")) is None
+
+@pytest.mark.unit
+def test_forward_skips_daemon_commands(server):
+  assert daemon.forward(["daemon", "status"], path=server.path) is None
+
+@pytest.mark.unit
+def test_status(server):
+  status = next(daemon.request({"op": "status"}, path=server.path))
+  assert status["socket"] == server.path
+  assert status["clients"] == 0
+  assert os.stat(server.path).st_mode & 0o077 == 0
+
+@pytest.mark.unit
+def test_run_relays_output(server, mocker, monkeypatch):
+  monkeypatch.setattr(sys, "stdout", server.stdout)
+  mocker.patch.object(DuploCtl, "__call__", return_value="hello")
+  messages = list(daemon.request({"argv": ["version", *GLOBALS], "env": {}}, path=server.path))
+  assert {"stdout": "hello"} in messages
+  assert messages[-1] == {"exit": 0}
+
+@pytest.mark.unit
+def test_run_exit_code(server, mocker, monkeypatch):
+  monkeypatch.setattr(sys, "stdout", server.stdout)
+  mocker.patch.object(DuploCtl, "__call__", side_effect=DuploError("nope", 404))
+  messages = list(daemon.request({"argv": ["service", "find", "x", *GLOBALS]}, path=server.path))
+  assert {"stdout": "nope"} in messages
+  assert messages[-1] == {"exit": 404}
+
+@pytest.mark.unit
+def test_clients_stay_warm(server):
+  first, args = server.client_for(["service", "list", *GLOBALS])
+  second, _ = server.client_for(["tenant", "list", *GLOBALS, "-o", "yaml", "--query", "[].Name"])
+  other, _ = server.client_for(["tenant", "list", *GLOBALS, "--tenant", "prod"])
+  assert args == ["service", "list"]
+  assert (first.output, second.output, second.query) == ("json", "yaml", "[].Name")
+  assert first.load_client("duplo")._ttl_cache is second.load_client("duplo")._ttl_cache
+  assert other.load_client("duplo")._ttl_cache is not first.load_client("duplo")._ttl_cache
+  assert len(server.clients) == 2
+
+@pytest.mark.unit
+def test_clients_are_bounded(server):
+  for i in range(daemon.CLIENTS + 3):
+    server.client_for([*GLOBALS, "--tenant", f"t{i}"])
+  assert len(server.clients) == daemon.CLIENTS
+
+@pytest.mark.unit
+def test_run_borrows_environment(server, tmp_path, mocker):
+  seen = {}
+  def call(duplo, *args):
+    seen["env"] = duplo.environ.get("DUPLO_DAEMON_TEST")
+    seen["tenant"] = duplo.tenant
+    seen["process"] = os.getenv("DUPLO_DAEMON_TEST")
+    seen["cwd"] = os.getcwd()
+    seen["stdin"] = sys.stdin.read()
+  mocker.patch.object(DuploCtl, "__call__", autospec=True, side_effect=call)
+  env = {"DUPLO_DAEMON_TEST": "yes", "DUPLO_TENANT": "prod"}
+  req = {"argv": GLOBALS, "env": env, "cwd": str(tmp_path), "stdin": "body"}
+  with server.installed():
+    assert server.run(req, lambda msg: None) == 0
+  assert seen == {"env": "yes", "tenant": "prod", "process": None, "cwd": str(tmp_path), "stdin": "body"}
+
+@pytest.mark.unit
+def test_run_without_environment(server, mocker, monkeypatch):
+  monkeypatch.setenv("DUPLO_TENANT", "daemon")
+  seen = {}
+  def call(duplo, *args):
+    seen["environ"] = duplo.environ
+    seen["tenant"] = duplo.tenant
+  mocker.patch.object(DuploCtl, "__call__", autospec=True, side_effect=call)
+  assert server.run({"argv": GLOBALS}, lambda msg: None) == 0
+  assert seen == {"environ": {}, "tenant": None}
+
+@pytest.mark.unit
+def test_run_logs_from_worker_threads(server, mocker):
+  def call(duplo, *args):
+    worker = threading.Thread(target=duplo.logger.warning, args=("from a worker",))
+    worker.start()
+    worker.join()
+  mocker.patch.object(DuploCtl, "__call__", autospec=True, side_effect=call)
+  sent = []
+  assert server.run({"argv": GLOBALS}, sent.append) == 0
+  assert {"stderr": "WARNING from a worker\n"} in sent
+
+@pytest.mark.unit
+def test_run_requests_concurrently(server, tmp_path, mocker):
+  started = threading.Event()
+  seen = {}
+  def call(duplo, *args):
+    who = duplo.environ["DUPLO_DAEMON_TEST"]
+    if who == "first":
+      assert started.wait(5), "the second request waited for the first"
+    else:
+      started.set()
+    seen[who] = duplo.environ["DUPLO_DAEMON_TEST"]
+  mocker.patch.object(DuploCtl, "__call__", autospec=True, side_effect=call)
+  codes = {}
+  def run(who):
+    req = {"argv": GLOBALS, "env": {"DUPLO_DAEMON_TEST": who}, "cwd": str(tmp_path)}
+    codes[who] = server.run(req, lambda msg: None)
+  with server.installed():
+    threads = [threading.Thread(target=run, args=(who,)) for who in ("first", "second")]
+    for t in threads:
+      t.start()
+    for t in threads:
+      t.join(10)
+  assert codes == {"first": 0, "second": 0}
+  assert seen == {"first": "first", "second": "second"}
+
+@pytest.mark.unit
+def test_run_stops_when_client_goes_away(server, mocker, monkeypatch):
+  monkeypatch.setattr(sys, "stderr", server.stderr)
+  log = logging.getLogger("duplo-daemon-test")
+  handler = logging.StreamHandler(server.stderr)
+  log.addHandler(handler)
+  def call(*args):
+    for _ in range(1000):
+      log.warning("still going")
+  mocker.patch.object(DuploCtl, "__call__", side_effect=call)
+  sent = []
+  def send(msg):
+    sent.append(msg)
+    raise BrokenPipeError()
+  try:
+    assert server.run({"argv": GLOBALS}, send) == 1
+  finally:
+    log.removeHandler(handler)
+  assert len(sent) == 1
+
+@pytest.mark.unit
+def test_run_sends_heartbeats(server, mocker, monkeypatch):
+  import time
+  monkeypatch.setattr(daemon, "HEARTBEAT", 0.01)
+  mocker.patch.object(DuploCtl, "__call__", side_effect=lambda *args: time.sleep(0.1))
+  messages = list(daemon.request({"argv": GLOBALS}, path=server.path))
+  assert {"heartbeat": True} in messages
+  assert messages[-1] == {"exit": 0}
+
+@pytest.mark.unit
+def test_forward_gives_up_on_silent_daemon(tmp_path, monkeypatch, capsys):
+  monkeypatch.setattr(daemon, "HEARTBEAT", 0.01)
+  path = str(tmp_path / "silent.sock")
+  listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  listener.bind(path)
+  listener.listen()
+  try:
+    assert daemon.forward(["version"], path=path) == 1
+  finally:
+    listener.close()
+  assert "stopped responding" in capsys.readouterr().err
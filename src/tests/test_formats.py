@@ -0,0 +1,73 @@
+import json
+import pytest
+from collections.abc import Iterator
+from duplocloud.controller import DuploCtl
+from duplocloud.formats import tocsv, tondjson
+
+@pytest.mark.unit
+def test_ndjson_one_line_per_item():
+  lines = tondjson([{"Name": "a"}, {"Name": "b"}])
+  assert isinstance(lines, Iterator)
+  assert [json.loads(line) for line in lines] == [{"Name": "a"}, {"Name": "b"}]
+  assert list(tondjson({"Name": "a"})) == ['{"Name": "a"}']
+
+@pytest.mark.unit
+def test_ndjson_consumes_generators_lazily():
+  produced = []
+  def items():
+    for n in range(3):
+      produced.append(n)
+      yield {"n": n}
+  lines = tondjson(items())
+  assert next(lines) == '{"n": 0}'
+  assert produced == [0]
+
+@pytest.mark.unit
+def test_csv_streams_generators():
+  lines = tocsv(iter([{"Name": "a", "Image": "x"}, {"Name": "b", "Image": "y"}]))
+  assert list(lines) == ["Name,Image", "a,x", "b,y"]
+  assert tocsv([{"Name": "a"}]) == "Name\r\na\r\n"
+
+@pytest.mark.unit
+def test_call_streams_generator_with_query_per_item(mocker):
+  c = DuploCtl(host="https://example.duplocloud.net", output="ndjson")
+  mock_resource = mocker.MagicMock()
+  mock_resource.return_value = iter([{"Name": "a", "Status": 1}, {"Name": "b", "Status": 2}])
+  mocker.patch.object(c, "load", return_value=mock_resource)
+  result = c("pod", "list", query="Name")
+  assert isinstance(result, Iterator)
+  assert list(result) == ['"a"', '"b"']
+
+@pytest.mark.unit
+def test_call_queries_list_per_item_for_ndjson(mocker):
+  c = DuploCtl(host="https://example.duplocloud.net", output="ndjson")
+  mock_resource = mocker.MagicMock()
+  mock_resource.return_value = [{"Name": "a"}, {"Name": "b"}]
+  mocker.patch.object(c, "load", return_value=mock_resource)
+  assert list(c("pod", "list", query="Name")) == ['"a"', '"b"']
+
+@pytest.mark.unit
+def test_call_queries_whole_generator_for_json(mocker):
+  c = DuploCtl(host="https://example.duplocloud.net")
+  mock_resource = mocker.MagicMock()
+  mock_resource.return_value = iter([{"Name": "a"}, {"Name": "b"}])
+  mocker.patch.object(c, "load", return_value=mock_resource)
+  assert json.loads(c("pod", "list", query="[].Name")) == ["a", "b"]
+
+@pytest.mark.unit
+def test_list_command_streams_for_ndjson(mocker):
+  from duplo_resource.pod import DuploPod
+  c = DuploCtl(host="https://example.duplocloud.net", output="ndjson")
+  pod = DuploPod(c)
+  mocker.patch.object(DuploPod, "list", return_value=[{"Name": "a"}])
+  assert isinstance(pod("list"), Iterator)
+  c.output = "json"
+  assert pod("list") == [{"Name": "a"}]
+
+@pytest.mark.unit
+def test_call_collects_generator_for_json(mocker):
+  c = DuploCtl(host="https://example.duplocloud.net")
+  mock_resource = mocker.MagicMock()
+  mock_resource.return_value = iter([{"Name": "a"}, {"Name": "b"}])
+  mocker.patch.object(c, "load", return_value=mock_resource)
+  assert json.loads(c("pod", "list")) == [{"Name": "a"}, {"Name": "b"}]
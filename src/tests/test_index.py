@@ -0,0 +1,78 @@
+import pytest
+from duplocloud.controller import DuploCtl
+from duplocloud.errors import DuploError
+from duplo_resource.index import DuploIndex
+from duplo_resource.cache import DuploCache
+
+TENANTS = [{"AccountName": "dev", "TenantId": "t-dev"}, {"AccountName": "prod", "TenantId": "t-prod"}]
+
+@pytest.fixture
+def portal(mocker, tmp_path):
+  c = DuploCtl(host="https://example.duplocloud.net", token="abc", cache_dir=str(tmp_path))
+  c.listed = []
+  c.services = {
+    "t-dev": [{"Name": "web", "Replicas": 1}],
+    "t-prod": [{"Name": "web", "Replicas": 3}, {"Name": "worker", "Replicas": 2}],
+  }
+  tenant_svc = mocker.MagicMock()
+  tenant_svc.list.return_value = TENANTS
+  def faults(id=None):
+    c.listed.append(("faults", id))
+    return [{"Description": f"disk full on {id}"}]
+  tenant_svc.faults.side_effect = faults
+  def load(kind):
+    if kind == "tenant":
+      return tenant_svc
+    if kind == "cache":
+      return DuploCache(c)
+    if kind == "index":
+      return DuploIndex(c)
+    r = mocker.MagicMock(scope="tenant", _tenant_id=None)
+    r.name_from_body.side_effect = lambda body: body["Name"]
+    def list_items():
+      c.listed.append((kind, r._tenant_id))
+      return c.services[r._tenant_id]
+    r.list.side_effect = list_items
+    return r
+  mocker.patch.object(c, "load", side_effect=load)
+  return c
+
+@pytest.mark.unit
+def test_build_and_query(portal):
+  index = portal.load("index")
+  summary = index.build(kinds=["service", "faults"])
+  assert summary["kinds"] == {"service": 3, "faults": 2}
+  rows = index.query("SELECT tenant, name FROM service WHERE json_extract(data, '$.Replicas') > 1 ORDER BY name")
+  assert rows == [{"tenant": "prod", "name": "web"}, {"tenant": "prod", "name": "worker"}]
+  rows = index.query(kinds=["service"])
+  assert [(r["tenant"], r["name"], r["data"]["Replicas"]) for r in rows] == [("dev", "web", 1), ("prod", "web", 3), ("prod", "worker", 2)]
+  assert portal.filter(rows, query="[?data.Replicas > `2`].name") == ["web"]
+
+@pytest.mark.unit
+def test_refresh_only_fetches_stale_kinds(portal):
+  index = portal.load("index")
+  index.build(kinds=["service"])
+  portal.listed.clear()
+  summary = index.refresh(kinds=["service", "faults"])
+  assert summary["skipped"] == 2
+  assert sorted(portal.listed) == [("faults", "t-dev"), ("faults", "t-prod")]
+
+@pytest.mark.unit
+def test_build_replaces_deleted_objects(portal):
+  index = portal.load("index")
+  index.build(kinds=["service"])
+  portal.services["t-prod"] = [{"Name": "web", "Replicas": 4}]
+  index.build(kinds=["service"])
+  rows = index.query("SELECT name, data FROM service WHERE tenant = 'prod'")
+  assert rows == [{"name": "web", "data": {"Name": "web", "Replicas": 4}}]
+
+@pytest.mark.unit
+def test_query_errors(portal):
+  index = portal.load("index")
+  with pytest.raises(DuploError, match="index build"):
+    index.query("SELECT 1")
+  index.build(kinds=["service"])
+  with pytest.raises(DuploError, match="Index query failed"):
+    index.query("SELECT * FROM nope")
+  with pytest.raises(DuploError, match="Invalid kind"):
+    index.build(kinds=["service; DROP TABLE service"])
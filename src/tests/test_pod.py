@@ -0,0 +1,110 @@
+import pytest
+from duplo_resource.pod import DuploPod
+
+def _pod(id="pod-1"):
+    return {
+        "InstanceId": id,
+        "CurrentStatus": 1,
+        "Host": "10.0.0.1",
+        "Containers": [{"DockerId": f"docker-{id}"}]
+    }
+
+def _logs(*lines):
+    return {"Data": "\n".join(lines) + "\n"}
+
+def _printed(mock_client):
+    return [c.args[0].split(": ", 1)[1] for c in mock_client.logger.warning.call_args_list]
+
+@pytest.mark.unit
+def test_logs_only_prints_new_lines(mocker):
+    mock_client = mocker.MagicMock()
+    mock_client.load_client.return_value = mock_client
+    pod = DuploPod(mock_client)
+    mock_client.post.return_value.json.side_effect = [
+        _logs("a", "b", "c"),
+        _logs("b", "c", "d", "e"),
+        _logs("c", "d", "e"),
+    ]
+    for _ in range(3):
+        pod.logs(pod=_pod())
+    assert _printed(mock_client) == ["a", "b", "c", "d", "e"]
+
+@pytest.mark.unit
+def test_logs_rotation_prints_everything(mocker):
+    mock_client = mocker.MagicMock()
+    mock_client.load_client.return_value = mock_client
+    pod = DuploPod(mock_client)
+    mock_client.post.return_value.json.side_effect = [
+        _logs("a", "b", "c"),
+        _logs("x", "y"),
+        _logs("x", "y"),
+    ]
+    for _ in range(3):
+        pod.logs(pod=_pod())
+    assert _printed(mock_client) == ["a", "b", "c", "x", "y"]
+    # lines may have been missed so the next poll asks for more
+    assert mock_client.post.call_args_list[-1].args[1]["Tail"] == 100
+
+@pytest.mark.unit
+def test_logs_tail_grows_with_rate(mocker):
+    mock_client = mocker.MagicMock()
+    mock_client.load_client.return_value = mock_client
+    pod = DuploPod(mock_client)
+    first = [f"line-{i}" for i in range(50)]
+    second = [f"line-{i}" for i in range(40, 90)]
+    mock_client.post.return_value.json.side_effect = [
+        _logs(*first),
+        _logs(*second),
+        _logs(*second),
+    ]
+    pod.logs(pod=_pod())
+    pod.logs(pod=_pod())
+    pod.logs(pod=_pod())
+    tails = [c.args[1]["Tail"] for c in mock_client.post.call_args_list]
+    assert tails == [50, 50, 100]
+    assert len(_printed(mock_client)) == 90
+
+@pytest.mark.unit
+def test_logs_window_growing_past_previous(mocker):
+    mock_client = mocker.MagicMock()
+    mock_client.load_client.return_value = mock_client
+    pod = DuploPod(mock_client)
+    log = []
+    def grow(path, data, invalidate=True):
+        # a burst of lines then a slow trickle, tailed like the portal does
+        n = 40 if len(log) < 200 else 5
+        for _ in range(n):
+            log.append(f"line-{len(log)}")
+        response = mocker.MagicMock()
+        response.json.return_value = _logs(*log[-data["Tail"]:])
+        return response
+    mock_client.post.side_effect = grow
+    for _ in range(12):
+        pod.logs(pod=_pod())
+    tails = [c.args[1]["Tail"] for c in mock_client.post.call_args_list]
+    assert max(tails) > 50
+    assert _printed(mock_client) == log
+
+@pytest.mark.unit
+def test_follow_fetches_all_pods(mocker):
+    mock_client = mocker.MagicMock()
+    mock_client.load_client.return_value = mock_client
+    pod = DuploPod(mock_client)
+    mock_client.post.return_value.json.return_value = _logs("hello")
+    pod.follow([_pod("pod-1"), _pod("pod-2"), _pod("pod-3")])
+    hosts = sorted(c.args[1]["DockerId"] for c in mock_client.post.call_args_list)
+    assert all(c.kwargs == {"invalidate": False} for c in mock_client.post.call_args_list)
+    assert hosts == ["docker-pod-1", "docker-pod-2", "docker-pod-3"]
+    assert _printed(mock_client) == ["hello"] * 3
+
+@pytest.mark.unit
+def test_follow_forgets_pods_that_are_gone(mocker):
+    mock_client = mocker.MagicMock()
+    mock_client.load_client.return_value = mock_client
+    pod = DuploPod(mock_client)
+    mock_client.post.return_value.json.return_value = _logs("hello")
+    pod.follow([_pod("pod-1"), _pod("pod-2")])
+    pod.follow([_pod("pod-2"), _pod("pod-3")])
+    assert sorted(pod._DuploPod__tails) == ["pod-2", "pod-3"]
+    pod.follow([_pod("pod-1")])
+    assert _printed(mock_client) == ["hello"] * 4
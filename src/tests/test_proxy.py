@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+import urllib.request
+from multiprocessing.pool import ThreadPool
+
+import pytest
+
+from duplocloud import proxy
+
+
+@pytest.fixture
+def server(mocker):
+  s = proxy.CachingProxy("https://example.duplocloud.net/", port=0)
+  s.upstream_calls = []
+  def upstream(method, url, headers=None, data=None, timeout=None):
+    s.upstream_calls.append((method, url, headers.get("Authorization")))
+    time.sleep(0.05)
+    r = mocker.MagicMock(status_code=200, content=b'["dev"]', headers={"Content-Type": "application/json"})
+    return r
+  mocker.patch("duplocloud.proxy.requests.request", side_effect=upstream)
+  threading.Thread(target=s.serve_forever, daemon=True).start()
+  yield s
+  s.shutdown()
+  s.server_close()
+
+def call(server, path, token="abc", method="GET", body=None):
+  req = urllib.request.Request(f"http://127.0.0.1:{server.server_port}{path}", data=body, method=method)
+  if token:
+    req.add_header("Authorization", f"Bearer {token}")
+  with urllib.request.urlopen(req) as res:
+    return res.status, res.read()
+
+@pytest.mark.unit
+def test_ttl_policy():
+  assert proxy.ttl_for("/v3/features/system") == 300
+  assert proxy.ttl_for("/adminproxy/GetTenantNames") == 60
+  assert proxy.ttl_for("/subscriptions/t-1/GetPods") == 5
+  assert proxy.ttl_for("/subscriptions/t-1/GetReplicationControllers") == proxy.DEFAULT_TTL
+
+@pytest.mark.unit
+def test_get_is_cached_per_token(server):
+  assert call(server, "/adminproxy/GetTenantNames") == (200, b'["dev"]')
+  call(server, "/adminproxy/GetTenantNames")
+  call(server, "/adminproxy/GetTenantNames", token="other")
+  assert server.upstream_calls == [
+    ("GET", "https://example.duplocloud.net/adminproxy/GetTenantNames", "Bearer abc"),
+    ("GET", "https://example.duplocloud.net/adminproxy/GetTenantNames", "Bearer other"),
+  ]
+  m = server.metrics()
+  assert (m["hits"], m["misses"]) == (1, 2)
+  assert m["endpoints"]["/adminproxy/GetTenantNames"]["hits"] == 1
+
+@pytest.mark.unit
+def test_concurrent_gets_are_coalesced(server):
+  with ThreadPool(8) as pool:
+    results = pool.map(lambda _: call(server, "/v3/features/system"), range(8))
+  assert all(r == (200, b'["dev"]') for r in results)
+  assert len(server.upstream_calls) == 1
+  m = server.metrics()
+  assert m["misses"] == 1
+  assert m["hits"] + m["coalesced"] == 7
+
+@pytest.mark.unit
+def test_write_passes_through_and_invalidates(server):
+  call(server, "/adminproxy/GetTenantNames")
+  call(server, "/adminproxy/GetTenantNames", token="other")
+  call(server, "/adminproxy/CreateTenant", method="POST", body=b"{}")
+  call(server, "/adminproxy/GetTenantNames")
+  assert [c[0] for c in server.upstream_calls] == ["GET", "GET", "POST", "GET"]
+  m = server.metrics()
+  assert m["passthrough"] == 1
+  assert m["entries"] == 2
+
+@pytest.mark.unit
+def test_metrics_endpoint(server):
+  call(server, "/adminproxy/GetPlans")
+  status, body = call(server, proxy.METRICS_PATH, token=None)
+  assert status == 200
+  assert json.loads(body)["misses"] == 1
+
+@pytest.mark.unit
+def test_cache_is_bounded(server):
+  assert server.cache.maxsize == 1024
+  server.cache = proxy.TLRUCache(maxsize=2, ttu=server.cache.ttu)
+  for name in ("a", "b", "c"):
+    call(server, f"/subscriptions/t-1/GetPods?{name}")
+  assert server.metrics()["entries"] == 2
+  server.cache.expire(time.monotonic() + proxy.ttl_for("/GetPods") + 1)
+  assert len(server.cache) == 0
@@ -0,0 +1,173 @@
+import time
+from copy import deepcopy
+import pytest
+from duplocloud.resource import DuploResource
+from duplocloud.controller import DuploCtl
+from duplocloud.errors import DuploError, DuploNotFound
+from duplo_resource.batch_job import DuploBatchJob
+
+@pytest.mark.unit
+def test_fanout_keeps_order(mocker):
+  r = DuploResource(mocker.MagicMock())
+  def slow(n):
+    time.sleep(0.01 * (5 - n))
+    return n * 10
+  assert r.fanout(slow, range(5)) == [0, 10, 20, 30, 40]
+
+@pytest.mark.unit
+def test_fanout_runs_concurrently(mocker):
+  r = DuploResource(mocker.MagicMock())
+  start = time.monotonic()
+  r.fanout(lambda _: time.sleep(0.2), range(5))
+  assert time.monotonic() - start < 0.6
+
+@pytest.mark.unit
+def test_fanout_flatten_and_empty(mocker):
+  r = DuploResource(mocker.MagicMock())
+  assert r.fanout(lambda n: [n, n], [1, 2], flatten=True) == [1, 1, 2, 2]
+  assert r.fanout(lambda n: n, []) == []
+
+@pytest.mark.unit
+def test_fanout_raises(mocker):
+  r = DuploResource(mocker.MagicMock())
+  def boom(n):
+    if n == 2:
+      raise DuploError("boom", 500)
+    return n
+  with pytest.raises(DuploError, match="boom"):
+    r.fanout(boom, range(4))
+
+@pytest.mark.unit
+def test_batch_job_list_all_merges_queues(mocker):
+  mock_client = mocker.MagicMock()
+  mock_client.load_client.return_value = mock_client
+  jobs = DuploBatchJob(mock_client)
+  mocker.patch.object(DuploBatchJob, "endpoint", lambda self, name: name)
+  queue_svc = mock_client.load.return_value
+  queue_svc.list.return_value = [{"name": "q1"}, {"name": "q2"}]
+  queue_svc.name_from_body.side_effect = lambda q: q["name"]
+  responses = {"q1": [{"JobName": "a"}], "q2": [{"JobName": "b"}, {"JobName": "c"}]}
+  mock_client.get.side_effect = lambda path: mocker.Mock(json=lambda: responses[path])
+  result = jobs.list(all=True)
+  assert [j["JobName"] for j in result] == ["a", "b", "c"]
+
+def _portal(mocker, users):
+  duplo = DuploCtl(host="https://example.duplocloud.net", token="abc")
+  def request(method, url, **kwargs):
+    r = mocker.Mock(status_code=200)
+    r.json.return_value = users if method == "GET" else {}
+    return r
+  req = mocker.patch("duplocloud.client.requests.request", side_effect=request)
+  return duplo, req
+
+@pytest.mark.unit
+def test_find_uses_one_list_call(mocker):
+  users = [{"Username": f"user{i}"} for i in range(50)]
+  duplo, req = _portal(mocker, users)
+  svc = duplo.load("user")
+  for i in range(50):
+    assert svc.find(f"user{i}")["Username"] == f"user{i}"
+  with pytest.raises(DuploNotFound):
+    svc.find("nobody")
+  assert req.call_count == 1
+
+@pytest.mark.unit
+def test_index_returns_copies(mocker):
+  duplo, _ = _portal(mocker, [{"Username": "alice", "Roles": []}])
+  svc = duplo.load("user")
+  svc.find("alice")["Roles"].append("Administrator")
+  assert svc.find("alice")["Roles"] == []
+
+@pytest.mark.unit
+def test_index_invalidated_on_write(mocker):
+  duplo, req = _portal(mocker, [{"Username": "alice"}])
+  svc = duplo.load("user")
+  svc.find("alice")
+  svc.delete("alice")
+  svc.find("alice")
+  assert [c.args[0] for c in req.call_args_list] == ["GET", "POST", "GET"]
+
+@pytest.mark.unit
+def test_read_only_post_keeps_index(mocker):
+  duplo, req = _portal(mocker, [{"Username": "alice"}])
+  svc = duplo.load("user")
+  svc.find("alice")
+  svc.client.post("subscriptions/t1/findContainerLogs", {}, invalidate=False)
+  svc.find("alice")
+  assert [c.args[0] for c in req.call_args_list] == ["GET", "POST"]
+
+@pytest.mark.unit
+def test_fields_prunes_list_and_find(mocker):
+  users = [{"Username": "alice", "Roles": ["Admin"], "Tenants": [{"Id": "t1", "Policy": {"x": 1}}]}]
+  duplo, _ = _portal(mocker, users)
+  duplo.fields = "Username,Tenants.Id"
+  svc = duplo.load("user")
+  assert svc("list") == [{"Username": "alice", "Tenants": [{"Id": "t1"}]}]
+  assert svc("find", "alice") == {"Username": "alice", "Tenants": [{"Id": "t1"}]}
+  # internal lookups still see the whole object
+  assert svc.find("alice")["Roles"] == ["Admin"]
+
+def _v3(mocker, live):
+  from duplocloud.resource import DuploResourceV3
+  r = DuploResourceV3(DuploCtl(host="https://example.duplocloud.net"), slug="things")
+  r.client = mocker.MagicMock()
+  r.client.put.return_value.json.return_value = {"message": "updated"}
+  mocker.patch.object(r, "find", side_effect=lambda name: deepcopy(live))
+  return r
+
+LIVE = {
+  "metadata": {"name": "web", "uid": "abc-123", "creationTimestamp": "2026-10-01T00:00:00Z"},
+  "data": {"LOG_LEVEL": "info", "REGION": "us-west-2"},
+}
+
+@pytest.mark.unit
+def test_apply_skips_unchanged_body(mocker):
+  r = _v3(mocker, LIVE)
+  result = r.apply(body={"metadata": {"name": "web"}, "data": {"LOG_LEVEL": "info", "REGION": "us-west-2"}})
+  assert result == {"message": "things/web is unchanged"}
+  r.client.put.assert_not_called()
+  r.find.assert_called_once_with("web")
+
+@pytest.mark.unit
+def test_apply_writes_changed_body(mocker):
+  r = _v3(mocker, LIVE)
+  body = {"metadata": {"name": "web"}, "data": {"LOG_LEVEL": "debug"}}
+  assert r.apply(body=body) == {"message": "updated"}
+  r.client.put.assert_called_once_with("v3/things/web", body)
+  r.find.assert_called_once_with("web")
+
+@pytest.mark.unit
+def test_update_dryrun_reports_patch(mocker):
+  r = _v3(mocker, LIVE)
+  result = r.update(name="web", patches=[{"op": "remove", "path": "/data/REGION"}], dryrun=True)
+  assert result == {"name": "web", "patch": [{"op": "remove", "path": "/data/REGION"}]}
+  r.client.put.assert_not_called()
+
+@pytest.mark.unit
+def test_apply_passes_live_to_update_overrides(mocker):
+  from duplo_resource.s3 import DuploS3
+  s3 = DuploS3(mocker.MagicMock(validate=False))
+  s3.client = mocker.MagicMock()
+  mocker.patch.object(s3, "find", return_value={"Name": "duploservices-dev-web-123"})
+  s3.apply(body={"Name": "web", "EnableVersioning": True})
+  s3.find.assert_called_once_with("web")
+  s3.client.put.assert_called_once()
+  assert s3.client.put.call_args.args[1] == {"Name": "duploservices-dev-web-123", "EnableVersioning": True}
+
+@pytest.mark.unit
+def test_apply_writes_when_body_leaves_out_a_field(mocker):
+  r = _v3(mocker, {**LIVE, "immutable": True, "status": {"phase": "Active"}})
+  body = {"metadata": {"name": "web"}, "data": {"LOG_LEVEL": "info", "REGION": "us-west-2"}}
+  assert r.apply(body=body) == {"message": "updated"}
+  r.client.put.assert_called_once_with("v3/things/web", body)
+
+@pytest.mark.unit
+def test_configmap_update_keeps_live(mocker):
+  from duplo_resource.configmap import DuploConfigMap
+  cm = DuploConfigMap(DuploCtl(host="https://example.duplocloud.net"))
+  cm.client = mocker.MagicMock()
+  mocker.patch.object(DuploConfigMap, "endpoint", lambda self, name=None: name)
+  live = deepcopy(LIVE)
+  cm.update(name="web", data={"LOG_LEVEL": "debug"}, live=live)
+  assert live == LIVE
+  assert cm.client.put.call_args.args[1]["data"]["LOG_LEVEL"] == "debug"
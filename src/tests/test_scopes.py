@@ -1,7 +1,9 @@
+import time
 import pytest
 from unittest.mock import Mock
 from duplocloud.commander import resources, Resource, Command, load_resource
 from duplocloud.controller import DuploCtl
+from duplocloud.errors import DuploNotFound
 from duplocloud.resource import DuploResourceV2, DuploResourceV3
 
 @pytest.mark.unit
@@ -239,3 +241,68 @@ def test_v3_tenant_scope_endpoint():
   assert instance.endpoint() == "v3/subscriptions/test-tenant-123/testresources"
   assert instance.endpoint("myresource") == "v3/subscriptions/test-tenant-123/testresources/myresource"
   assert instance.endpoint("myresource", "subpath") == "v3/subscriptions/test-tenant-123/testresources/myresource/subpath"
+
+def _tenant_portal(mocker, tmp_path, delay=0, **kwargs):
+  responses = {
+    "adminproxy/GetTenantNames": [{"AccountName": "dev", "TenantId": "tid-1"}],
+    "v3/features/system": {"ResourceNamePrefix": "acme"},
+  }
+  def request(method, url, **kw):
+    time.sleep(delay)
+    r = mocker.Mock(status_code=200)
+    r.json.return_value = responses[url.split("/", 3)[3]]
+    return r
+  req = mocker.patch("duplocloud.client.requests.request", side_effect=request)
+  kwargs.setdefault("tenant", "dev")
+  duplo = DuploCtl(host="https://example.duplocloud.net", token="abc",
+                   cache_dir=str(tmp_path), **kwargs)
+  return duplo, req
+
+@pytest.mark.unit
+def test_tenant_scope_shared_across_resources(mocker, tmp_path):
+  duplo, _ = _tenant_portal(mocker, tmp_path)
+  find = mocker.spy(load_resource("tenant"), "find")
+  info = mocker.spy(load_resource("system"), "info")
+  for kind in ["secret", "configmap", "service"]:
+    r = duplo.load(kind)
+    assert r.tenant_id == "tid-1"
+    assert r.prefix == "acme-dev-"
+  assert find.call_count == 1
+  assert info.call_count == 1
+  assert duplo.tenant_scope()["prefix"] == "acme-dev-"
+
+@pytest.mark.unit
+def test_tenant_scope_persisted_to_cache(mocker, tmp_path):
+  duplo, _ = _tenant_portal(mocker, tmp_path, tenant_cache=True)
+  assert duplo.load("secret").prefix == "acme-dev-"
+  duplo, req = _tenant_portal(mocker, tmp_path, tenant_cache=True)
+  r = duplo.load("configmap")
+  assert r.tenant_id == "tid-1"
+  assert r.prefix == "acme-dev-"
+  assert req.call_count == 0
+
+@pytest.mark.unit
+def test_prefetch_runs_lookups_concurrently(mocker, tmp_path):
+  duplo, req = _tenant_portal(mocker, tmp_path, delay=0.3)
+  r = duplo.load("batch_queue")
+  start = time.monotonic()
+  duplo.prefetch(r)
+  assert r.prefix == "acme-dev-"
+  assert r.tenant_id == "tid-1"
+  assert time.monotonic() - start < 0.55
+  assert req.call_count == 2
+
+@pytest.mark.unit
+def test_prefetch_skips_unprefixed_resources(mocker, tmp_path):
+  duplo, req = _tenant_portal(mocker, tmp_path)
+  duplo.prefetch(duplo.load("configmap"))
+  duplo.prefetch(duplo.load("plan"))
+  assert req.call_count == 0
+
+@pytest.mark.unit
+def test_prefetch_failure_falls_back(mocker, tmp_path):
+  duplo, req = _tenant_portal(mocker, tmp_path, tenant="missing")
+  r = duplo.load("batch_queue")
+  duplo.prefetch(r)
+  with pytest.raises(DuploNotFound):
+    r.prefix
@@ -202,3 +202,24 @@ def test_update_env_empty_otherdockerconfig(mocker):
   posted_body = mock_client.post.call_args[0][1]
   config = json.loads(posted_body["OtherDockerConfig"])
   assert config["Env"] == [{"Name": "MY_VAR", "Value": "val"}]
+
+
+@pytest.mark.unit
+def test_update_env_skips_when_unchanged(mocker):
+  """update_env() does not post or wait when the variables already match."""
+  mock_client = mocker.MagicMock()
+  mock_client.load_client.return_value = mock_client
+  mock_client.wait = True
+  service = DuploService(mock_client)
+  mocker.patch.object(service, 'find', return_value={
+    "Name": "test-svc",
+    "Template": {"OtherDockerConfig": json.dumps({"Env": [{"Name": "A", "Value": "1"}]})}
+  })
+  wait = mocker.patch.object(service, '_wait')
+  result = service.update_env("test-svc", setvar=[("A", "1")], strategy="merge", deletevar=None)
+  assert "unchanged" in result["message"]
+  mock_client.post.assert_not_called()
+  wait.assert_not_called()
+  result = service.update_env("test-svc", setvar=[("A", "2")], strategy="merge", deletevar=None, dryrun=True)
+  assert result["patch"] == [{"op": "replace", "path": "/Env/0/Value", "value": "2"}]
+  mock_client.post.assert_not_called()
@@ -0,0 +1,250 @@
+import cProfile
+import json
+import re
+import threading
+
+import pytest
+
+from duplocloud.controller import DuploCtl
+from duplocloud.telemetry import HttpArchive, Metrics, Profiler, Tracer, path_template
+
+
+@pytest.mark.unit
+def test_path_template():
+  tid = "2b6f2c3a-8e43-4c5f-a6d1-3c58b7e1b0a4"
+  assert path_template(f"subscriptions/{tid}/GetPods") == "/subscriptions/{id}/GetPods"
+  assert path_template(f"v3/subscriptions/{tid}/k8s/configmap/web?x=1") == "/v3/subscriptions/{id}/k8s/configmap/web"
+  assert path_template("admin/GetJob/42") == "/admin/GetJob/{id}"
+  assert path_template("adminproxy/GetTenantNames") == "/adminproxy/GetTenantNames"
+
+@pytest.mark.unit
+def test_tracer_writes_chrome_trace(tmp_path):
+  t = Tracer()
+  def inner():
+    with t.span("inner", "test"):
+      pass
+  with t.span("outer", "test", a=1) as span:
+    span["b"] = 2
+    th = threading.Thread(target=inner, name="worker")
+    th.start()
+    th.join()
+  with pytest.raises(ValueError), t.span("broken", "test"):
+    raise ValueError("nope")
+  out = tmp_path / "trace.json"
+  t.write(str(out))
+  doc = json.loads(out.read_text())
+  spans = {e["name"]: e for e in doc["traceEvents"] if e["ph"] == "X"}
+  assert spans["outer"]["args"] == {"a": 1, "b": 2}
+  assert spans["outer"]["dur"] >= 0
+  assert spans["broken"]["args"]["error"] == "ValueError"
+  names = {e["args"]["name"] for e in doc["traceEvents"] if e["ph"] == "M"}
+  assert {threading.current_thread().name, "worker"} <= names
+  assert spans["inner"]["tid"] != spans["outer"]["tid"]
+  assert t.events == []
+
+@pytest.mark.unit
+def test_command_is_traced(tmp_path, mocker):
+  out = tmp_path / "trace.json"
+  duplo = DuploCtl(host="https://example.duplocloud.net", token="abc", trace=str(out), query="[].AccountName")
+  response = mocker.MagicMock(status_code=200, content=b'[{"AccountName": "dev"}]')
+  response.json.return_value = [{"AccountName": "dev"}]
+  mocker.patch("duplocloud.client.requests.request", return_value=response)
+  duplo("tenant", "list")
+  duplo("tenant", "list")
+  duplo.flush_telemetry()
+  events = [e for e in json.loads(out.read_text())["traceEvents"] if e["ph"] == "X"]
+  http = [e["args"] for e in events if e["cat"] == "http"]
+  assert http[0] == {"method": "GET", "path": "/adminproxy/GetTenantNames", "cache": "miss", "status": 200, "bytes": 24}
+  assert http[1]["cache"] == "hit"
+  names = [e["name"] for e in events]
+  for name in ["load tenant", "tenant list", "filter", "format json"]:
+    assert name in names
+
+@pytest.mark.unit
+def test_nothing_is_recorded_without_trace():
+  duplo = DuploCtl(host="https://example.duplocloud.net")
+  assert duplo.tracer is None
+  with duplo.span("x", "test", a=1) as span:
+    assert span == {"a": 1}
+  duplo.flush_telemetry()
+
+@pytest.mark.unit
+def test_unwritable_telemetry_is_logged(tmp_path, mocker):
+  missing = tmp_path / "missing" / "out"
+  duplo = DuploCtl(host="https://example.duplocloud.net", trace=f"{missing}.json", metrics_file=f"{missing}.prom", har=f"{missing}.har")
+  error = mocker.patch.object(duplo.logger, "error")
+  duplo.flush_telemetry()
+  assert error.call_count == 3
+  assert "--metrics-file" in error.call_args_list[1].args[0]
+
+@pytest.mark.unit
+def test_metrics_histogram_and_prometheus():
+  m = Metrics()
+  m.request("duplo", "GET", "subscriptions/2b6f2c3a-8e43-4c5f-a6d1-3c58b7e1b0a4/GetPods", 200, 0.02, bytes_in=100)
+  m.request("duplo", "GET", "subscriptions/5c1d2e3f-8e43-4c5f-a6d1-3c58b7e1b0a4/GetPods", 500, 3.0, bytes_out=7)
+  m.cache("get", True)
+  snap = m.snapshot()
+  hist = snap["histograms"]["duploctl_request_duration_seconds"][0]
+  assert hist["labels"]["endpoint"] == "/subscriptions/{id}/GetPods"
+  assert hist["count"] == 2
+  assert hist["buckets"]["0.025"] == 1
+  assert hist["buckets"]["5.0"] == 2
+  statuses = {s["labels"]["status"]: s["value"] for s in snap["counters"]["duploctl_requests_total"]}
+  assert statuses == {"200": 1, "500": 1}
+  text = m.prometheus()
+  assert "# TYPE duploctl_request_duration_seconds histogram" in text
+  assert 'duploctl_request_duration_seconds_bucket{client="duplo",endpoint="/subscriptions/{id}/GetPods",method="GET",le="+Inf"} 2' in text
+  assert 'duploctl_request_bytes_total{client="duplo",direction="in"} 100' in text
+  assert 'duploctl_cache_total{cache="get",result="hit"} 1' in text
+
+@pytest.mark.unit
+def test_requests_and_cache_are_counted(tmp_path, mocker):
+  out = tmp_path / "metrics.prom"
+  duplo = DuploCtl(host="https://example.duplocloud.net", token="abc", metrics_file=str(out))
+  response = mocker.MagicMock(status_code=200, content=b'[{"AccountName": "dev"}]')
+  response.json.return_value = [{"AccountName": "dev"}]
+  mocker.patch("duplocloud.client.requests.request", return_value=response)
+  duplo("tenant", "list")
+  duplo("tenant", "list")
+  counters = duplo.metrics()["counters"]
+  requests = counters["duploctl_requests_total"]
+  assert [r["labels"]["endpoint"] for r in requests] == ["/adminproxy/GetTenantNames"]
+  assert requests[0]["value"] == 1
+  cache = {s["labels"]["result"]: s["value"] for s in counters["duploctl_cache_total"] if s["labels"]["cache"] == "get"}
+  assert cache == {"hit": 1, "miss": 1}
+  duplo.flush_telemetry()
+  assert 'duploctl_requests_total{client="duplo",endpoint="/adminproxy/GetTenantNames",method="GET",status="200"} 1' in out.read_text()
+  duplo("tenant", "list")
+  duplo.flush_telemetry()
+  text = out.read_text()
+  assert "duploctl_requests_total" not in text
+  assert 'duploctl_cache_total{cache="get",result="hit"} 1' in text
+
+def profiled(mode, mocker):
+  duplo = DuploCtl(host="https://example.duplocloud.net", token="abc", profile=mode, query="[].AccountName")
+  response = mocker.MagicMock(status_code=200, content=b'[{"AccountName": "dev"}]')
+  response.json.return_value = [{"AccountName": "dev"} for _ in range(2000)]
+  mocker.patch("duplocloud.client.requests.request", return_value=response)
+  duplo("tenant", "list")
+  return duplo
+
+@pytest.mark.unit
+def test_cpu_profile_by_phase(tmp_path, mocker, capsys):
+  duplo = profiled("cpu", mocker)
+  duplo.profiler.write(str(tmp_path / "run"))
+  report = capsys.readouterr().err
+  for phase in ["load", "command", "filter", "format"]:
+    assert f"\n{phase} " in report
+  assert (tmp_path / "run.prof").stat().st_size > 0
+  assert (tmp_path / "run.folded").exists()
+  for line in (tmp_path / "run.folded").read_text().splitlines():
+    assert line.split(";")[0] in ("load", "command", "filter", "format")
+
+@pytest.mark.unit
+def test_mem_profile_reports_sites_and_peak(tmp_path, mocker, capsys):
+  duplo = profiled("mem", mocker)
+  duplo.profiler.write(str(tmp_path / "run"))
+  report = capsys.readouterr().err
+  assert "peak traced memory" in report
+  assert "top allocation sites in command" in report
+  assert not list(tmp_path.iterdir())
+
+@pytest.mark.unit
+def test_nested_phases_count_once():
+  p = Profiler("cpu")
+  with p.phase("command"), p.phase("command"):
+    pass
+  p.stopped.set()
+  assert p.timings["command"][0] == 1
+  with pytest.raises(ValueError):
+    Profiler("gpu")
+
+@pytest.mark.unit
+def test_cpu_profile_across_threads(tmp_path, mocker, capsys):
+  enabled = []
+  class Profile(cProfile.Profile):
+    # like Python 3.12 and later, where only one profiler can be enabled in the process
+    def enable(self):
+      if enabled:
+        raise ValueError("Another profiling tool is already active")
+      enabled.append(self)
+      super().enable()
+    def disable(self):
+      super().disable()
+      if self in enabled:
+        enabled.remove(self)
+  mocker.patch("duplocloud.telemetry.cProfile.Profile", Profile)
+  p = Profiler("cpu")
+  barrier = threading.Barrier(4)
+  def work():
+    with p.phase("command"):
+      barrier.wait(5)
+  threads = [threading.Thread(target=work) for _ in range(4)]
+  for t in threads:
+    t.start()
+  for t in threads:
+    t.join(10)
+  assert p.timings["command"][0] == 4
+  assert not p.active
+  p.write(str(tmp_path / "run"))
+  assert "command" in capsys.readouterr().err
+
+@pytest.mark.unit
+def test_cpu_profile_when_another_profiler_is_active(mocker):
+  mocker.patch("duplocloud.telemetry.cProfile.Profile.enable", side_effect=ValueError("Another profiling tool is already active"))
+  p = Profiler("cpu")
+  with p.phase("command"):
+    assert p.owner is None
+  p.stopped.set()
+  assert not p.active
+  assert p.timings["command"][0] == 1
+
+@pytest.mark.unit
+@pytest.mark.parametrize("mode", ["cpu", "mem"])
+def test_profile_starts_over_after_write(tmp_path, mocker, capsys, mode):
+  duplo = profiled(mode, mocker)
+  duplo.profiler.write(str(tmp_path / "first"))
+  assert not duplo.profiler.timings
+  duplo("tenant", "list")
+  duplo.profiler.write(str(tmp_path / "second"))
+  report = capsys.readouterr().err
+  assert len(re.findall(r"\ncommand +1 ", report)) == 2
+  if mode == "cpu":
+    assert (tmp_path / "second.folded").exists()
+
+@pytest.mark.unit
+def test_har_records_requests_and_cache_hits(tmp_path, mocker):
+  out = tmp_path / "out.har"
+  duplo = DuploCtl(host="https://example.duplocloud.net", token="secret-token", har=str(out))
+  response = mocker.MagicMock(status_code=200, reason="OK", content=b'[{"AccountName": "dev"}]',
+                              headers={"Content-Type": "application/json", "Set-Cookie": "session=abc"})
+  response.json.return_value = [{"AccountName": "dev"}]
+  mocker.patch("duplocloud.client.requests.request", return_value=response)
+  duplo("tenant", "list")
+  duplo("tenant", "list")
+  duplo.flush_telemetry()
+  text = out.read_text()
+  assert "secret-token" not in text
+  assert "session=abc" not in text
+  har = json.loads(text)["log"]
+  assert har["version"] == "1.2"
+  miss, hit = har["entries"]
+  assert miss["request"]["url"] == "https://example.duplocloud.net/adminproxy/GetTenantNames"
+  assert {"name": "Authorization", "value": "REDACTED"} in miss["request"]["headers"]
+  assert miss["response"]["status"] == 200
+  assert miss["response"]["content"] == {"size": 24, "mimeType": "application/json"}
+  assert (miss["_cache"], hit["_cache"]) == ("miss", "hit")
+  assert miss["_endpoint"] == "/adminproxy/GetTenantNames"
+  assert miss["timings"]["wait"] + miss["timings"]["receive"] == pytest.approx(miss["time"])
+
+@pytest.mark.unit
+def test_har_records_failed_requests():
+  archive = HttpArchive()
+  archive.record("argo_wf", "POST", "https://example.duplocloud.net/argo-wf/t/api/v1/workflows?current_tenant_id=t1",
+                 {"duplotoken": "abc"}, 0.0, 1.5, error=TimeoutError("Argo request timed out"))
+  entry = archive.entries[0]
+  assert entry["response"]["status"] == 0
+  assert entry["_error"] == "Argo request timed out"
+  assert entry["request"]["headers"] == [{"name": "duplotoken", "value": "REDACTED"}]
+  assert entry["request"]["queryString"] == [{"name": "current_tenant_id", "value": "t1"}]
+  assert entry["startedDateTime"] == "1970-01-01T00:00:00.000+00:00"
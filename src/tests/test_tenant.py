@@ -540,3 +540,81 @@ def test_tenant_stop_raises_when_rds_reports_genuine_failure(mocker):
 
   assert "duplodb1" in str(exc.value)
   assert exc.value.code == 500
+
+def _export_portal(mocker, listings):
+  mock_client = MagicMock()
+  mock_client.load_client.return_value = mock_client
+  from duplo_resource.tenant import DuploTenant
+  tenant = DuploTenant(mock_client)
+  def load(kind):
+    r = MagicMock()
+    r.name_from_body.side_effect = lambda body: body["Name"]
+    if isinstance(listings[kind], Exception):
+      r.list.side_effect = listings[kind]
+    else:
+      r.list.side_effect = lambda: listings[kind]
+    return r
+  mock_client.load.side_effect = load
+  return tenant
+
+@pytest.mark.unit
+def test_export_writes_one_file_per_object(mocker, tmp_path):
+  import yaml
+  listings = {
+    "service": [{"Name": "web", "Replicas": 2}, {"Name": "worker", "Replicas": 1}],
+    "configmap": [{"Name": "web"}],
+    "lambda": DuploError("not available", 404),
+  }
+  tenant = _export_portal(mocker, listings)
+  result = tenant.export(str(tmp_path), kinds=list(listings))
+  assert result["kinds"] == {"service": 2, "configmap": 1}
+  assert result["failed"] == {"lambda": "not available"}
+  doc = yaml.safe_load((tmp_path / "service" / "web.yaml").read_text())
+  assert doc == {"kind": "service", "spec": {"Name": "web", "Replicas": 2}}
+  assert (tmp_path / "service" / "web.yaml").stat().st_mode & 0o777 == 0o600
+  assert (tmp_path / "service").stat().st_mode & 0o077 == 0
+
+@pytest.mark.unit
+def test_export_incremental_rewrites_only_changes(mocker, tmp_path):
+  listings = {"service": [{"Name": "web", "Replicas": 2}, {"Name": "worker", "Replicas": 1}]}
+  tenant = _export_portal(mocker, listings)
+  first = tenant.export(str(tmp_path), kinds=["service"], incremental=True)
+  assert first["written"] == 2
+  listings["service"] = [{"Name": "web", "Replicas": 3}]
+  second = tenant.export(str(tmp_path), kinds=["service"], incremental=True)
+  assert (second["written"], second["unchanged"], second["removed"]) == (1, 0, 1)
+  assert not (tmp_path / "service" / "worker.yaml").exists()
+  listings["service"] = [{"Name": "web", "Replicas": 3}]
+  third = tenant.export(str(tmp_path), kinds=["service"], incremental=True)
+  assert (third["written"], third["unchanged"]) == (0, 1)
+
+@pytest.mark.unit
+def test_export_archive(mocker, tmp_path):
+  import tarfile
+  tenant = _export_portal(mocker, {"service": [{"Name": "web"}]})
+  out = tmp_path / "snap.tar.gz"
+  assert tenant.export(str(out), kinds=["service"])["written"] == 1
+  assert out.stat().st_mode & 0o777 == 0o600
+  with tarfile.open(out) as tar:
+    assert tar.getnames() == ["service/web.yaml"]
+    assert tar.getmember("service/web.yaml").mode == 0o600
+  with pytest.raises(DuploError, match="needs a directory"):
+    tenant.export(str(out), kinds=["service"], incremental=True)
+
+@pytest.mark.unit
+def test_export_can_be_applied(mocker, tmp_path):
+  from duplo_resource.apply import DuploApply
+  listings = {"service": [{"Name": "web"}], "configmap": [{"Name": "web"}]}
+  tenant = _export_portal(mocker, listings)
+  tenant.export(str(tmp_path), kinds=list(listings), incremental=True)
+  assert (tmp_path / ".export.json").exists()
+  docs = DuploApply(MagicMock()).documents([str(tmp_path)])
+  assert [(d["kind"], d["spec"]) for d in docs] == [("configmap", {"Name": "web"}), ("service", {"Name": "web"})]
+
+@pytest.mark.unit
+def test_export_nothing_incremental(mocker, tmp_path):
+  out = tmp_path / "snapshot"
+  tenant = _export_portal(mocker, {"service": []})
+  result = tenant.export(str(out), kinds=["service"], incremental=True)
+  assert (result["written"], result["removed"]) == (0, 0)
+  assert out.stat().st_mode & 0o077 == 0
@@ -0,0 +1,93 @@
+import time
+import threading
+import pytest
+from multiprocessing.pool import ThreadPool
+from duplocloud.controller import DuploCtl
+from duplo_resource.tenant import DuploTenant
+from duplo_resource.system import DuploSystem
+
+THREADS = 32
+
+@pytest.fixture
+def shared(tmp_path):
+  return DuploCtl(host="https://example.duplocloud.net", token="abc", tenant="dev", cache_dir=str(tmp_path))
+
+def hammer(fn, n=THREADS):
+  """Run fn from many threads released at the same moment."""
+  barrier = threading.Barrier(n)
+  def run(i):
+    barrier.wait()
+    return fn(i)
+  with ThreadPool(n) as pool:
+    return pool.map(run, range(n))
+
+def slow(result, calls):
+  def fn(*args, **kwargs):
+    calls.append(args)
+    time.sleep(0.05)
+    return result
+  return fn
+
+@pytest.mark.unit
+def test_clients_are_constructed_once(shared):
+  clients = hammer(lambda i: shared.load_client("duplo"))
+  assert all(c is clients[0] for c in clients)
+
+@pytest.mark.unit
+def test_concurrent_gets_share_one_request(shared, mocker):
+  calls = []
+  response = mocker.MagicMock(status_code=200)
+  mocker.patch("duplocloud.client.requests.request", side_effect=slow(response, calls))
+  client = shared.load_client("duplo")
+  results = hammer(lambda i: client.get("adminproxy/GetTenantNames"))
+  assert len(calls) == 1
+  assert all(r is response for r in results)
+
+@pytest.mark.unit
+def test_index_is_built_once(shared):
+  calls = []
+  client = shared.load_client("duplo")
+  build = slow({"a": 1}, calls)
+  results = hammer(lambda i: client.index(("kind", None, "Name"), build))
+  assert len(calls) == 1
+  assert all(r == {"a": 1} for r in results)
+
+@pytest.mark.unit
+def test_tenant_scope_is_resolved_once(shared, mocker):
+  finds, infos = [], []
+  tenant = {"AccountName": "dev", "TenantId": "t-dev"}
+  mocker.patch.object(DuploTenant, "find", side_effect=slow(tenant, finds))
+  mocker.patch.object(DuploSystem, "info", side_effect=slow({"ResourceNamePrefix": "duplo"}, infos))
+  def resolve(i):
+    r = shared.load("configmap")
+    return r.tenant_id, r.prefix
+  results = hammer(resolve)
+  assert set(results) == {("t-dev", "duplo-dev-")}
+  assert (len(finds), len(infos)) == (1, 1)
+
+@pytest.mark.unit
+def test_prefetch_and_lazy_properties_race(shared, mocker):
+  finds = []
+  tenant = {"AccountName": "dev", "TenantId": "t-dev"}
+  mocker.patch.object(DuploTenant, "find", side_effect=slow(tenant, finds))
+  mocker.patch.object(DuploSystem, "info", return_value={})
+  def resolve(i):
+    r = shared.load("storageclass")
+    shared.prefetch(r)
+    return r.prefix
+  assert set(hammer(resolve)) == {"duploservices-dev-"}
+  assert len(finds) == 1
+
+@pytest.mark.unit
+def test_cache_writes_are_atomic(shared):
+  cache = shared.load("cache")
+  cache.set("stress", {"n": -1})
+  big = {"items": list(range(5000))}
+  def rw(i):
+    if i % 2:
+      cache.set("stress", {**big, "n": i})
+      return None
+    return cache.get("stress")["n"]
+  results = hammer(rw)
+  assert all(r is None or isinstance(r, int) for r in results)
+  assert cache.get("stress")["items"] == big["items"]